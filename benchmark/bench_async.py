@@ -0,0 +1,36 @@
+"""
+    AsyncWebRequest 吞吐量随并发数变化的基准测试
+    本地服务每个请求固定延迟 delay 毫秒, 理想情况下 请求数/秒 随并发数线性增长
+
+    python -m benchmark.bench_async
+"""
+import time
+import asyncio
+from core.ProcessAsyncRequest import AsyncRequestEngine
+from core.ProcessAsyncRequest import AsyncWebRequest
+from benchmark.server import start_server
+
+
+async def run(address: str, concurrency: int, total: int, delay: int) -> (float, int):
+    engine = AsyncRequestEngine(host_concurrency=concurrency, max_workers=concurrency)
+    content = f"GET /delay/{delay} HTTP/1.1\r\nHost: {address}\r\n\r\n"
+    requests = [AsyncWebRequest(content=content, engine=engine, timeout=10) for _ in range(total)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(item.make_request() for item in requests))
+    cost = time.perf_counter() - start
+    engine.shutdown()
+    return total / cost, sum(1 for status, _ in results if status)
+
+
+def main(total: int = 400, delay: int = 20):
+    server, address = start_server()
+    try:
+        for concurrency in (1, 4, 16, 64):
+            rps, success = asyncio.run(run(address, concurrency, total, delay))
+            print(f"concurrency {concurrency:>3}  {rps:>8.1f} req/s  success {success}/{total}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+    域名解析缓存(DNS_CACHE)对新建连接的请求与代理存活性检测的影响
+    使用模拟的解析函数(每次解析固定耗时 delay 毫秒), 请求头带有 Connection: close, 每个请求都新建连接
+    代理存活性检测只解析代理的主机名, 检测地址由代理解析, 因此直接使用 IP 地址
+
+    python -m benchmark.bench_dns
+"""
+import time
+import socket
+from core.ProcessDNSCache import DNS_CACHE
+from core.ProcessProxy import WebProxy
+from core.ProcessRequest import WebRequest
+from benchmark.server import start_server
+from benchmark.server import StandInProxyHandler
+
+# 模拟的域名 => 地址
+HOSTS = {"origin.test": "127.0.0.1", "proxy.test": "127.0.0.1"}
+
+
+def make_resolver(delay: float):
+    def resolver(host, port, family=0, type=0, proto=0, flags=0):
+        time.sleep(delay)
+        if host not in HOSTS:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return socket.getaddrinfo(HOSTS[host], port, family, type, proto, flags)
+    return resolver
+
+
+def run(port: int, proxy_port: int, ttl: float, total: int) -> (float, float, float):
+    DNS_CACHE.clear()
+    DNS_CACHE.ttl = ttl
+    DNS_CACHE.negative_ttl = ttl
+    DNS_CACHE.hits, DNS_CACHE.misses, DNS_CACHE.negative_hits, DNS_CACHE.saved = 0, 0, 0, 0.0
+    content = f"GET / HTTP/1.1\r\nHost: origin.test:{port}\r\nConnection: close\r\n\r\n"
+    traces = list()
+    WebRequest.register_hook(traces.append)
+    try:
+        start = time.perf_counter()
+        for _ in range(total):
+            WebRequest(content=content).make_request(timeout=5)
+        request_cost = (time.perf_counter() - start) / total
+    finally:
+        WebRequest.unregister_hook(traces.append)
+
+    proxy = WebProxy(f"http://proxy.test:{proxy_port}")
+    start = time.perf_counter()
+    for _ in range(total):
+        proxy.check_proxy_alive(f"http://127.0.0.1:{port}/", 0, (5, 5), 0)
+    check_cost = (time.perf_counter() - start) / total
+    saved = sum(item.dns_saved or 0.0 for item in traces) / total
+    return request_cost, check_cost, saved
+
+
+def main(total: int = 50, delay: float = 0.02):
+    server, address = start_server()
+    proxy, proxy_address = start_server(handler=StandInProxyHandler)
+    port, proxy_port = int(address.split(":")[1]), int(proxy_address.split(":")[1])
+    resolver, DNS_CACHE.resolver = DNS_CACHE.resolver, make_resolver(delay)
+    try:
+        for name, ttl in (("no cache", 0), ("cache", 300)):
+            request_cost, check_cost, saved = run(port, proxy_port, ttl, total)
+            print(f"{name:<9} request {request_cost * 1e3:>7.2f}ms  proxy check {check_cost * 1e3:>7.2f}ms  "
+                  f"trace dns_saved {saved * 1e3:>6.2f}ms  {DNS_CACHE.stats()}")
+
+        ''' 解析失败的结果同样被缓存 '''
+        content = "GET / HTTP/1.1\r\nHost: missing.test\r\n\r\n"
+        for _ in range(2):
+            start = time.perf_counter()
+            status, message = WebRequest(content=content).make_request(timeout=5)
+            print(f"missing.test  {status} {message}  {(time.perf_counter() - start) * 1e3:>7.2f}ms")
+    finally:
+        DNS_CACHE.resolver = resolver
+        DNS_CACHE.clear()
+        server.shutdown()
+        proxy.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+    请求与响应历史记录(WebRequestHistory)的写入、查找与内存占用
+    对比在内存中保存 make_response 返回的字符串(列表)与追加写入磁盘的历史记录:
+        写入吞吐量、写入过程中的常驻内存(RSS)、重新打开耗时、按序号随机读取与按时间范围查找的耗时
+
+    python -m benchmark.bench_history [--total 200000] [--response-size 2048]
+"""
+import gc
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from core.ProcessRequestHistory import WebRequestHistory
+from benchmark.bench_parse import SMALL_GET
+
+
+def get_rss() -> float:
+    ''' 当前常驻内存(MB), 没有 /proc 时返回 0 '''
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+
+def make_response(index: int, size: int) -> str:
+    return f"HTTP/1.1 http://127.0.0.1:8080/index.php?id={index} 200\r\nContent-Type:text/html\r\n\r\n" + "a" * size
+
+
+def bench_memory(total: int, size: int) -> (float, float):
+    gc.collect()
+    before = get_rss()
+    start = time.perf_counter()
+    history = list()
+    for i in range(total):
+        history.append(SMALL_GET + make_response(i, size))
+    return time.perf_counter() - start, get_rss() - before
+
+
+def bench_disk(path: str, total: int, size: int) -> (float, float, list):
+    gc.collect()
+    before = get_rss()
+    samples = list()
+    start = time.perf_counter()
+    request = SMALL_GET.encode("latin-1")
+    with WebRequestHistory(path, segment_size=16 * 1024 * 1024) as history:
+        base = time.time()
+        for i in range(total):
+            history.append(request, make_response(i, size), base + i * 0.001)
+            if i % (total // 4) == 0:
+                samples.append(round(get_rss() - before, 1))
+        cost = time.perf_counter() - start
+        history.flush()
+        print(f"disk     stats {history.stats()}")
+    return cost, get_rss() - before, samples
+
+
+def main(argv: list or None = None):
+    parser = argparse.ArgumentParser(description="request/response history on disk")
+    parser.add_argument("--total", type=int, default=200000, help="number of records")
+    parser.add_argument("--response-size", type=int, default=2048, help="response body size")
+    args = parser.parse_args(argv)
+
+    path = tempfile.mkdtemp(prefix="history_")
+    try:
+        cost, rss, samples = bench_disk(path, args.total, args.response_size)
+        print(f"disk     append {args.total / cost:>10.0f} rec/s  rss +{rss:.1f} MB (during append {samples} MB)")
+
+        start = time.perf_counter()
+        history = WebRequestHistory(path)
+        print(f"reopen   {(time.perf_counter() - start) * 1e3:.2f}ms  {len(history)} records")
+        seqs = [random.randrange(len(history)) for _ in range(10000)]
+        start = time.perf_counter()
+        for seq in seqs:
+            history[seq].get_response()
+        print(f"get      {(time.perf_counter() - start) / len(seqs) * 1e6:>8.2f}us per random record (index + read)")
+        record = history[len(history) // 2]
+        start = time.perf_counter()
+        found = sum(1 for _ in history.scan(record.time, record.time + 1))
+        print(f"scan     {(time.perf_counter() - start) * 1e3:>8.2f}ms for a 1s range ({found} records)")
+        assert history[-1].get_requests_data().is_usable
+        history.close()
+
+        cost, rss = bench_memory(args.total, args.response_size)
+        print(f"memory   append {args.total / cost:>10.0f} rec/s  rss +{rss:.1f} MB")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+    core 包的冷启动导入耗时(python -X importtime)
+    每个导入语句在新的解释器进程中执行 rounds 次, 统计解释器启动(site 等)之外的模块累计导入耗时的中位数,
+    并列出导入后已经加载的重量级依赖; 超过耗时上限时退出码为 1, 可以作为冷启动耗时的回归检查
+
+    python -m benchmark.bench_import [--rounds 5] [--scale 1.0]
+"""
+import sys
+import argparse
+import statistics
+import subprocess
+
+# 导入语句 => 导入耗时上限(毫秒)
+TARGETS = {
+    "import core": 5,
+    "from core import WebRequestsData": 30,
+    "from core import ProxyPool": 40,
+    "from core import ProxyLoader": 40,
+    "from core import WebRequest": 400,
+}
+# 需要关注是否被加载的重量级依赖
+HEAVY_MODULES = ("requests", "urllib3", "ssl", "http.server", "sqlite3", "concurrent.futures")
+
+
+def import_time(statement: str) -> (float, list):
+    """
+        在新的解释器进程中执行导入语句
+    :param statement: 导入语句
+    :return: (导入耗时(毫秒), 已经加载的重量级依赖)
+    """
+    check = f"import sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"{statement}; {check}"],
+                             capture_output=True, text=True, check=True)
+    startup = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"],
+                             capture_output=True, text=True, check=True)
+    return parse(process.stderr, parse_names(startup.stderr)) / 1000, \
+        [item for item in process.stdout.strip().split(",") if item]
+
+
+def parse_names(stderr: str) -> set:
+    return {line.rsplit("|", 1)[1].strip() for line in stderr.splitlines() if line.startswith("import time:")}
+
+
+def parse(stderr: str, startup: set) -> float:
+    """
+        累计解释器启动之外的顶层模块的导入耗时(微秒)
+    """
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("  ") or name.strip() in startup:
+            continue
+        total = total + int(cumulative)
+    return total
+
+
+def main(argv: list or None = None) -> int:
+    parser = argparse.ArgumentParser(description="cold import time of the core package")
+    parser.add_argument("--rounds", type=int, default=5, help="interpreter runs per statement")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier applied to every budget")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for statement, budget in TARGETS.items():
+        costs, heavy = list(), list()
+        for _ in range(args.rounds):
+            cost, heavy = import_time(statement)
+            costs.append(cost)
+        median = statistics.median(costs)
+        over = median > budget * args.scale
+        failed = failed + (1 if over else 0)
+        print(f"{'[!]' if over else '[+]'} {statement:<36} {median:>8.1f}ms  budget {budget * args.scale:>6.0f}ms  "
+              f"loaded {','.join(heavy) or '-'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
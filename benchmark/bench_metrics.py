@@ -0,0 +1,115 @@
+"""
+    指标注册表(METRICS)在请求路径上的开销
+    单线程与多线程下分别测量 WebRequest 每个 GET 请求更新指标(一次耗时分布记录与响应体传输字节数计数)的耗时,
+    超过耗时上限(默认 1 微秒)时退出码为 1; 同时检查大量短生命周期线程结束后计数字典不会持续增长,
+    与本地服务的一次完整请求耗时对比, 最后通过本机指标HTTP服务读取 Prometheus 文本
+
+    python -m benchmark.bench_metrics [--budget 1000] [--scale 1.0]
+"""
+import sys
+import time
+import timeit
+import argparse
+import threading
+import urllib.request
+from core.ProcessMetrics import METRICS
+from core.ProcessProxy import WebProxy
+from core.ProcessProxyPool import ProxyPool
+from core.ProcessRequest import WebRequest
+from benchmark.server import start_server
+
+# 每个请求更新指标的耗时上限(纳秒)
+BUDGET = 1000
+
+
+def update():
+    ''' 与 WebRequest._send 中 GET 请求成功时更新的指标相同: 一次耗时分布记录与响应体的传输字节数(没有请求体) '''
+    WebRequest.METRIC_REQUESTS.observe(0.0123, ('get', 'ok'))
+    WebRequest.METRIC_RECEIVED_BYTES.inc(2048)
+
+
+def per_thread(threads: int, number: int) -> float:
+    def worker():
+        for _ in range(number):
+            update()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for item in workers:
+        item.start()
+    for item in workers:
+        item.join()
+    return (time.perf_counter() - start) / (threads * number)
+
+
+def short_lived_threads(total: int) -> int:
+    ''' 每个线程只记录一次后结束, 返回之后保留的计数字典数量 '''
+    for _ in range(total):
+        worker = threading.Thread(target=update)
+        worker.start()
+        worker.join()
+    WebRequest.METRIC_REQUESTS.samples()
+    return len(WebRequest.METRIC_REQUESTS._shards)
+
+
+def empty():
+    pass
+
+
+def main(argv: list or None = None, number: int = 200000, total: int = 500) -> int:
+    parser = argparse.ArgumentParser(description="hot-path cost of the metrics registry")
+    parser.add_argument("--budget", type=float, default=BUDGET, help="budget per request in nanoseconds")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier applied to the budget")
+    args = parser.parse_args(argv)
+    budget = args.budget * args.scale
+
+    failed = 0
+    cost = min(timeit.repeat(empty, number=number, repeat=5)) / number
+    print(f"empty function call        {cost * 1e9:>8.1f}ns (reference for this machine)")
+    cost = min(timeit.repeat(update, number=number, repeat=5)) / number
+    failed = failed + (1 if cost * 1e9 > budget else 0)
+    print(f"{'[!]' if cost * 1e9 > budget else '[+]'} request metrics        {cost * 1e9:>8.1f}ns per request  "
+          f"budget {budget:.0f}ns")
+    proxy = WebProxy("http://127.0.0.1:8080")
+    cost = timeit.timeit(lambda: proxy.record(True, 0.01), number=number) / number
+    print(f"    WebProxy.record        {cost * 1e9:>8.1f}ns (EWMA and breaker, no metrics)")
+    for threads in (4, 16):
+        ''' 与单线程相同取多次测量中的最小值, 减少线程调度带来的抖动 '''
+        cost = min(per_thread(threads, number // threads) for _ in range(3))
+        failed = failed + (1 if cost * 1e9 > budget else 0)
+        print(f"{'[!]' if cost * 1e9 > budget else '[+]'} request metrics {threads:>2} threads {cost * 1e9:>8.1f}ns "
+              f"per request (wall time / requests)")
+    shards = short_lived_threads(2000)
+    failed = failed + (1 if shards > threading.active_count() else 0)
+    print(f"{'[!]' if shards > threading.active_count() else '[+]'} shards after 2000 short-lived threads "
+          f"{shards} (alive threads {threading.active_count()})")
+
+    server, address = start_server()
+    pool = ProxyPool(100)
+    pool.add_nodes([WebProxy(f"http://10.0.0.{i}:8080") for i in range(100)])
+    content = f"GET / HTTP/1.1\r\nHost: {address}\r\n\r\n"
+    try:
+        start = time.perf_counter()
+        for _ in range(total):
+            WebRequest(content=content).make_request(timeout=5)
+        print(f"    local request          {(time.perf_counter() - start) / total * 1e9:>8.1f}ns per request")
+
+        metrics = METRICS.start_server(port=0)
+        url = f"http://{metrics.server_address[0]}:{metrics.server_address[1]}/metrics"
+        text = urllib.request.urlopen(url, timeout=5).read().decode("utf-8")
+        start = time.perf_counter()
+        for _ in range(100):
+            METRICS.render()
+        print(f"    render                 {(time.perf_counter() - start) / 100 * 1e6:>8.1f}us  "
+              f"{len(text.splitlines())} lines from {url}")
+        for line in text.splitlines():
+            if line.startswith(("proxypool_", "webrequest_duration_seconds_count")):
+                print(f"        {line}")
+    finally:
+        METRICS.stop_server()
+        server.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+    解析后保留在内存中的请求(WebRequestsData)占用的内存
+    大量报文解析后长时间保留(例如批量重放、请求队列)时, 对比每个请求占用的字节数(tracemalloc, 包含原始报文本身):
+        dict     默认的嵌套字典 package(请求行字典、请求头字典与每个值的 str) + 原始请求头的 memoryview
+        compact  compact=True 时的 WebRequestsPackage(驻留的请求头名称、array('I') 偏移, 请求头的值在访问时才从原始报文中解码)
+    同时给出解析耗时与访问请求头的耗时
+
+    python -m benchmark.bench_package [--total 20000]
+"""
+import gc
+import time
+import timeit
+import argparse
+import tracemalloc
+from core.ProcessRequestData import WebRequestsData
+from benchmark.bench_parse import SMALL_GET
+
+
+def make_content(index: int) -> bytes:
+    ''' 每个请求的路径不同, 避免不同请求共享同一个报文对象 '''
+    return SMALL_GET.replace("id=1", f"id={index}").encode("latin-1")
+
+
+def make_dict(content: bytes) -> WebRequestsData:
+    return WebRequestsData(content=content)
+
+
+def make_compact(content: bytes) -> WebRequestsData:
+    return WebRequestsData(content=content, compact=True)
+
+
+def retained(func, total: int) -> float:
+    """
+        保留 total 个请求占用的内存
+    :return: 每个请求占用的字节数
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [func(make_content(i)) for i in range(total)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert all(item.is_usable for item in items)
+    return (after - before) / total
+
+
+def main(argv: list or None = None):
+    parser = argparse.ArgumentParser(description="memory retained by parsed requests")
+    parser.add_argument("--total", type=int, default=20000, help="number of retained requests")
+    args = parser.parse_args(argv)
+
+    content = make_content(1)
+    print(f"request size {len(content)} bytes, {args.total} retained requests")
+    result = dict()
+    for name, func in (("dict", make_dict), ("compact", make_compact)):
+        result[name] = retained(func, args.total)
+        data = func(content)
+        number = 20000
+        parse = timeit.timeit(lambda: func(content), number=number) / number
+        access = timeit.timeit(lambda: data.package['header']['host'], number=number) / number
+        print(f"{name:<8} {result[name]:>8.0f} B/request  parse {parse * 1e6:>6.2f}us  "
+              f"header access {access * 1e9:>6.0f}ns")
+    print(f"compact / dict {result['compact'] / result['dict']:.1%}")
+
+    start = time.perf_counter()
+    items = [make_compact(make_content(i)) for i in range(args.total)]
+    print(f"parse and retain {args.total} requests {time.perf_counter() - start:.3f}s, "
+          f"e.g. {dict(items[-1].package['header'])['host']}{items[-1].package['line']['path']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+    WebRequestsData stream模式解析开销的微基准测试
+    对比 str 报文(splitlines + 逐行正则) 与 bytes 报文(WebRequestsParser 单次扫描) 的解析耗时
+
+    python -m benchmark.bench_parse
+"""
+import timeit
+from core.ProcessRequestData import WebRequestsData
+
+SMALL_GET = (
+    "GET /index.php?id=1 HTTP/1.1\r\n"
+    "Host: 127.0.0.1:8080\r\n"
+    "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/119.0\r\n"
+    "Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8\r\n"
+    "Accept-Language: zh-CN,zh;q=0.8,en-US;q=0.5,en;q=0.3\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+)
+
+
+def make_post(size: int) -> str:
+    """
+        构造请求体大小为 size 字节的 POST 报文
+    :param size: 请求体大小
+    :return: HTTP Request报文
+    """
+    line = "a" * 1023 + "\n"
+    body = line * (size // len(line))
+    return (
+        "POST /upload.php HTTP/1.1\r\n"
+        "Host: 127.0.0.1:8080\r\n"
+        "Content-Type: application/x-www-form-urlencoded\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n"
+        "\r\n"
+    ) + body
+
+
+def bench(name: str, content: str, number: int):
+    raw = content.encode("latin-1")
+    _str = timeit.timeit(lambda: WebRequestsData(content=content), number=number) / number
+    _bytes = timeit.timeit(lambda: WebRequestsData(content=raw), number=number) / number
+    print(f"{name:<16} str: {_str * 1e6:>12.2f}us  bytes: {_bytes * 1e6:>12.2f}us  speedup: {_str / _bytes:>8.1f}x")
+
+
+def main():
+    bench("GET", SMALL_GET, 20000)
+    for size in (1, 8, 32):
+        bench(f"POST {size}MB", make_post(size * 1024 * 1024), 10)
+
+
+if __name__ == '__main__':
+    main()
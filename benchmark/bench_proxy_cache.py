@@ -0,0 +1,82 @@
+"""
+    进程启动时检测所有代理(check_all_node_alive)与从本地缓存恢复状态(warm_check_all_node_alive)的耗时对比
+    以及大规模代理列表保存与恢复状态的耗时
+
+    python -m benchmark.bench_proxy_cache
+"""
+import os
+import time
+import tempfile
+from core.ProcessProxy import WebProxy
+from core.ProcessProxyPool import ProxyPool
+from core.ProcessProxyCache import ProxyHealthCache
+from core.ProcessProxyChecker import ProxyHealthChecker
+from benchmark.server import start_server
+from benchmark.server import start_black_hole
+from benchmark.server import StandInProxyHandler
+
+
+def make_pool(addresses: list) -> ProxyPool:
+    ''' 模拟进程重新启动: 每次都使用新构造的代理与代理池 '''
+    pool = ProxyPool(len(addresses))
+    for address in addresses:
+        pool.add_node(WebProxy(f"http://{address}"))
+    return pool
+
+
+def startup(path: str, live: int = 8, dead: int = 8):
+    origin, origin_address = start_server()
+    url = f"http://{origin_address}/"
+    servers = [start_server(handler=StandInProxyHandler) for _ in range(live)]
+    black_holes = [start_black_hole() for _ in range(dead)]
+    addresses = [address for _, address in servers + black_holes]
+    checker = ProxyHealthChecker(deadline=10, timeout=(0.5, 0.5), try_times=2, backoff=0.1)
+    cache = ProxyHealthCache(path)
+    try:
+        start = time.perf_counter()
+        pool = make_pool(addresses)
+        pool.check_all_node_alive(url, checker)
+        pool.save_status(cache)
+        print(f"cold start   {time.perf_counter() - start:>8.3f}s  usable {len(pool._healthy)}/{pool.length}")
+
+        start = time.perf_counter()
+        pool = make_pool(addresses)
+        results = pool.warm_check_all_node_alive(url, cache, checker)
+        print(f"warm start   {time.perf_counter() - start:>8.3f}s  usable {len(pool._healthy)}/{pool.length}  "
+              f"re-checked {len(results)}")
+    finally:
+        origin.shutdown()
+        for server, _ in servers:
+            server.shutdown()
+        for listener, _ in black_holes:
+            listener.close()
+
+
+def scale(path: str, total: int = 100000):
+    pool = ProxyPool(total)
+    for index in range(total):
+        proxy = WebProxy(f"http://10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}:8080")
+        proxy.record(index % 3 != 0, 0.05)
+        pool.add_node(proxy)
+    cache = ProxyHealthCache(path)
+    start = time.perf_counter()
+    saved = pool.save_status(cache)
+    print(f"save {saved:>6}  {time.perf_counter() - start:>8.3f}s")
+    start = time.perf_counter()
+    stale = pool.load_status(cache)
+    print(f"load {total:>6}  {time.perf_counter() - start:>8.3f}s  stale {len(stale)}")
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        startup(os.path.join(directory, "startup.db"))
+        scale(os.path.join(directory, "scale.db"))
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
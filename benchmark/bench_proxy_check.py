@@ -0,0 +1,66 @@
+"""
+    逐个检测代理(WebProxy.check_proxy_alive)与并发检测(ProxyHealthChecker)的耗时对比
+    一半代理为本地HTTP代理(存活), 一半为接受连接后不返回数据的黑洞服务(失效)
+
+    python -m benchmark.bench_proxy_check
+"""
+import time
+from core.ProcessProxy import WebProxy
+from core.ProcessProxyChecker import ProxyHealthChecker
+from benchmark.server import start_server
+from benchmark.server import start_black_hole
+from benchmark.server import StandInProxyHandler
+
+# 为了让基准测试在较短时间内完成, 使用比默认值更小的超时时间与重试次数
+TIMEOUT = (0.5, 0.5)
+TRY_TIMES = 2
+BACKOFF = 0.1
+
+
+def main(live: int = 8, dead: int = 8, deadline: float = 10):
+    origin, origin_address = start_server()
+    url = f"http://{origin_address}/"
+    servers, black_holes, proxies = list(), list(), list()
+    for _ in range(live):
+        server, address = start_server(handler=StandInProxyHandler)
+        servers.append(server)
+        proxies.append(WebProxy(f"http://{address}"))
+    for _ in range(dead):
+        listener, address = start_black_hole()
+        black_holes.append(listener)
+        proxies.append(WebProxy(f"http://{address}"))
+
+    try:
+        start = time.perf_counter()
+        sequential = [item.check_proxy_alive(url, TRY_TIMES, TIMEOUT, BACKOFF)[0] for item in proxies]
+        sequential_cost = time.perf_counter() - start
+
+        checker = ProxyHealthChecker(deadline=deadline, timeout=TIMEOUT, try_times=TRY_TIMES, backoff=BACKOFF)
+        start = time.perf_counter()
+        results = checker.check(proxies, url)
+        concurrent_cost = time.perf_counter() - start
+
+        expected = [True] * live + [False] * dead
+        print(f"sequential  {sequential_cost:>8.2f}s  correct {sequential == expected}")
+        print(f"concurrent  {concurrent_cost:>8.2f}s  correct {[item.status for item in results] == expected}"
+              f"  usable {[item.get_is_usable() for item in proxies] == expected}")
+        print(f"speedup     {sequential_cost / concurrent_cost:>8.1f}x")
+        for item in (results[0], results[-1]):
+            print(item.to_dict())
+
+        ''' 截止时间短于单次检测时间时, 未完成的代理在截止时间到达时被记录为不可用 '''
+        checker = ProxyHealthChecker(deadline=0.2, timeout=TIMEOUT, try_times=TRY_TIMES, backoff=BACKOFF)
+        start = time.perf_counter()
+        results = checker.check(proxies[live:], url)
+        print(f"deadline    {time.perf_counter() - start:>8.2f}s  "
+              f"all unusable {not any(item.get_is_usable() for item in proxies[live:])}")
+    finally:
+        origin.shutdown()
+        for server in servers:
+            server.shutdown()
+        for listener in black_holes:
+            listener.close()
+
+
+if __name__ == '__main__':
+    main()
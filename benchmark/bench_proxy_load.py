@@ -0,0 +1,74 @@
+"""
+    逐个构造 WebProxy 并加入代理池与使用 ProxyLoader 批量导入代理列表的吞吐量对比
+    代理列表中约 10% 为重复代理(包含多余路径等不同写法), 约 5% 为格式不合法的代理
+
+    python -m benchmark.bench_proxy_load
+"""
+import os
+import time
+import random
+import tempfile
+from core.ProcessProxy import WebProxy
+from core.ProcessProxyPool import ProxyPool
+from core.ProcessProxyLoader import ProxyLoader
+
+
+def make_lines(total: int) -> list:
+    random.seed(1)
+    lines = list()
+    for index in range(total):
+        value = random.random()
+        if value < 0.05:
+            lines.append(f"not-a-proxy-{index}")
+        elif value < 0.15 and lines:
+            ''' 重复的代理, 部分带有多余的路径 '''
+            line = random.choice(lines)
+            lines.append(line if random.random() < 0.5 else f"{line}/")
+        else:
+            auth = f"user{index}:pass@" if index % 4 == 0 else ""
+            lines.append(f"{random.choice(('http', 'socks5'))}://{auth}10.{index >> 16 & 255}."
+                         f"{index >> 8 & 255}.{index & 255}:{1024 + index % 50000}")
+    return lines
+
+
+def legacy(lines: list) -> ProxyPool:
+    ''' 逐个构造 WebProxy, 通过遍历代理池去重的代价过高, 这里只在加入前用集合去重 '''
+    pool, seen = ProxyPool(len(lines)), set()
+    for line in lines:
+        proxy = WebProxy(line.strip())
+        if not proxy.get_is_usable() or proxy.get_url() in seen:
+            continue
+        seen.add(proxy.get_url())
+        pool.add_node(proxy)
+    return pool
+
+
+def main(total: int = 100000):
+    lines = make_lines(total)
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write("\n".join(lines))
+        path = f.name
+    try:
+        start = time.perf_counter()
+        pool = legacy(lines)
+        legacy_cost = time.perf_counter() - start
+        print(f"WebProxy + add_node   {legacy_cost:>6.2f}s  {total / legacy_cost:>10.0f} lines/s  pool {pool.length}")
+
+        pool = ProxyPool(total)
+        loader = ProxyLoader(pool)
+        start = time.perf_counter()
+        stats = loader.load_file(path)
+        cost = time.perf_counter() - start
+        print(f"ProxyLoader.load_file {cost:>6.2f}s  {total / cost:>10.0f} lines/s  pool {pool.length}  {stats}")
+
+        ''' 再次导入同一列表时所有代理都是重复的 '''
+        start = time.perf_counter()
+        stats = ProxyLoader(pool).load_file(path)
+        cost = time.perf_counter() - start
+        print(f"reload (all present)  {cost:>6.2f}s  {total / cost:>10.0f} lines/s  pool {pool.length}  {stats}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+    ProxyHealthMonitor 自适应检测计划的效果
+    稳定存活的代理、稳定失效的代理(拒绝连接)与每秒在存活和失效之间切换的代理各若干个,
+    后台检测运行一段时间后统计每类代理的检测次数以及整体检测速率(不超过 budget)
+
+    python -m benchmark.bench_proxy_monitor
+"""
+import time
+import socket
+import threading
+from core.ProcessProxy import WebProxy
+from core.ProcessProxyPool import ProxyPool
+from core.ProcessProxyMonitor import ProxyHealthMonitor
+from benchmark.server import start_server
+from benchmark.server import StandInProxyHandler
+
+
+def unused_address() -> str:
+    ''' 获取一个没有服务监听的本地地址, 连接会被拒绝 '''
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"127.0.0.1:{s.getsockname()[1]}"
+
+
+def flap(addresses: list, period: float, stop: threading.Event):
+    ''' 在相同端口上交替启动与关闭代理服务 '''
+    servers = list()
+    while not stop.is_set():
+        for address in addresses:
+            host, port = address.split(":")
+            servers.append(start_server(host, int(port), StandInProxyHandler)[0])
+        stop.wait(period)
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        servers.clear()
+        stop.wait(period)
+
+
+class CountingMonitor(ProxyHealthMonitor):
+    ''' 统计每类代理的检测次数 '''
+
+    def _probe(self, node):
+        kind = self.kinds[node.value]
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        super()._probe(node)
+
+
+def main(count: int = 4, seconds: float = 8, budget: float = 20):
+    origin, origin_address = start_server()
+    live = [start_server(handler=StandInProxyHandler) for _ in range(count)]
+    kinds = {"live": [address for _, address in live],
+             "dead": [unused_address() for _ in range(count)],
+             "flapping": [unused_address() for _ in range(count)]}
+    stop = threading.Event()
+    threading.Thread(target=flap, args=(kinds["flapping"], 1.0, stop), daemon=True).start()
+
+    pool, proxies = ProxyPool(count * 3), dict()
+    for kind, addresses in kinds.items():
+        for address in addresses:
+            proxy = WebProxy(f"http://{address}")
+            proxies[proxy] = kind
+            pool.add_node(proxy)
+
+    monitor = CountingMonitor(pool, f"http://{origin_address}/", budget=budget,
+                              min_interval=0.25, max_interval=4, timeout=(0.5, 0.5))
+    monitor.kinds, monitor.counts = proxies, dict()
+    monitor.start()
+    try:
+        start = time.monotonic()
+        while time.monotonic() - start < seconds:
+            time.sleep(seconds / 4)
+            print({key: round(value, 2) if isinstance(value, float) else value
+                   for key, value in monitor.stats().items()})
+    finally:
+        monitor.stop()
+        stop.set()
+        origin.shutdown()
+        for server, _ in live:
+            server.shutdown()
+    print(f"probes per proxy ({seconds}s, budget {budget}/s):")
+    for kind in kinds:
+        print(f"  {kind:<9} {monitor.counts.get(kind, 0) / count:>6.1f}")
+
+
+if __name__ == '__main__':
+    main()
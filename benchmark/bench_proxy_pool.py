@@ -0,0 +1,125 @@
+"""
+    原有单向循环链表代理池(LegacyProxyPool)与环形数组代理池 ProxyPool 的操作开销对比
+    每 100 个节点中只有 1 个可用节点, 模拟大规模代理列表中可用代理稀疏的情况
+
+    python -m benchmark.bench_proxy_pool
+"""
+import timeit
+from core.ProcessProxy import WebProxy
+from core.ProcessProxyPool import ProxyNode
+from core.ProcessProxyPool import ProxyPool
+
+# 可用节点的间隔
+HEALTHY_STEP = 100
+
+
+class LegacyProxyPool(object):
+    ''' 原有的单向循环链表实现(去掉容量上限以便对比), 仅用于基准测试 '''
+
+    def __init__(self, size: int = 5):
+        self.size = size
+        self.length = 0
+        self.pool = ProxyNode(None)
+        self.pool.next = self.pool
+        self.cur = self.pool
+
+    def is_empty(self):
+        return self.length == 0
+
+    def is_full(self) -> bool:
+        return self.length == self.size
+
+    def add_node(self, node):
+        head = self.pool
+        _new_node = ProxyNode(node)
+        if self.is_empty():
+            head.next = _new_node
+            _new_node.next = head
+            self.length = self.length + 1
+            return
+        if self.is_full():
+            self.delete_node()
+        else:
+            self.length = self.length + 1
+        _new_node.next = head.next
+        head.next = _new_node
+
+    def delete_node(self):
+        head = self.pool
+        if self.is_empty():
+            return None
+        pre = self.pool
+        cur = self.pool.next
+        while cur.next.id != head.id:
+            pre = pre.next
+            cur = cur.next
+        pre.next = head
+        _value = cur.value
+        cur.next = None
+        return _value
+
+    def search_node_index(self, index: int):
+        if self.is_empty():
+            return None
+        _index = 0
+        head = self.pool
+        node = self.pool
+        while _index < index:
+            node = node.next
+            _index = _index + 1
+            if node == head:
+                node = node.next
+        return node
+
+    def search_node_status(self):
+        if self.is_empty():
+            return None
+        head = self.cur
+        node = self.cur.next
+        while node != head:
+            if node.is_node and node.value.get_is_usable():
+                self.cur = node
+                return node
+            node = node.next
+        return None
+
+
+def fill(pool, size: int, usable: WebProxy, unusable: WebProxy):
+    for i in range(size):
+        pool.add_node(usable if i % HEALTHY_STEP == 0 else unusable)
+    return pool
+
+
+def measure(func, seconds: float = 0.2) -> float:
+    ''' 自动选择执行次数, 返回单次操作的耗时(秒) '''
+    number, cost = 1, 0.0
+    while True:
+        cost = timeit.timeit(func, number=number)
+        if cost >= seconds or number >= 1 << 20:
+            return cost / number
+        number = number * 4
+
+
+def main(sizes=(10, 1000, 50000)):
+    usable = WebProxy("http://127.0.0.1:8080")
+    # 格式不合法的代理地址始终处于不可用状态
+    unusable = WebProxy("not-a-proxy")
+
+    print(f"{'size':>6} {'operation':<12} {'legacy':>12} {'ring':>12} {'speedup':>9}")
+    for size in sizes:
+        legacy = fill(LegacyProxyPool(size), size, usable, unusable)
+        ring = fill(ProxyPool(size), size, usable, unusable)
+        cases = [
+            ("add (full)", lambda p: p.add_node(unusable)),
+            ("index mid", lambda p: p.search_node_index(size // 2)),
+            ("next usable", lambda p: p.search_node_status()),
+        ]
+        for name, func in cases:
+            legacy_cost = measure(lambda: func(legacy))
+            ring_cost = measure(lambda: func(ring))
+            print(f"{size:>6} {name:<12} {legacy_cost * 1e6:>10.2f}us {ring_cost * 1e6:>10.2f}us "
+                  f"{legacy_cost / ring_cost:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+    轮转选择代理(ProxyPool.search_node_status)与按延迟和成功率选择代理(ProxyPool.select_node)的尾延迟对比
+    使用模拟的代理耗时, 不涉及网络:
+        快速代理   耗时约 30ms
+        慢速代理   耗时约 3s, 在请求进行到一半时恢复为快速代理
+        不稳定代理 耗时约 30ms, 40% 的请求失败并等待 5s 超时
+    recovered share: 最后四分之一的请求中选择已恢复的慢速代理的比例(4/20 个代理, 均匀时约为 20%)
+
+    python -m benchmark.bench_proxy_select
+"""
+import random
+from core.ProcessProxy import WebProxy
+from core.ProcessProxyPool import ProxyPool
+
+FAST, SLOW, FLAKY = "fast", "slow", "flaky"
+
+
+def make_pool(fast: int, slow: int, flaky: int) -> (ProxyPool, dict):
+    pool = ProxyPool(fast + slow + flaky)
+    kinds = dict()
+    port = 10000
+    for kind, count in ((FAST, fast), (SLOW, slow), (FLAKY, flaky)):
+        for _ in range(count):
+            proxy = WebProxy(f"http://127.0.0.1:{port}")
+            pool.add_node(proxy)
+            kinds[proxy] = kind
+            port = port + 1
+    return pool, kinds
+
+
+def simulate(kind: str, recovered: bool) -> (bool, float):
+    ''' 模拟一次通过代理的请求, 返回 (是否成功, 耗时) '''
+    if kind == SLOW and not recovered:
+        return True, random.lognormvariate(0, 0.2) * 3
+    if kind == FLAKY and random.random() < 0.4:
+        return False, 5.0
+    return True, random.lognormvariate(0, 0.3) * 0.03
+
+
+def percentile(values: list, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(select: str, total: int) -> (list, float):
+    random.seed(1)
+    pool, kinds = make_pool(14, 4, 2)
+    latencies, slow_share = list(), 0
+    for index in range(total):
+        recovered = index >= total // 2
+        node = getattr(pool, select)()
+        success, latency = simulate(kinds[node.value], recovered)
+        node.value.record(success, latency)
+        latencies.append(latency)
+        if index >= total * 3 // 4 and kinds[node.value] == SLOW:
+            slow_share = slow_share + 1
+    return sorted(latencies), slow_share / (total - total * 3 // 4)
+
+
+def main(total: int = 20000):
+    print(f"{'strategy':<20} {'p50':>8} {'p95':>8} {'p99':>8} {'mean':>8}  recovered share")
+    for select in ("search_node_status", "select_node"):
+        latencies, share = run(select, total)
+        print(f"{select:<20} "
+              f"{percentile(latencies, 0.5) * 1e3:>6.0f}ms {percentile(latencies, 0.95) * 1e3:>6.0f}ms "
+              f"{percentile(latencies, 0.99) * 1e3:>6.0f}ms {sum(latencies) / len(latencies) * 1e3:>6.0f}ms  "
+              f"{share:>6.1%}")
+
+
+if __name__ == '__main__':
+    main()
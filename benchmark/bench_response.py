@@ -0,0 +1,42 @@
+"""
+    只读取状态码时, 结构化响应 WebResponse 与原有完整字符串拼接方式的开销对比
+    使用构造好的 requests.models.Response, 不涉及网络
+
+    python -m benchmark.bench_response
+"""
+import timeit
+import requests
+from core.ProcessResponse import WebResponse
+
+
+def make_response(size: int) -> requests.models.Response:
+    res = requests.models.Response()
+    res.status_code = 200
+    res.url = "http://127.0.0.1/index.php"
+    res.encoding = "utf-8"
+    res.headers.update({f"X-Header-{i}": "v" * 32 for i in range(16)})
+    res._content = b"x" * size
+    return res
+
+
+def legacy(res: requests.models.Response) -> int:
+    ''' WebRequest.make_response 原有的处理方式: 解码响应体并拼接完整字符串 '''
+    content = res.content.decode(res.encoding if res.encoding is not None else "UTF-8")
+    headers = "\r\n".join(f"{k}:{v}" for k, v in res.headers.items())
+    result = f"http/1.1 {res.url} {res.status_code}\r\n{headers}\r\n\r\n{content}"
+    return int(result.split(" ", 3)[2].split("\r\n", 1)[0])
+
+
+def main():
+    for size, number in ((1024, 20000), (1024 * 1024, 200), (16 * 1024 * 1024, 20)):
+        res = make_response(size)
+        _legacy = timeit.timeit(lambda: legacy(res), number=number) / number
+        _status = timeit.timeit(lambda: WebResponse.from_response("http/1.1", res).status_code,
+                                number=number) / number
+        _str = timeit.timeit(lambda: WebResponse.from_response("http/1.1", res).to_str(), number=number) / number
+        print(f"body {size:>9}B  legacy: {_legacy * 1e6:>10.2f}us  status only: {_status * 1e6:>8.2f}us  "
+              f"to_str: {_str * 1e6:>10.2f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+    GET 请求响应缓存(ResponseCache)的基准测试
+    多个线程在同一时间发送相同的 GET 请求(本地服务每个请求固定延迟 delay 毫秒), 分多轮进行
+    不使用缓存时每个请求都发送到本地服务, 使用缓存时相同的并发请求只发送一次, 之后的请求命中缓存
+    缓存过期后带有 ETag 的响应通过 If-None-Match 重新校验, 本地服务返回 304
+
+    python -m benchmark.bench_response_cache
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.ProcessRequest import WebRequest
+from core.ProcessResponseCache import ResponseCache
+from benchmark.server import start_server
+
+
+def run(address: str, cache: ResponseCache or None, threads: int, rounds: int, delay: int) -> (float, int):
+    content = f"GET /etag/{delay} HTTP/1.1\r\nHost: {address}\r\n\r\n"
+    barrier = threading.Barrier(threads)
+
+    def worker(_) -> int:
+        success = 0
+        for _ in range(rounds):
+            barrier.wait()
+            status, res = WebRequest(content=content, response_cache=cache).make_request(timeout=10)
+            success = success + (1 if status and res.content == b"ok" else 0)
+        return success
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        success = sum(executor.map(worker, range(threads)))
+    return time.perf_counter() - start, success
+
+
+def main(threads: int = 16, rounds: int = 20, delay: int = 20):
+    server, address = start_server()
+    total = threads * rounds
+    try:
+        for name, cache in (("no cache", None), ("cache ttl 60s", ResponseCache(ttl=60)),
+                            ("cache ttl 0s", ResponseCache(ttl=0))):
+            cost, success = run(address, cache, threads, rounds, delay)
+            stats = cache.stats() if cache is not None else dict()
+            print(f"{name:<14} {cost * 1e3:>9.2f}ms  {total / cost:>8.1f} req/s  success {success}/{total}  "
+                  f"{stats}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+    请求重试策略(RetryPolicy)的总耗时上限与错误分类
+    黑洞服务接受连接但从不响应, 每次请求都在读取超时后失败; 关闭的端口每次请求都被拒绝连接
+    不设置总耗时上限时失败请求的耗时为 (重试次数 + 1) * 超时时间, 设置后在总耗时上限内放弃
+
+    python -m benchmark.bench_retry
+"""
+import time
+import socket
+from core.ProcessRequest import WebRequest
+from core.ProcessRetryPolicy import RetryPolicy
+from benchmark.server import start_server
+from benchmark.server import start_black_hole
+
+
+def closed_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def run(address: str, policy: RetryPolicy or None, timeout: float) -> (bool, str, float):
+    request = WebRequest(content=f"GET / HTTP/1.1\r\nHost: {address}\r\n\r\n", retry_policy=policy)
+    start = time.perf_counter()
+    status, _ = request.make_request(timeout=timeout)
+    return status, request.last_error, time.perf_counter() - start
+
+
+def main(timeout: float = 1.0, try_times: int = 3, budget: float = 1.5):
+    server, address = start_server()
+    black_hole, black_hole_address = start_black_hole()
+    dead_address = f"127.0.0.1:{closed_port()}"
+    policies = (
+        ("no retry", None),
+        (f"retry x{try_times}", RetryPolicy(try_times=try_times, budget=None)),
+        (f"retry x{try_times} budget {budget}s", RetryPolicy(try_times=try_times, budget=budget)),
+    )
+    try:
+        for target, _address in (("origin", address), ("black hole", black_hole_address),
+                                 ("closed port", dead_address)):
+            for name, policy in policies:
+                status, cause, cost = run(_address, policy, timeout)
+                print(f"{target:<12} {name:<24} status {str(status):<5}  cause {str(cause):<12}  "
+                      f"{cost * 1e3:>8.2f}ms")
+    finally:
+        server.shutdown()
+        black_hole.close()
+
+
+if __name__ == '__main__':
+    main()
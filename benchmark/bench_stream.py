@@ -0,0 +1,48 @@
+"""
+    大响应下载的吞吐量与峰值内存基准测试
+    full:   WebRequest.make_response 读取并拼接完整响应
+    stream: WebRequest.save_response 按块交给回调函数
+    每种方式在独立的子进程中运行, 以便分别统计峰值RSS
+
+    python -m benchmark.bench_stream [size_mb]
+"""
+import sys
+import time
+import resource
+import subprocess
+from core.ProcessRequest import WebRequest
+from benchmark.server import start_server
+
+
+def peak_rss_mb() -> float:
+    ''' linux 下 ru_maxrss 的单位为 KB '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(mode: str, address: str, size: int):
+    request = WebRequest(content=f"GET /bytes/{size} HTTP/1.1\r\nHost: {address}\r\n\r\n")
+    start = time.perf_counter()
+    if mode == "full":
+        status, result = request.make_response(charset="latin-1")
+        total = len(result)
+    else:
+        status, total = request.save_response(lambda chunk: None)
+    cost = time.perf_counter() - start
+    print(f"{mode:<8} {status!s:<6} {total / cost / 1024 / 1024:>10.1f} MB/s  peak rss {peak_rss_mb():>8.1f} MB")
+
+
+def main(size_mb: int = 256):
+    server, address = start_server()
+    try:
+        for mode in ("full", "stream"):
+            subprocess.run([sys.executable, "-m", "benchmark.bench_stream", mode, address, str(size_mb * 1024 * 1024)],
+                           check=False)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4:
+        run(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) == 2 else 256)
@@ -0,0 +1,30 @@
+"""
+    重复发送同一HTTP Request报文时, 每次完整解析校验与使用 WebRequestsTemplate 渲染的开销对比
+
+    python -m benchmark.bench_template
+"""
+import timeit
+from core.ProcessRequestData import WebRequestsData
+from core.ProcessRequestTemplate import WebRequestsTemplate
+from benchmark.bench_parse import SMALL_GET
+
+
+def main(number: int = 50000):
+    template = WebRequestsTemplate(content=SMALL_GET)
+    cases = [
+        ("parse + check", lambda: WebRequestsData(content=SMALL_GET.replace("/index.php", "/admin.php"))),
+        ("render path", lambda: template.render(path="/admin.php")),
+        ("render header", lambda: template.render(headers={'cookie': 'PHPSESSID=1'})),
+        ("render data", lambda: template.render(data="id=1")),
+        ("render bytes", lambda: template.render_bytes(path="/admin.php")),
+        ("requests data", lambda: template.make_requests_data(path="/admin.php")),
+    ]
+    base = None
+    for name, func in cases:
+        cost = timeit.timeit(func, number=number) / number
+        base = cost if base is None else base
+        print(f"{name:<16} {cost * 1e6:>10.2f}us  {base / cost:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+    requests.Session 与原始套接字传输(RawTransport)发送相同报文时的单请求CPU耗时对比
+    两种方式都复用 keep-alive 连接, 请求本地HTTP服务
+
+    python -m benchmark.bench_transport
+"""
+import time
+from core.ProcessRequest import WebRequest
+from core.ProcessRequestData import WebRequestsData
+from benchmark.server import start_server
+
+
+def run(name: str, func, number: int):
+    func()
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(number):
+        status, _ = func()
+        assert status
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    print(f"{name:<10} cpu {cpu / number * 1e6:>9.1f}us/req  wall {wall / number * 1e6:>9.1f}us/req")
+
+
+def main(number: int = 2000):
+    server, address = start_server()
+    content = (
+        f"GET /index.php?id=1 HTTP/1.1\r\nHost: {address}\r\n"
+        "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/119.0\r\n"
+        "Accept: */*\r\n\r\n"
+    ).encode("latin-1")
+    request = WebRequest(requests_data=WebRequestsData(content=content))
+    try:
+        run("requests", lambda: request.make_web_response(), number)
+        run("raw", lambda: request.make_raw_response(), number)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
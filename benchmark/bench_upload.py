@@ -0,0 +1,68 @@
+"""
+    大文件流式上传的吞吐量与峰值内存基准测试
+    path:    WebRequestsBody.from_path (content-length)
+    chunked: WebRequestsBody.from_iterable 长度未知, 使用 chunked 传输编码
+    每种方式在独立的子进程中运行, 以便分别统计峰值RSS
+
+    python -m benchmark.bench_upload [size_mb]
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess
+from core.ProcessRequest import WebRequest
+from core.ProcessRequestBody import WebRequestsBody
+from core.ProcessRequestTemplate import WebRequestsTemplate
+from benchmark.server import start_server
+from benchmark.bench_stream import peak_rss_mb
+
+
+def make_file(path: str, size: int):
+    chunk = b"x" * (1024 * 1024)
+    with open(path, 'wb') as f:
+        while size > 0:
+            f.write(chunk[:size])
+            size = size - len(chunk)
+
+
+def read_file(path: str, size: int) -> iter:
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def run(mode: str, address: str, path: str):
+    template = WebRequestsTemplate(content=f"POST /upload HTTP/1.1\r\nHost: {address}\r\n\r\n")
+    if mode == "path":
+        body = WebRequestsBody.from_path(path)
+    else:
+        body = WebRequestsBody.from_iterable(read_file(path, 1024 * 1024))
+    request = WebRequest(requests_data=template.make_requests_data(data=body))
+    start = time.perf_counter()
+    status, res = request.make_request()
+    cost = time.perf_counter() - start
+    total = int(res.text) if status else 0
+    print(f"{mode:<8} {status!s:<6} {total / cost / 1024 / 1024:>10.1f} MB/s  peak rss {peak_rss_mb():>8.1f} MB")
+
+
+def main(size_mb: int = 1024):
+    server, address = start_server()
+    path = os.path.join(tempfile.gettempdir(), "deep_sea_torpedo_upload.bin")
+    try:
+        make_file(path, size_mb * 1024 * 1024)
+        for mode in ("path", "chunked"):
+            subprocess.run([sys.executable, "-m", "benchmark.bench_upload", mode, address, path], check=False)
+    finally:
+        server.shutdown()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4:
+        run(sys.argv[1], sys.argv[2], sys.argv[3])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) == 2 else 1024)
@@ -0,0 +1,276 @@
+"""
+    基准测试使用的本地HTTP服务(替代真实目标)
+    GET  /delay/<ms>   等待 ms 毫秒后返回 ok
+    GET  /bytes/<n>    返回 n 字节的数据
+    GET  /etag/<ms>    等待 ms 毫秒后返回带有 ETag 的 ok, 请求带有相同的 If-None-Match 时返回 304
+    GET  其他路径       返回 ok
+    POST 任意路径       读取请求体(支持 content-length 与 chunked)并返回读取的字节数
+
+    本地HTTP代理(替代真实代理)
+    CONNECT host:port  建立隧道
+    GET/POST http://.. 转发请求(每个请求使用新的上游连接, 转发后关闭)
+
+    本地HTTPS服务(替代真实HTTPS目标)
+    与本地HTTP服务相同, 使用 openssl 临时生成的自签名证书
+
+    黑洞服务(替代失效代理)
+    接受连接后不读取也不返回任何数据, 直到客户端超时断开
+"""
+import os
+import ssl
+import sys
+import time
+import socket
+import select
+import tempfile
+import threading
+import subprocess
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+# 返回大数据时每次写入的块大小
+CHUNK_SIZE = 64 * 1024
+# /etag 路径返回的 ETag
+ETAG = '"v1"'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头与响应体分两次写入, 关闭 Nagle 算法避免与客户端的延迟确认叠加产生约 40ms 的延迟
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, body: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self) -> (str, int):
+        ''' WebRequest 构造的URL中路径以 // 开头, 这里统一去掉多余的 / '''
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        try:
+            return parts[0], int(parts[1]) if len(parts) > 1 else 0
+        except ValueError:
+            return parts[0], 0
+
+    def do_GET(self):
+        name, value = self._route()
+        if name == "delay":
+            time.sleep(value / 1000)
+        elif name == "etag":
+            time.sleep(value / 1000)
+            if self.headers.get("If-None-Match", None) == ETAG:
+                self.send_response(304)
+                self.send_header("ETag", ETAG)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+            return
+        elif name == "bytes":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(value))
+            self.end_headers()
+            chunk = b"x" * CHUNK_SIZE
+            while value > 0:
+                self.wfile.write(chunk[:value])
+                value = value - CHUNK_SIZE
+            return
+        self._reply(b"ok")
+
+    def _drain_chunked(self) -> int:
+        total = 0
+        while True:
+            size = int(self.rfile.readline().split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                ''' 读取 trailer 直到空行 '''
+                while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                return total
+            while size > 0:
+                data = self.rfile.read(min(size, CHUNK_SIZE))
+                if not data:
+                    return total
+                size = size - len(data)
+                total = total + len(data)
+            self.rfile.readline()
+
+    def do_POST(self):
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            total = self._drain_chunked()
+        else:
+            remain = int(self.headers.get("Content-Length", 0) or 0)
+            total = 0
+            while remain > 0:
+                data = self.rfile.read(min(remain, CHUNK_SIZE))
+                if not data:
+                    break
+                remain = remain - len(data)
+                total = total + len(data)
+        self._reply(str(total).encode())
+
+    do_PUT = do_POST
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        ''' 客户端提前断开连接(例如只读取了响应头)属于正常情况 '''
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StandInProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    # 收到的 CONNECT 请求数量, 用于确认 HTTPS 请求确实经过了代理
+    connects = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_CONNECT(self):
+        StandInProxyHandler.connects = StandInProxyHandler.connects + 1
+        host, _, port = self.path.rpartition(":")
+        try:
+            upstream = socket.create_connection((host, int(port)), timeout=10)
+        except (OSError, ValueError):
+            self.send_error(502)
+            return
+        self.send_response(200, "Connection Established")
+        self.end_headers()
+        self.close_connection = True
+        self._relay(upstream)
+
+    def _relay(self, upstream: socket.socket):
+        sockets = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, _ = select.select(sockets, [], [], 30)
+                if not readable:
+                    return
+                for item in readable:
+                    data = item.recv(CHUNK_SIZE)
+                    if not data:
+                        return
+                    (upstream if item is self.connection else self.connection).sendall(data)
+        finally:
+            upstream.close()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            upstream = socket.create_connection((url.hostname, url.port or 80), timeout=10)
+        except (OSError, TypeError):
+            self.send_error(502)
+            return
+        skip = ("proxy-authorization", "proxy-connection", "connection")
+        headers = "".join(f"{k}: {v}\r\n" for k, v in self.headers.items() if k.lower() not in skip)
+        path = url.path + (f"?{url.query}" if url.query else "")
+        head = f"{self.command} {path or '/'} HTTP/1.1\r\n{headers}Connection: close\r\n\r\n"
+        upstream.sendall(head.encode("latin-1"))
+        remain = int(self.headers.get("Content-Length", 0) or 0)
+        while remain > 0:
+            data = self.rfile.read(min(remain, CHUNK_SIZE))
+            if not data:
+                break
+            upstream.sendall(data)
+            remain = remain - len(data)
+        ''' 上游连接在响应结束后关闭, 客户端连接同样关闭 '''
+        self.close_connection = True
+        try:
+            while True:
+                data = upstream.recv(CHUNK_SIZE)
+                if not data:
+                    return
+                self.wfile.write(data)
+        finally:
+            upstream.close()
+
+    do_POST = do_GET
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, handler=StandInHandler) -> (StandInServer, str):
+    """
+        在后台线程中启动本地HTTP服务
+    :param host: 监听地址
+    :param port: 监听端口, 0 表示随机端口
+    :param handler: 请求处理类, StandInHandler(目标服务) 或 StandInProxyHandler(代理)
+    :return: (服务对象, host:port)
+    """
+    server = StandInServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{server.server_address[0]}:{server.server_address[1]}"
+
+
+def make_certificate(directory: str, host: str = "127.0.0.1") -> (str, str) or None:
+    """
+        使用 openssl 生成自签名证书
+    :param directory: 证书与私钥保存的目录
+    :param host: 证书中的 IP 地址
+    :return: (证书路径, 私钥路径), 没有 openssl 时返回 None
+    """
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    try:
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                        "-subj", f"/CN={host}", "-addext", f"subjectAltName=IP:{host}",
+                        "-keyout", key, "-out", cert], check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return cert, key
+
+
+def start_tls_server(host: str = "127.0.0.1", port: int = 0,
+                     handler=StandInHandler) -> (StandInServer, str) or (None, None):
+    """
+        在后台线程中启动本地HTTPS服务
+    :param host: 监听地址
+    :param port: 监听端口, 0 表示随机端口
+    :param handler: 请求处理类
+    :return: (服务对象, host:port), 无法生成证书时返回 (None, None)
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        files = make_certificate(directory, host)
+        if files is None:
+            return None, None
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*files)
+    server = StandInServer((host, port), handler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{server.server_address[0]}:{server.server_address[1]}"
+
+
+def start_black_hole(host: str = "127.0.0.1", port: int = 0) -> (socket.socket, str):
+    """
+        在后台线程中启动黑洞服务
+    :param host: 监听地址
+    :param port: 监听端口, 0 表示随机端口
+    :return: (监听套接字, host:port), 关闭监听套接字即停止服务
+    """
+    listener = socket.create_server((host, port), backlog=1024)
+    connections = list()
+
+    def serve():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                break
+            connections.append(connection)
+        for connection in connections:
+            connection.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener, f"{listener.getsockname()[0]}:{listener.getsockname()[1]}"
@@ -0,0 +1,220 @@
+"""
+    端到端基准测试套件, 结果保存为 JSON, 可以与之前的结果对比并标记性能回退
+    使用本地HTTP/HTTPS服务替代真实目标, 本地HTTP代理(CONNECT 隧道)替代真实代理, 黑洞服务替代失效代理
+        parse_*        WebRequestsData 解析(stream 模式 str/bytes 报文, dict 模式)
+        request_*      WebRequest.make_request / make_response 的吞吐量与耗时分位数(HTTP、HTTPS、经过代理的HTTPS)
+        proxy_pool_*   ProxyPool 大规模添加、按id查找、选择代理
+        proxy_check_*  ProxyHealthChecker 并发检测一半存活、一半失效的代理
+    每项结果: {value: 数值, unit: 单位, better: lower|higher}
+    对比时 better=lower 的结果增加超过 threshold(比例) 或 better=higher 的结果减少超过 threshold 视为回退
+
+    python -m benchmark.suite [--output result.json] [--baseline baseline.json] [--threshold 0.2] [--quick]
+    存在回退时退出码为 1
+"""
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+from core.ProcessProxy import WebProxy
+from core.ProcessProxyPool import ProxyPool
+from core.ProcessProxyChecker import ProxyHealthChecker
+from core.ProcessRequest import WebRequest
+from core.ProcessRequestData import WebRequestsData
+from benchmark.server import start_server
+from benchmark.server import start_tls_server
+from benchmark.server import start_black_hole
+from benchmark.server import StandInProxyHandler
+from benchmark.bench_parse import SMALL_GET
+
+# 对比结果时默认允许的变化比例
+THRESHOLD = 0.2
+
+
+def result(value: float, unit: str, better: str = "lower") -> dict:
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def bench_parse(number: int) -> dict:
+    raw = SMALL_GET.encode("latin-1")
+    headers = {'host': '127.0.0.1:8080', 'user-agent': 'Mozilla/5.0', 'connection': 'close'}
+    cases = {
+        'parse_stream_str': lambda: WebRequestsData(content=SMALL_GET),
+        'parse_stream_bytes': lambda: WebRequestsData(content=raw),
+        'parse_dict': lambda: WebRequestsData(mode='dict', method='get', path='/index.php?id=1',
+                                              version='HTTP/1.1', headers=headers),
+    }
+    return {name: result(timeit.timeit(func, number=number) / number * 1e6, "us")
+            for name, func in cases.items()}
+
+
+def bench_request(name: str, content: str, total: int, protocol: str = 'http',
+                  proxy: WebProxy or None = None, response: bool = False) -> dict:
+    """
+        顺序发送 total 个请求(复用会话), 统计吞吐量与耗时分位数
+    """
+    costs = list()
+    success = 0
+    start = time.perf_counter()
+    for _ in range(total):
+        _start = time.perf_counter()
+        request = WebRequest(proxy, content=content, protocol=protocol)
+        status, _ = request.make_response(timeout=10) if response else request.make_request(timeout=10)
+        costs.append(time.perf_counter() - _start)
+        success = success + (1 if status else 0)
+    cost = time.perf_counter() - start
+    return {
+        f'{name}_rps': result(total / cost, "req/s", "higher"),
+        f'{name}_p50': result(percentile(costs, 50) * 1e3, "ms"),
+        f'{name}_p95': result(percentile(costs, 95) * 1e3, "ms"),
+        f'{name}_p99': result(percentile(costs, 99) * 1e3, "ms"),
+        f'{name}_errors': result(total - success, "count"),
+    }
+
+
+def bench_requests(total: int) -> dict:
+    results = dict()
+    origin, address = start_server()
+    tls_origin, tls_address = start_tls_server()
+    proxy_server, proxy_address = start_server(handler=StandInProxyHandler)
+    try:
+        content = f"GET / HTTP/1.1\r\nHost: {address}\r\n\r\n"
+        results.update(bench_request("request_http", content, total))
+        results.update(bench_request("response_http", content, total, response=True))
+        if tls_origin is not None:
+            content = f"GET / HTTP/1.1\r\nHost: {tls_address}\r\n\r\n"
+            results.update(bench_request("request_https", content, total, 'https'))
+            connects = StandInProxyHandler.connects
+            results.update(bench_request("request_https_proxy", content, total, 'https',
+                                         WebProxy(f"http://{proxy_address}")))
+            assert StandInProxyHandler.connects > connects, "https requests did not go through the proxy"
+    finally:
+        origin.shutdown()
+        proxy_server.shutdown()
+        if tls_origin is not None:
+            tls_origin.shutdown()
+    return results
+
+
+def bench_proxy_pool(size: int) -> dict:
+    proxies = [WebProxy(f"http://10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}:8080") for i in range(size)]
+    pool = ProxyPool(size)
+    start = time.perf_counter()
+    pool.add_nodes(proxies)
+    add_cost = time.perf_counter() - start
+    ids = [node.id for node in pool.iter_nodes()]
+    number = min(size, 100000)
+    search_cost = timeit.timeit(lambda: pool.search_node_id(ids[len(ids) // 2]), number=number) / number
+    select_cost = timeit.timeit(pool.select_node, number=number) / number
+    return {
+        'proxy_pool_add': result(add_cost / size * 1e6, "us"),
+        'proxy_pool_search_id': result(search_cost * 1e6, "us"),
+        'proxy_pool_select': result(select_cost * 1e6, "us"),
+    }
+
+
+def bench_proxy_check(live: int, dead: int) -> dict:
+    origin, origin_address = start_server()
+    servers, black_holes, proxies = list(), list(), list()
+    for _ in range(live):
+        server, address = start_server(handler=StandInProxyHandler)
+        servers.append(server)
+        proxies.append(WebProxy(f"http://{address}"))
+    for _ in range(dead):
+        listener, address = start_black_hole()
+        black_holes.append(listener)
+        proxies.append(WebProxy(f"http://{address}"))
+    try:
+        checker = ProxyHealthChecker(deadline=30, timeout=(0.5, 0.5), try_times=1, backoff=0.1)
+        start = time.perf_counter()
+        results = checker.check(proxies, f"http://{origin_address}/")
+        cost = time.perf_counter() - start
+        correct = [item.status for item in results] == [True] * live + [False] * dead
+    finally:
+        origin.shutdown()
+        for server in servers:
+            server.shutdown()
+        for listener in black_holes:
+            listener.close()
+    return {
+        'proxy_check_sweep': result(cost, "s"),
+        'proxy_check_errors': result(0 if correct else 1, "count"),
+    }
+
+
+def run(quick: bool = False) -> dict:
+    results = dict()
+    results.update(bench_parse(2000 if quick else 20000))
+    results.update(bench_requests(100 if quick else 1000))
+    results.update(bench_proxy_pool(10000 if quick else 100000))
+    results.update(bench_proxy_check(4 if quick else 16, 4 if quick else 16))
+    return {
+        'meta': {
+            'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': quick
+        },
+        'results': results
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = THRESHOLD) -> list:
+    """
+        对比两次基准测试的结果
+    :param current: 本次结果
+    :param baseline: 之前的结果
+    :param threshold: 允许的变化比例
+    :return: [(名称, 之前的值, 本次的值, 变化比例), ...] 超过允许变化比例的回退项
+    """
+    regressions = list()
+    for name, item in current['results'].items():
+        base = baseline.get('results', dict()).get(name, None)
+        if base is None:
+            continue
+        if base['value'] == 0:
+            ''' 错误数量等基准为 0 的结果, 任何增加都视为回退 '''
+            if item['better'] == "lower" and item['value'] > 0:
+                regressions.append((name, base['value'], item['value'], float('inf')))
+            continue
+        change = (item['value'] - base['value']) / base['value']
+        if (item['better'] == "lower" and change > threshold) or (item['better'] == "higher" and -change > threshold):
+            regressions.append((name, base['value'], item['value'], change))
+    return regressions
+
+
+def main(argv: list or None = None) -> int:
+    parser = argparse.ArgumentParser(description="end-to-end benchmark suite")
+    parser.add_argument("--output", default=None, help="path of the JSON result")
+    parser.add_argument("--baseline", default=None, help="path of a previous JSON result to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed relative change")
+    parser.add_argument("--quick", action="store_true", help="run a smaller workload")
+    args = parser.parse_args(argv)
+
+    current = run(args.quick)
+    for name, item in current['results'].items():
+        print(f"{name:<28} {item['value']:>14.3f} {item['unit']:<6} ({item['better']} is better)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    for name, before, after, change in regressions:
+        print(f"[!] regression {name:<28} {before:.3f} -> {after:.3f} ({change:+.1%})")
+    if not regressions:
+        print(f"[+] no regression beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import asyncio
+import weakref
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from core.ProcessRequest import WebRequest
+from core.ProcessRequestData import WebRequestsData
+from core.ProcessProxy import WebProxy
+from utils.default import HTTP_REQUEST_ASYNC_HOST_CONCURRENCY
+from utils.default import HTTP_REQUEST_ASYNC_MAX_WORKERS
+from utils.default import HTTP_REQUEST_ASYNC_TIMEOUT
+
+
+class AsyncRequestEngine(object):
+    """
+        AsyncRequestEngine 在 asyncio 中执行 WebRequest 的调度器
+        ================================================================
+        host_concurrency: 每个主机允许同时进行的请求数量(按主机分配信号量)
+        max_workers: 执行阻塞请求的线程数量, 请求仍然通过 WebRequest 与会话复用池发送
+        每个事件循环拥有独立的信号量, 同一个调度器可以在多次 asyncio.run 之间复用
+    """
+    HTTP_REQUEST_ASYNC_HOST_CONCURRENCY = HTTP_REQUEST_ASYNC_HOST_CONCURRENCY
+    HTTP_REQUEST_ASYNC_MAX_WORKERS = HTTP_REQUEST_ASYNC_MAX_WORKERS
+
+    __slots__ = ('host_concurrency', 'executor', '_semaphores')
+
+    def __init__(self, host_concurrency: int = HTTP_REQUEST_ASYNC_HOST_CONCURRENCY,
+                 max_workers: int = HTTP_REQUEST_ASYNC_MAX_WORKERS):
+        self.host_concurrency = host_concurrency if host_concurrency > 0 else self.HTTP_REQUEST_ASYNC_HOST_CONCURRENCY
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers if max_workers > 0 else self.HTTP_REQUEST_ASYNC_MAX_WORKERS)
+        # 事件循环 => {host: asyncio.Semaphore}
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def semaphore(self, host: str) -> asyncio.Semaphore:
+        """
+            获取当前事件循环中某个主机的并发信号量
+        :param host: 请求的目标主机
+        :return: asyncio.Semaphore
+        """
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), dict())
+        _semaphore = semaphores.get(host, None)
+        if _semaphore is None:
+            _semaphore = semaphores[host] = asyncio.Semaphore(self.host_concurrency)
+        return _semaphore
+
+    async def run(self, request: WebRequest, timeout: float or None, func, *args) -> (bool, any):
+        """
+            在主机信号量限制下执行 WebRequest 的阻塞方法
+            超时返回 (False, "请求超时"); 任务被取消时抛出 asyncio.CancelledError
+            主机的并发名额在线程中的阻塞请求真正结束后才归还, 超时或取消不会使同一主机的并发数量超过限制,
+            因此 func 的参数中应当包含有限的超时时间, 使阻塞请求在超时之后自行结束
+        :param request: WebRequest
+        :param timeout: 请求超时时间(秒)
+        :param func: WebRequest 的阻塞方法(make_request/make_response)
+        :return: 与 func 相同的 (bool, result)
+        """
+        if request.session_key is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        semaphore = self.semaphore(request.data.package['header']['host'])
+        await semaphore.acquire()
+        try:
+            future = self.executor.submit(functools.partial(func, *args))
+        except Exception:
+            semaphore.release()
+            raise
+        future.add_done_callback(functools.partial(self._release, loop, semaphore))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            return False, "请求超时"
+
+    @classmethod
+    def _release(cls, loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore, future):
+        ''' 在执行请求的线程中调用, 信号量只能在事件循环线程中归还 '''
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            ''' 事件循环已经关闭, 信号量随事件循环一起失效 '''
+            pass
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+
+class AsyncWebRequest(object):
+    """
+        AsyncWebRequest 在 asyncio 中使用的 WebRequest
+        ================================================================
+        参数与 WebRequest 相同, make_request/make_response 返回与 WebRequest 相同的 (bool, result)
+        timeout: 单个请求的超时时间(秒), 同时作为底层 requests 的超时时间, 为空时使用 HTTP_REQUEST_ASYNC_TIMEOUT
+        engine: 调度器, 默认使用进程级别的 AsyncRequestEngine
+    """
+    # 进程级别的默认调度器, 第一次使用时创建
+    ENGINE = None
+
+    __slots__ = ('request', 'timeout', 'engine')
+
+    def __init__(self, proxies: None or WebProxy = None, *args, requests_data: WebRequestsData or None = None,
+                 timeout: float = HTTP_REQUEST_ASYNC_TIMEOUT, engine: AsyncRequestEngine or None = None, **kwargs):
+        self.request = WebRequest(proxies, *args, requests_data=requests_data, **kwargs)
+        ''' 底层请求必须有有限的超时时间, 否则超时或取消之后线程中的请求可能一直占用并发名额 '''
+        self.timeout = timeout if timeout else HTTP_REQUEST_ASYNC_TIMEOUT
+        self.engine = engine if isinstance(engine, AsyncRequestEngine) else self.get_engine()
+
+    @classmethod
+    def get_engine(cls) -> AsyncRequestEngine:
+        if AsyncWebRequest.ENGINE is None:
+            AsyncWebRequest.ENGINE = AsyncRequestEngine()
+        return AsyncWebRequest.ENGINE
+
+    async def make_request(self) -> (bool, str or object):
+        return await self.engine.run(self.request, self.timeout, self.request.make_request, self.timeout)
+
+    async def make_response(self, charset="UTF-8") -> (bool, str):
+        status, res = await self.engine.run(self.request, self.timeout, self.request.make_response, charset,
+                                            self.timeout)
+        return (status, res) if status else (False, "")
@@ -0,0 +1,148 @@
+import time
+import socket
+import ipaddress
+import threading
+from collections import OrderedDict
+from utils.default import HTTP_REQUEST_DNS_CACHE_TTL
+from utils.default import HTTP_REQUEST_DNS_CACHE_NEGATIVE_TTL
+from utils.default import HTTP_REQUEST_DNS_CACHE_MAX_SIZE
+
+
+class DNSCache(object):
+    """
+        DNSCache 进程内的域名解析缓存
+        ================================================================
+        ttl: 解析成功的结果的缓存时间(秒)
+        negative_ttl: 域名不存在的结果的缓存时间(秒), 缓存期间直接抛出相同的异常; 临时性的解析失败不缓存
+        max_size: 最多缓存的解析结果数量, 超出时淘汰最久未使用的结果
+        resolver: 实际进行解析的函数, 参数与 socket.getaddrinfo 相同(可以替换为测试使用的解析函数)
+        hits / misses / negative_hits: 命中成功结果 / 未命中 / 命中失败结果的次数
+        saved: 命中缓存节省的解析耗时(秒), 按该结果第一次解析的耗时计算
+        IP 地址不经过缓存与解析函数
+    """
+    HTTP_REQUEST_DNS_CACHE_TTL = HTTP_REQUEST_DNS_CACHE_TTL
+    HTTP_REQUEST_DNS_CACHE_NEGATIVE_TTL = HTTP_REQUEST_DNS_CACHE_NEGATIVE_TTL
+    HTTP_REQUEST_DNS_CACHE_MAX_SIZE = HTTP_REQUEST_DNS_CACHE_MAX_SIZE
+    # 可以缓存的解析失败(域名不存在 / 没有对应的地址), 其余错误(例如 EAI_AGAIN)可能很快恢复, 不缓存
+    NEGATIVE_ERRNO = tuple(getattr(socket, name) for name in ("EAI_NONAME", "EAI_NODATA") if hasattr(socket, name))
+
+    __slots__ = ('ttl', 'negative_ttl', 'max_size', 'resolver', 'hits', 'misses', 'negative_hits', 'saved',
+                 '_cache', '_lock')
+
+    def __init__(self, ttl: float = HTTP_REQUEST_DNS_CACHE_TTL,
+                 negative_ttl: float = HTTP_REQUEST_DNS_CACHE_NEGATIVE_TTL,
+                 max_size: int = HTTP_REQUEST_DNS_CACHE_MAX_SIZE, resolver: callable = socket.getaddrinfo):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max(1, max_size)
+        self.resolver = resolver
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.saved = 0.0
+        # (host, port, family, type) => (过期时间, 解析结果或解析失败的 (errno, strerror), 解析耗时)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def is_ip(cls, host: str) -> bool:
+        try:
+            ipaddress.ip_address(host.strip("[]"))
+            return True
+        except ValueError:
+            return False
+
+    def lookup(self, host: str, port: int, family: int = socket.AF_UNSPEC,
+               type: int = socket.SOCK_STREAM) -> (list, float or None):
+        """
+            解析主机名, 优先使用缓存的结果
+        :param host: 主机名
+        :param port: 端口
+        :param family: 地址族
+        :param type: 套接字类型
+        :return: (socket.getaddrinfo 格式的解析结果, 命中缓存时节省的解析耗时, 未命中时为 None)
+        """
+        if self.is_ip(host):
+            return socket.getaddrinfo(host.strip("[]"), port, family, type), None
+
+        key = (host.lower(), port, family, type)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key, None)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(key)
+                self.saved = self.saved + entry[2]
+                if isinstance(entry[1], tuple):
+                    ''' 每次抛出新的异常, 缓存的异常对象会累积调用栈并持有调用者的局部变量 '''
+                    self.negative_hits = self.negative_hits + 1
+                    raise socket.gaierror(*entry[1])
+                self.hits = self.hits + 1
+                return entry[1], entry[2]
+            self.misses = self.misses + 1
+
+        start = time.perf_counter()
+        try:
+            result = self.resolver(host, port, family, type)
+            ttl = self.ttl
+        except socket.gaierror as e:
+            if e.errno not in self.NEGATIVE_ERRNO:
+                raise
+            result = e.args
+            ttl = self.negative_ttl
+        cost = time.perf_counter() - start
+
+        with self._lock:
+            self._cache[key] = (time.monotonic() + ttl, result, cost)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        if isinstance(result, tuple):
+            raise socket.gaierror(*result)
+        return result, None
+
+    def resolve(self, host: str, port: int, family: int = socket.AF_UNSPEC,
+                type: int = socket.SOCK_STREAM) -> list:
+        """
+            与 socket.getaddrinfo 相同的调用方式, 返回解析结果
+        """
+        return self.lookup(host, port, family, type)[0]
+
+    def create_connection(self, address: tuple, timeout: float or None = None) -> socket.socket:
+        """
+            与 socket.create_connection 相同, 主机名通过缓存解析, 依次尝试所有解析出的地址
+        :param address: (host, port)
+        :param timeout: 连接超时时间(秒)
+        :return: socket
+        """
+        host, port = address
+        error = None
+        for family, type, proto, _, sockaddr in self.resolve(host, port):
+            sock = None
+            try:
+                sock = socket.socket(family, type, proto)
+                sock.settimeout(timeout)
+                sock.connect(sockaddr)
+                return sock
+            except OSError as e:
+                error = e
+                if sock is not None:
+                    sock.close()
+        raise error if error is not None else OSError(f"getaddrinfo returns an empty list for {host}")
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._cache),
+                'hits': self.hits,
+                'misses': self.misses,
+                'negative_hits': self.negative_hits,
+                'saved': self.saved
+            }
+
+
+# 进程级别的域名解析缓存, WebRequest、原始套接字传输与代理存活性检测共用
+DNS_CACHE = DNSCache()
@@ -0,0 +1,289 @@
+import threading
+from bisect import bisect_left
+from utils.default import HTTP_REQUEST_METRICS_HOST
+from utils.default import HTTP_REQUEST_METRICS_PORT
+from utils.default import HTTP_REQUEST_METRICS_BUCKETS
+
+
+class MetricCounter(object):
+    """
+        只增不减的计数, 每组标签值单独计数
+        ================================================================
+        name: 指标名称
+        help: 指标说明
+        label_names: 标签名称, inc 时按相同顺序传入标签值
+        每个线程只修改自己的计数字典(不需要加锁), 导出时汇总所有线程的计数
+        已经结束的线程的计数在新线程第一次计数或导出时合并到基础计数中, 计数字典的数量不超过存活的线程数量
+    """
+    TYPE = "counter"
+
+    __slots__ = ('name', 'help', 'label_names', '_local', '_shards', '_base', '_lock')
+
+    def __init__(self, name: str, help: str = "", label_names: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._local = threading.local()
+        # [(线程, 标签值 => 计数 字典), ...]
+        self._shards = list()
+        # 已经结束的线程合并后的 标签值 => 计数
+        self._base = dict()
+        self._lock = threading.Lock()
+
+    def _new_shard(self) -> dict:
+        shard = self._local.shard = dict()
+        with self._lock:
+            self._fold_shards()
+            self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _fold_shards(self):
+        ''' 调用时需要持有锁, 已经结束的线程不会再修改自己的计数字典 '''
+        alive = list()
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._merge(self._base, shard)
+        self._shards = alive
+
+    @classmethod
+    def _merge(cls, values: dict, shard: dict) -> dict:
+        for labels, value in list(shard.items()):
+            values[labels] = values.get(labels, 0) + value
+        return values
+
+    def inc(self, amount: float = 1, labels: tuple = ()):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _collect(self) -> dict:
+        with self._lock:
+            self._fold_shards()
+            values = self._merge(dict(), self._base)
+            shards = [item[1] for item in self._shards]
+        for shard in shards:
+            self._merge(values, shard)
+        return values
+
+    def get(self, labels: tuple = ()) -> float:
+        return self._collect().get(labels, 0)
+
+    def samples(self) -> list:
+        """
+            :return: [(指标名称后缀, 标签值, 数值), ...]
+        """
+        return [("", labels, value) for labels, value in self._collect().items()]
+
+
+class MetricGauge(object):
+    """
+        可增可减的数值, 也可以指定导出时才调用的函数 function() -> 数值(不占用请求路径的开销)
+    """
+    TYPE = "gauge"
+
+    __slots__ = ('name', 'help', 'label_names', 'function', '_values', '_lock')
+
+    def __init__(self, name: str, help: str = "", label_names: tuple = (), function: callable or None = None):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.function = function
+        # 标签值 => 数值
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def set(self, value: float, labels: tuple = ()):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, amount: float = 1, labels: tuple = ()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, amount: float = 1, labels: tuple = ()):
+        self.inc(-amount, labels)
+
+    def get(self, labels: tuple = ()) -> float:
+        if self.function is not None:
+            return self.function()
+        return self._values.get(labels, 0)
+
+    def samples(self) -> list:
+        if self.function is not None:
+            return [("", (), self.function())]
+        with self._lock:
+            return [("", labels, value) for labels, value in self._values.items()]
+
+
+class MetricHistogram(MetricCounter):
+    """
+        固定分桶的分布统计(例如请求耗时)
+        ================================================================
+        buckets: 递增的分桶上限, 最后自动加上 +Inf
+        每组标签值记录 [每个分桶的数量..., 总和], 导出时转为累计数量, 与计数相同按线程分别记录
+    """
+    TYPE = "histogram"
+
+    __slots__ = ('buckets', '_inf')
+
+    def __init__(self, name: str, help: str = "", label_names: tuple = (),
+                 buckets: tuple = HTTP_REQUEST_METRICS_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # 总和在记录列表中的位置
+        self._inf = len(self.buckets) + 1
+
+    def _new_item(self, labels: tuple) -> list:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        item = shard[labels] = [0] * self._inf + [0.0]
+        return item
+
+    def observe(self, value: float, labels: tuple = ()):
+        try:
+            item = self._local.shard[labels]
+        except (AttributeError, KeyError):
+            item = self._new_item(labels)
+        item[bisect_left(self.buckets, value)] += 1
+        item[-1] += value
+
+    @classmethod
+    def _merge(cls, values: dict, shard: dict) -> dict:
+        for labels, item in list(shard.items()):
+            total = values.get(labels, None)
+            values[labels] = list(item) if total is None else [a + b for a, b in zip(total, item)]
+        return values
+
+    def get(self, labels: tuple = ()) -> (int, float):
+        """
+            :return: (总数, 总和)
+        """
+        item = self._collect().get(labels, None)
+        return (0, 0.0) if item is None else (sum(item[:-1]), item[-1])
+
+    def samples(self) -> list:
+        result = list()
+        for labels, item in self._collect().items():
+            cumulative = 0
+            for bound, number in zip(self.buckets + (float("inf"),), item):
+                cumulative = cumulative + number
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                result.append(("_bucket", labels + (le,), cumulative))
+            result.append(("_sum", labels, item[-1]))
+            result.append(("_count", labels, cumulative))
+        return result
+
+
+class MetricsRegistry(object):
+    """
+        MetricsRegistry 进程内的指标注册表
+        ================================================================
+        counter / gauge / histogram: 按名称获取指标, 不存在时创建
+        render(): Prometheus 文本格式
+        start_server(): 在后台线程中启动只监听本机的HTTP服务, GET /metrics 返回 render() 的结果
+    """
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    __slots__ = ('_metrics', '_lock', '_server')
+
+    def __init__(self):
+        # 名称 => 指标, 按注册顺序导出
+        self._metrics = dict()
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _get_metric(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name, None)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"metric {name} is already registered as {metric.TYPE}")
+            return metric
+
+    def counter(self, name: str, help: str = "", label_names: tuple = ()) -> MetricCounter:
+        return self._get_metric(MetricCounter, name, help, label_names)
+
+    def gauge(self, name: str, help: str = "", label_names: tuple = (),
+              function: callable or None = None) -> MetricGauge:
+        return self._get_metric(MetricGauge, name, help, label_names, function)
+
+    def histogram(self, name: str, help: str = "", label_names: tuple = (),
+                  buckets: tuple = HTTP_REQUEST_METRICS_BUCKETS) -> MetricHistogram:
+        return self._get_metric(MetricHistogram, name, help, label_names, buckets)
+
+    def get(self, name: str):
+        return self._metrics.get(name, None)
+
+    @classmethod
+    def _format_labels(cls, names: tuple, values: tuple) -> str:
+        if not values:
+            return ""
+        items = ",".join('{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"')
+                                          .replace("\n", "\\n")) for name, value in zip(names, values))
+        return "{" + items + "}"
+
+    def render(self) -> str:
+        """
+            将所有指标转为 Prometheus 文本格式
+        :return: 指标文本
+        """
+        lines = list()
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            for suffix, labels, value in metric.samples():
+                names = metric.label_names + ("le",) if suffix == "_bucket" else metric.label_names
+                lines.append(f"{metric.name}{suffix}{self._format_labels(names, labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def start_server(self, host: str = HTTP_REQUEST_METRICS_HOST,
+                     port: int = HTTP_REQUEST_METRICS_PORT) -> 'ThreadingHTTPServer':
+        """
+            在后台线程中启动指标HTTP服务
+        :param host: 监听地址, 默认只监听本机
+        :param port: 监听端口, 0 表示随机端口
+        :return: 服务对象(server_address 为实际监听的地址)
+        """
+        if self._server is not None:
+            return self._server
+        from http.server import BaseHTTPRequestHandler
+        from http.server import ThreadingHTTPServer
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", registry.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True).start()
+        return self._server
+
+    def stop_server(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
+
+# 进程级别的指标注册表, WebRequest、WebProxy、ProxyPool 共用
+METRICS = MetricsRegistry()
@@ -1,4 +1,23 @@
 import re
+import time
+import socket
+from core.ProcessProxyBreaker import ProxyCircuitBreaker
+from core.ProcessRetryPolicy import RetryPolicy
+from core.ProcessMetrics import METRICS
+from utils.default import HTTP_REQUEST_PROXY_CHECK_TIMEOUT
+from utils.default import HTTP_REQUEST_PROXY_CHECK_TRY_TIMES
+from utils.default import HTTP_REQUEST_PROXY_CHECK_BACKOFF
+from utils.default import HTTP_REQUEST_PROXY_CHECK_BACKOFF_MAX
+from utils.default import HTTP_REQUEST_PROXY_CHECK_BUDGET_FACTOR
+from utils.default import HTTP_REQUEST_PROXY_EWMA_ALPHA
+from utils.default import HTTP_REQUEST_PROXY_PROTOCOL
+from utils.default import HTTP_REQUEST_STREAM_CHUNK_SIZE
+
+# 代理网络地址校验模板
+HTTP_REQUEST_PROXY_URL_MODE = re.compile(
+    "^(?P<protocol>(http|https|socks4|socks5))://(?P<authorize>(([A-Za-z0-9]*:[A-Za-z0-9]*@)?))(?P<hostname>(["
+    "A-Za-z0-9.\-]+))(?P<port>(:[0-9]+))(/[A-Za-z0-9./]*)?",
+    re.I)
 
 
 class WebProxy(object):
@@ -14,19 +33,35 @@ class WebProxy(object):
         auth: 代理URL是否需要身份验证
         is_active: 代理URL是否处于开启状态(只有处于活跃状态的代理才能够进行任务)
         is_usable: 代理URL是否合法、合规
+        latency: 代理请求耗时(秒)的指数加权移动平均, 尚无记录时为 None
+        success_rate: 代理请求成功率的指数加权移动平均
+        checked: 最近一次记录请求结果的时间(time.time), 尚无记录时为 None
+        breaker: 根据请求结果被动判断代理是否可用的熔断器, 熔断期间代理池不会选择该代理, WebRequest 不会通过该代理发送请求
     """
-    from utils.default import HTTP_REQUEST_PROXY_PROTOCOL
     # web端请求数据使用代理时允许使用的代理协议类型
     HTTP_REQUEST_PROXY_PROTOCOL = HTTP_REQUEST_PROXY_PROTOCOL
     # 构建代理 URL 所需要的参数名称
     PARAM_NAME = ['protocol', 'authorize', 'hostname', 'port']
+    # 请求耗时与成功率的指数加权移动平均系数, 越大越偏向最近的请求
+    HTTP_REQUEST_PROXY_EWMA_ALPHA = HTTP_REQUEST_PROXY_EWMA_ALPHA
+    # 计算代理评分时成功率的下限, 避免除零
+    SUCCESS_RATE_MIN = 0.01
+    # 代理存活性检测耗时(按结果)的指标; 通过代理的请求数量已经包含在 webrequest_duration_seconds 中, 请求路径上不再单独计数
+    METRIC_CHECK_DURATION = METRICS.histogram("webproxy_check_duration_seconds", "Proxy health check duration",
+                                              ("result",))
+    METRIC_SUCCESS = ("success",)
 
     __slots__ = ('_url', '_url_list',
-                 '_is_auth', '_is_active', '_is_usable')
+                 '_is_auth', '_is_active', '_is_usable',
+                 '_latency', '_success_rate', '_checked', '_breaker')
 
     def __init__(self, url: str):
         self._is_active = False
         self._is_usable = True
+        self._latency = None
+        self._success_rate = 1.0
+        self._checked = None
+        self._breaker = ProxyCircuitBreaker()
         self._url = url
         self._url_list, self._is_auth = self._parse_str2param()
         ''' 根据分析结果修正url属性 '''
@@ -41,6 +76,42 @@ class WebProxy(object):
     def get_is_usable(self) -> bool:
         return self._is_usable
 
+    def get_latency(self) -> float or None:
+        return self._latency
+
+    def get_success_rate(self) -> float:
+        return self._success_rate
+
+    def get_score(self) -> float:
+        """
+            代理评分(期望耗时), 越小越好: 平均耗时 / 成功率
+            尚无记录的代理评分为 0, 优先被选中以获得记录
+        :return: 代理评分
+        """
+        if self._latency is None:
+            return 0.0
+        return self._latency / max(self._success_rate, self.SUCCESS_RATE_MIN)
+
+    def get_checked(self) -> float or None:
+        return self._checked
+
+    def get_breaker(self) -> ProxyCircuitBreaker:
+        return self._breaker
+
+    def is_available(self) -> bool:
+        """
+            代理是否可用且没有处于熔断状态(不改变熔断器状态)
+        :return: True|False
+        """
+        return self._is_usable and self._breaker.is_available()
+
+    def allow_request(self) -> bool:
+        """
+            通过代理发送请求前调用, 代理处于熔断状态时拒绝请求
+        :return: True|False
+        """
+        return self._breaker.allow_request()
+
     def get_url(self):
         return self._url
 
@@ -50,6 +121,41 @@ class WebProxy(object):
     ####################################################################################################################
     # 设置类的 set 方法
     ####################################################################################################################
+    def set_is_usable(self, v: bool):
+        self._is_usable = v
+
+    def record(self, success: bool, latency: float):
+        """
+            记录一次通过代理的请求(真实请求或存活性检测)结果, 更新耗时与成功率的指数加权移动平均以及熔断器状态
+        :param success: 请求是否成功
+        :param latency: 请求耗时(秒), 失败时为失败前等待的时间
+        :return:
+        """
+        alpha = self.HTTP_REQUEST_PROXY_EWMA_ALPHA
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency = self._latency + alpha * (latency - self._latency)
+        self._success_rate = self._success_rate + alpha * ((1.0 if success else 0.0) - self._success_rate)
+        self._checked = time.time()
+        self._breaker.record(success)
+
+    def restore(self, usable: bool, checked: float, latency: float or None, success_rate: float, failures: int):
+        """
+            恢复保存的代理状态(例如 ProxyHealthCache 保存的状态)
+        :param usable: 代理是否可用
+        :param checked: 最近一次记录请求结果的时间(time.time)
+        :param latency: 请求耗时的指数加权移动平均
+        :param success_rate: 请求成功率的指数加权移动平均
+        :param failures: 连续失败的次数
+        :return:
+        """
+        self._is_usable = usable
+        self._checked = checked
+        self._latency = latency
+        self._success_rate = success_rate
+        self._breaker.restore(failures, time.time() - checked)
+
     def set_is_active(self, v: bool):
         self._is_active = v
 
@@ -69,7 +175,8 @@ class WebProxy(object):
                 'password': ""
             }
         else:
-            self._url_list = self._parse_str2param()
+            self._url_list, self._is_auth = self._parse_str2param()
+            self._url = self._set_url()
 
     def _set_authorized(self) -> str:
         """
@@ -110,10 +217,7 @@ class WebProxy(object):
                 如果符合要求，则当前代理处于不可用状态（self._is_usable = True）
         :return: 代理网络地址校验模板
         """
-        return re.compile(
-            "^(?P<protocol>(http|https|socks4|socks5))://(?P<authorize>(([A-Za-z0-9]*:[A-Za-z0-9]*@)?))(?P<hostname>(["
-            "A-Za-z0-9.\-]+))(?P<port>(:[0-9]+))(/[A-Za-z0-9./]*)?",
-            re.I)
+        return HTTP_REQUEST_PROXY_URL_MODE
 
     ####################################################################################################################
     # 内容校验函数
@@ -123,8 +227,7 @@ class WebProxy(object):
             校验self._url的代理网络地址是否符合代理网络地址校验模板眼球
         :return: 模板匹配项参数 包含（protocol,authorize,hostname, port）
         """
-        _mode = self._check_proxy_mode()
-        groups = _mode.search(self._url)
+        groups = HTTP_REQUEST_PROXY_URL_MODE.search(self._url)
 
         if groups is None or not groups:
             self._is_usable = False
@@ -140,6 +243,16 @@ class WebProxy(object):
             将传入的代理URL地址解析成相应的参数报文
         :return: 对应参数, True| False
         """
+        _url_list, _is_auth, self._is_usable = self.parse_url(self._url)
+        return _url_list, _is_auth
+
+    @classmethod
+    def parse_url(cls, url: str) -> (dict, bool, bool):
+        """
+            使用代理网络地址校验模板将代理URL地址解析成相应的参数报文(只匹配一次)
+        :param url: 代理URL地址
+        :return: (对应参数, 是否需要身份验证, 是否合法)
+        """
         _url_list = {
             'protocol': "",
             'hostname': "",
@@ -148,19 +261,12 @@ class WebProxy(object):
             'password': ""
         }
 
-        groups = self._check_proxy_url()
+        groups = HTTP_REQUEST_PROXY_URL_MODE.search(url)
         if groups is None:
-            self._is_usable = False
-            return _url_list, False
+            return _url_list, False, False
 
         ''' 根据 protocol, authorized, hostname, port 参数定义的顺序进行解包 '''
-        _res = list()
-        for param in self.PARAM_NAME:
-            _res.append(groups.group(param))
-        if len(_res) != 4:
-            self._is_usable = False
-            return _url_list, False
-        protocol, authorized, hostname, port = _res
+        protocol, authorized, hostname, port = groups.group(*cls.PARAM_NAME)
 
         # 去掉匹配过程中出现的冗余内容
         port = port.replace(":", "")
@@ -172,14 +278,7 @@ class WebProxy(object):
         else:
             username, password = authorized
             ''' 根据分析出来的参数判断代理是否不需要验证 '''
-            if not username and not password:
-                _is_auth = False
-                self._is_usable = True
-                # 如果不需要验证,那么就需要重构代理URL
-                self._url = f"{protocol}://{hostname}:{port}"
-            else:
-                _is_auth = True
-                self._is_usable = True
+            _is_auth = bool(username or password)
 
         _url_list['protocol'] = protocol
         _url_list['hostname'] = hostname
@@ -187,41 +286,128 @@ class WebProxy(object):
         _url_list['username'] = username
         _url_list['password'] = password
 
-        return _url_list, _is_auth
+        return _url_list, _is_auth, True
+
+    @classmethod
+    def make_url(cls, url_list: dict, is_auth: bool) -> str:
+        """
+            根据 parse_url 解析出的参数构造规范的代理URL(与 _set_url 的结果一致)
+        :param url_list: 对应参数
+        :param is_auth: 是否需要身份验证
+        :return: 规范的代理URL
+        """
+        _authorized = f"{url_list['username']}:{url_list['password']}@" if is_auth else ""
+        return f"{url_list['protocol']}://{_authorized}{url_list['hostname']}:{url_list['port']}"
 
-    def check_proxy_alive(self, url: str, try_times: int = 5) -> (bool, str):
+    @classmethod
+    def from_param(cls, url: str, url_list: dict, is_auth: bool) -> 'WebProxy':
+        """
+            使用 parse_url 解析出的参数直接构造代理, 不再重复解析(用于批量导入)
+        :param url: make_url 构造的规范代理URL
+        :param url_list: 对应参数
+        :param is_auth: 是否需要身份验证
+        :return: WebProxy
+        """
+        o = cls.__new__(cls)
+        o._is_active = False
+        o._is_usable = True
+        o._latency = None
+        o._success_rate = 1.0
+        o._checked = None
+        o._breaker = ProxyCircuitBreaker()
+        o._url = url
+        o._url_list = url_list
+        o._is_auth = is_auth
+        return o
+
+    def check_proxy_alive(self, url: str, try_times: int = HTTP_REQUEST_PROXY_CHECK_TRY_TIMES,
+                          timeout: tuple = HTTP_REQUEST_PROXY_CHECK_TIMEOUT,
+                          backoff: float = HTTP_REQUEST_PROXY_CHECK_BACKOFF,
+                          policy: RetryPolicy or None = None) -> (bool, str):
         """
             代理IP存活性检测
             使用GET协议访问输入的测试地址，如果能够成功访问则代理存活，如果出现报错则代理可能存货
         :param try_times: 访问出现错误最大尝试次数
         :param url: 测试代理IP存活性的URL地址
+        :param timeout: 每次访问的(连接超时, 读取超时)
+        :param backoff: 重试前等待时间的初始上限(秒), 每次重试翻倍
+        :param policy: 重试策略, 指定时忽略 try_times 与 backoff
         :return:(代理能否访问， 提示字符串)
         """
-        import requests
-        import urllib3
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        policy = self.make_check_policy(try_times, backoff, timeout) if policy is None else policy
+        status, message, _ = self._check_proxy_alive(url, policy, timeout)
+        self._is_usable = status
+        return status, message
 
+    @classmethod
+    def make_check_policy(cls, try_times: int = HTTP_REQUEST_PROXY_CHECK_TRY_TIMES,
+                          backoff: float = HTTP_REQUEST_PROXY_CHECK_BACKOFF,
+                          timeout: tuple = HTTP_REQUEST_PROXY_CHECK_TIMEOUT) -> RetryPolicy:
+        """
+            构造存活性检测使用的重试策略: 只在连接错误与代理错误时重试
+            接受连接却不返回数据(读取超时)的代理视为失效, 不再重试;
+            总耗时不超过单次访问超时时间的 HTTP_REQUEST_PROXY_CHECK_BUDGET_FACTOR 倍, 尽快放弃失效的代理
+        :param try_times: 最大重试次数
+        :param backoff: 重试前等待时间的初始上限(秒)
+        :param timeout: 每次访问的(连接超时, 读取超时)
+        :return: RetryPolicy
+        """
+        return RetryPolicy(try_times=try_times, backoff=backoff, backoff_max=HTTP_REQUEST_PROXY_CHECK_BACKOFF_MAX,
+                           budget=sum(timeout) * HTTP_REQUEST_PROXY_CHECK_BUDGET_FACTOR,
+                           retry_on=(RetryPolicy.CONNECT, RetryPolicy.PROXY))
+
+    def _check_proxy_alive(self, url: str, policy: RetryPolicy, timeout: tuple,
+                           deadline: float or None = None) -> (bool, str, int):
+        """
+            按照重试策略进行代理IP存活性检测, 不修改代理的可用状态
+        :param url: 测试代理IP存活性的URL地址
+        :param policy: 重试策略
+        :param timeout: 每次访问的(连接超时, 读取超时)
+        :param deadline: 检测的截止时间(time.monotonic), 每次访问的超时时间不会超过截止时间
+        :return: (代理能否访问, 提示字符串, 访问次数)
+        """
+        if not self._url:
+            return False, f'[!]代理地址不合法...', 0
+
+        start = time.perf_counter()
+        status, _, cause, attempts = policy.call(lambda _timeout: self._check_proxy_once(url, _timeout, deadline),
+                                                 timeout, True, deadline)
+        self.METRIC_CHECK_DURATION.observe(time.perf_counter() - start, self.METRIC_SUCCESS if status else (cause,))
+        if status:
+            return True, "[+]代理能够使用...", attempts
+        if cause in (RetryPolicy.CONNECT, RetryPolicy.READ_TIMEOUT):
+            return False, f'[!]代理访问{url}超时...', attempts
+        if cause == RetryPolicy.PROXY:
+            return False, f'[!]代理无法访问{url}...', attempts
+        return False, f'[!]代理访问出现异常({cause})...', attempts
+
+    def _check_proxy_once(self, url: str, timeout: tuple, deadline: float or None = None):
+        """
+            使用代理访问一次测试地址, 记录本次访问的结果, 访问失败时抛出异常
+        :param url: 测试代理IP存活性的URL地址
+        :param timeout: (连接超时, 读取超时)
+        :param deadline: 检测的截止时间(time.monotonic), 读取响应体超过截止时间时抛出 socket.timeout
+        :return:
+        """
+        from core.ProcessSessionPool import SessionPool
+
+        ''' 每次检测使用新的会话(不复用已经建立的连接), 主机名通过进程级别的域名解析缓存解析 '''
+        session = SessionPool.new_session()
+        start = time.perf_counter()
+        status = False
         try:
-            _ = requests.get(url=url, proxies=self.show_proxy(),
-                             timeout=(5, 10), verify=False)
-            self._is_usable = True
-            return True, "[+]代理能够使用..."
-        except requests.exceptions.ConnectTimeout:
-            if try_times > 0:
-                return self.check_proxy_alive(url, try_times - 1)
-            else:
-                self._is_usable = False
-                return False, f'[!]代理访问{url}超时...'
-        except requests.exceptions.ProxyError as e:
-            if try_times > 0:
-                return self.check_proxy_alive(url, try_times - 1)
-            else:
-                self._is_usable = False
-                print(e.args.__str__())
-                return False, f'[!]代理无法访问{url}...'
-        except Exception:
-            self._is_usable = False
-            return False, f'[!]代理访问出现异常...'
+            ''' 读取超时只限制每次读取, 响应体按块读取并检查截止时间, 缓慢返回数据的代理不会使检测超过截止时间 '''
+            res = session.get(url=url, proxies=self.show_proxy(), timeout=timeout, verify=False, stream=True)
+            ''' read1 收到数据后立即返回, 不会等待凑满整块; urllib3 1.x 的响应没有 read1, 使用底层 http.client 响应的 read1 '''
+            read1 = getattr(res.raw, 'read1', None) or res.raw._fp.read1
+            while read1(HTTP_REQUEST_STREAM_CHUNK_SIZE):
+                if deadline is not None and time.monotonic() > deadline:
+                    raise socket.timeout("超过代理检测截止时间")
+            status = True
+        finally:
+            session.close()
+            self.record(status, time.perf_counter() - start)
 
     def show_proxy(self) -> dict:
-        return {f"{self._url_list['protocol']}": self._url}
+        ''' HTTP 目标与 HTTPS 目标(CONNECT 隧道)都经过该代理 '''
+        return {'http': self._url, 'https': self._url}
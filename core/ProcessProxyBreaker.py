@@ -0,0 +1,98 @@
+import time
+import threading
+from utils.default import HTTP_REQUEST_PROXY_BREAKER_THRESHOLD
+from utils.default import HTTP_REQUEST_PROXY_BREAKER_COOLDOWN
+
+
+class ProxyCircuitBreaker(object):
+    """
+        ProxyCircuitBreaker 根据通过代理的请求结果被动地判断代理是否可用(熔断器)
+        ================================================================
+        closed: 正常状态, 连续失败 threshold 次后进入 open
+        open: 熔断状态, 拒绝所有请求, 经过 cooldown 秒后进入 half-open
+        half-open: 只放行一个试探请求, 成功后回到 closed, 失败后重新进入 open
+            试探请求在 cooldown 秒内没有返回结果时, 放行下一个试探请求
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+    HTTP_REQUEST_PROXY_BREAKER_THRESHOLD = HTTP_REQUEST_PROXY_BREAKER_THRESHOLD
+    HTTP_REQUEST_PROXY_BREAKER_COOLDOWN = HTTP_REQUEST_PROXY_BREAKER_COOLDOWN
+
+    __slots__ = ('state', 'failures', 'changed', 'threshold', 'cooldown', '_lock')
+
+    def __init__(self, threshold: int = HTTP_REQUEST_PROXY_BREAKER_THRESHOLD,
+                 cooldown: float = HTTP_REQUEST_PROXY_BREAKER_COOLDOWN):
+        self.state = self.CLOSED
+        # 连续失败的次数
+        self.failures = 0
+        # 进入 open 或放行试探请求的时间(time.monotonic)
+        self.changed = 0.0
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        """
+            查看当前是否可以放行请求, 不改变熔断器状态(用于代理池筛选节点)
+        :return: True|False
+        """
+        if self.state == self.CLOSED:
+            return True
+        return time.monotonic() - self.changed >= self.cooldown
+
+    def allow_request(self) -> bool:
+        """
+            请求发送前调用, 判断是否放行请求
+            open 状态经过 cooldown 秒后进入 half-open 并放行当前请求作为试探请求
+        :return: True|False
+        """
+        if self.state == self.CLOSED:
+            return True
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self.changed < self.cooldown:
+                return False
+            self.state = self.HALF_OPEN
+            self.changed = now
+            return True
+
+    def record(self, success: bool):
+        """
+            记录一次请求的结果
+        :param success: 请求是否成功
+        :return:
+        """
+        if success:
+            if self.state != self.CLOSED or self.failures:
+                with self._lock:
+                    self.state = self.CLOSED
+                    self.failures = 0
+            return
+        with self._lock:
+            self.failures = self.failures + 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self.changed = time.monotonic()
+
+    def restore(self, failures: int, age: float):
+        """
+            恢复保存的连续失败次数, 达到熔断次数时进入 open, 保存后经过的时间计入冷却时间
+        :param failures: 连续失败的次数
+        :param age: 保存后经过的时间(秒)
+        :return:
+        """
+        with self._lock:
+            self.failures = failures
+            if failures >= self.threshold:
+                self.state = self.OPEN
+                self.changed = time.monotonic() - max(age, 0.0)
+            else:
+                self.state = self.CLOSED
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
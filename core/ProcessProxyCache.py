@@ -0,0 +1,86 @@
+import time
+import sqlite3
+from utils.default import HTTP_REQUEST_PROXY_CACHE_PATH
+from utils.default import HTTP_REQUEST_PROXY_CACHE_TTL
+
+
+class ProxyHealthCache(object):
+    """
+        ProxyHealthCache 将代理的存活状态保存到本地 SQLite 文件, 进程启动时恢复
+        ================================================================
+        path: SQLite 文件路径
+        ttl: 保存的状态的有效时间(秒), 超过有效时间的代理需要重新检测
+        每条记录: 规范代理URL => (是否可用, 最近一次记录时间, 平均耗时, 成功率, 连续失败次数)
+        每次操作使用独立的连接, 可以在不同线程中使用
+    """
+    HTTP_REQUEST_PROXY_CACHE_TTL = HTTP_REQUEST_PROXY_CACHE_TTL
+    TABLE_SQL = "CREATE TABLE IF NOT EXISTS proxy_health (" \
+                "url TEXT PRIMARY KEY, usable INTEGER NOT NULL, checked REAL NOT NULL, " \
+                "latency REAL, success_rate REAL NOT NULL, failures INTEGER NOT NULL)"
+    SAVE_SQL = "INSERT OR REPLACE INTO proxy_health " \
+               "(url, usable, checked, latency, success_rate, failures) VALUES (?, ?, ?, ?, ?, ?)"
+    LOAD_SQL = "SELECT url, usable, checked, latency, success_rate, failures FROM proxy_health WHERE checked >= ?"
+
+    __slots__ = ('path', 'ttl')
+
+    def __init__(self, path: str = HTTP_REQUEST_PROXY_CACHE_PATH, ttl: float = HTTP_REQUEST_PROXY_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        connection.execute(self.TABLE_SQL)
+        return connection
+
+    def save(self, proxies: iter) -> int:
+        """
+            在一个事务中保存代理的存活状态, 尚无记录的代理不保存
+        :param proxies: WebProxy 的可迭代对象
+        :return: 保存的代理数量
+        """
+        rows = [(item.get_url(), int(item.get_is_usable()), item.get_checked(), item.get_latency(),
+                 item.get_success_rate(), item.get_breaker().failures)
+                for item in proxies if item.get_url() and item.get_checked() is not None]
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(self.SAVE_SQL, rows)
+        finally:
+            connection.close()
+        return len(rows)
+
+    def load(self, proxies: iter) -> list:
+        """
+            恢复代理的存活状态
+        :param proxies: WebProxy 的可迭代对象
+        :return: 没有保存状态或状态已经过期, 需要重新检测的代理列表
+        """
+        connection = self._connect()
+        try:
+            rows = connection.execute(self.LOAD_SQL, (time.time() - self.ttl,)).fetchall()
+        finally:
+            connection.close()
+
+        states = {row[0]: row[1:] for row in rows}
+        stale = list()
+        for item in proxies:
+            state = states.get(item.get_url(), None)
+            if state is None:
+                stale.append(item)
+                continue
+            usable, checked, latency, success_rate, failures = state
+            item.restore(bool(usable), checked, latency, success_rate, failures)
+        return stale
+
+    def purge(self) -> int:
+        """
+            删除已经过期的记录
+        :return: 删除的记录数量
+        """
+        connection = self._connect()
+        try:
+            with connection:
+                cursor = connection.execute("DELETE FROM proxy_health WHERE checked < ?", (time.time() - self.ttl,))
+            return cursor.rowcount
+        finally:
+            connection.close()
@@ -0,0 +1,105 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from core.ProcessProxy import WebProxy
+from utils.default import HTTP_REQUEST_PROXY_CHECK_TIMEOUT
+from utils.default import HTTP_REQUEST_PROXY_CHECK_TRY_TIMES
+from utils.default import HTTP_REQUEST_PROXY_CHECK_BACKOFF
+from utils.default import HTTP_REQUEST_PROXY_CHECK_MAX_WORKERS
+from utils.default import HTTP_REQUEST_PROXY_CHECK_DEADLINE
+
+
+class ProxyCheckResult(object):
+    """
+        单个代理的存活性检测结果
+        ================================================================
+        proxy: 被检测的代理
+        status: 代理能否访问
+        message: 提示字符串
+        attempts: 访问次数
+        cost: 检测耗时(秒)
+    """
+    __slots__ = ('proxy', 'status', 'message', 'attempts', 'cost')
+
+    def __init__(self, proxy: WebProxy, status: bool, message: str, attempts: int = 0, cost: float = 0.0):
+        self.proxy = proxy
+        self.status = status
+        self.message = message
+        self.attempts = attempts
+        self.cost = cost
+
+    def to_dict(self) -> dict:
+        return {
+            'url': self.proxy.get_url(),
+            'status': self.status,
+            'message': self.message,
+            'attempts': self.attempts,
+            'cost': self.cost
+        }
+
+
+class ProxyHealthChecker(object):
+    """
+        ProxyHealthChecker 使用线程池并发检测一组代理的存活性
+        ================================================================
+        max_workers: 同时进行检测的最大数量(全局并发上限)
+        deadline: 整体检测的最长时间(秒), 每次访问的超时时间都不会超过剩余时间, 读取响应体时同样检查截止时间,
+            仍在进行的检测会在截止时间之后很快结束, 到达截止时间仍未完成的代理视为不可用
+        timeout: 单次访问的(连接超时, 读取超时)
+        try_times: 访问出现连接错误或代理错误的最大重试次数(读取超时不重试), 总耗时受 make_check_policy 的上限限制
+        backoff: 重试前等待时间的初始上限(秒), 每次重试翻倍(RetryPolicy)
+        检测完成后根据结果更新每个代理的可用状态
+    """
+    HTTP_REQUEST_PROXY_CHECK_MAX_WORKERS = HTTP_REQUEST_PROXY_CHECK_MAX_WORKERS
+    HTTP_REQUEST_PROXY_CHECK_DEADLINE = HTTP_REQUEST_PROXY_CHECK_DEADLINE
+
+    __slots__ = ('max_workers', 'deadline', 'timeout', 'try_times', 'backoff')
+
+    def __init__(self, max_workers: int = HTTP_REQUEST_PROXY_CHECK_MAX_WORKERS,
+                 deadline: float = HTTP_REQUEST_PROXY_CHECK_DEADLINE,
+                 timeout: tuple = HTTP_REQUEST_PROXY_CHECK_TIMEOUT,
+                 try_times: int = HTTP_REQUEST_PROXY_CHECK_TRY_TIMES,
+                 backoff: float = HTTP_REQUEST_PROXY_CHECK_BACKOFF):
+        self.max_workers = max(1, max_workers)
+        self.deadline = deadline
+        self.timeout = timeout
+        self.try_times = try_times
+        self.backoff = backoff
+
+    def _check(self, proxy: WebProxy, url: str, deadline: float) -> ProxyCheckResult:
+        start = time.monotonic()
+        policy = WebProxy.make_check_policy(self.try_times, self.backoff, self.timeout)
+        status, message, attempts = proxy._check_proxy_alive(url, policy, self.timeout, deadline)
+        ''' 超过截止时间后完成的检测结果已经由 check 记录为超时, 不再修改代理状态 '''
+        if time.monotonic() <= deadline:
+            proxy.set_is_usable(status)
+        return ProxyCheckResult(proxy, status, message, attempts, time.monotonic() - start)
+
+    def check(self, proxies: list, url: str) -> list:
+        """
+            并发检测所有代理的存活性
+        :param proxies: 需要检测的代理列表
+        :param url: 测试代理IP存活性的URL地址
+        :return: 与 proxies 顺序一致的 ProxyCheckResult 列表
+        """
+        if not proxies:
+            return list()
+        start = time.monotonic()
+        deadline = start + self.deadline
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(proxies)))
+        try:
+            futures = [executor.submit(self._check, proxy, url, deadline) for proxy in proxies]
+            wait(futures, timeout=self.deadline)
+        finally:
+            ''' 截止时间到达后不再等待仍在进行的检测(其超时时间受截止时间限制, 会自行结束), 尚未开始的检测直接取消 '''
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        results = list()
+        for proxy, future in zip(proxies, futures):
+            if future.done() and not future.cancelled() and future.exception() is None:
+                results.append(future.result())
+                continue
+            proxy.set_is_usable(False)
+            results.append(ProxyCheckResult(proxy, False, f'[!]代理检测超过截止时间...', 0,
+                                            time.monotonic() - start))
+        return results
@@ -0,0 +1,81 @@
+from core.ProcessProxy import WebProxy
+from core.ProcessProxyPool import ProxyPool
+from utils.default import HTTP_REQUEST_PROXY_LOAD_BATCH_SIZE
+
+
+class ProxyLoader(object):
+    """
+        ProxyLoader 以流的方式将代理列表批量导入代理池
+        ================================================================
+        每行一个代理URL, 空行与 # 开头的注释行被忽略
+        每个代理只解析一次(WebProxy.parse_url), 规范化为 WebProxy.make_url 的结果后去重,
+        代理池中已经存在以及本次导入中重复出现的代理不会重复加入, 每 batch_size 个代理批量加入代理池
+        total: 读取的代理数量
+        added: 加入代理池的代理数量(一批代理超过代理池容量时只计算实际加入的代理)
+        duplicated: 重复的代理数量
+        invalid: 格式不合法的代理数量
+    """
+    HTTP_REQUEST_PROXY_LOAD_BATCH_SIZE = HTTP_REQUEST_PROXY_LOAD_BATCH_SIZE
+
+    __slots__ = ('pool', 'batch_size', 'total', 'added', 'duplicated', 'invalid')
+
+    def __init__(self, pool: ProxyPool, batch_size: int = HTTP_REQUEST_PROXY_LOAD_BATCH_SIZE):
+        self.pool = pool
+        self.batch_size = max(1, batch_size)
+        self.total = 0
+        self.added = 0
+        self.duplicated = 0
+        self.invalid = 0
+
+    def load_file(self, path: str, encoding: str = 'utf-8') -> dict:
+        """
+            从文件中逐行导入代理
+        :param path: 代理列表文件路径
+        :param encoding: 文件编码
+        :return: 导入统计
+        """
+        with open(path, 'r', encoding=encoding, errors='replace') as f:
+            return self.load(f)
+
+    def load(self, lines: iter) -> dict:
+        """
+            从可迭代对象中逐个导入代理
+        :param lines: 代理URL的可迭代对象(例如文件对象)
+        :return: 导入统计
+        """
+        batch, seen = list(), set()
+        for line in lines:
+            url = line.strip()
+            if not url or url.startswith('#'):
+                continue
+            self.total = self.total + 1
+            url_list, is_auth, is_usable = WebProxy.parse_url(url)
+            if not is_usable:
+                self.invalid = self.invalid + 1
+                continue
+            url = WebProxy.make_url(url_list, is_auth)
+            if url in seen or self.pool.search_node_url(url) is not None:
+                self.duplicated = self.duplicated + 1
+                continue
+            seen.add(url)
+            batch.append(WebProxy.from_param(url, url_list, is_auth))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+        self._flush(batch)
+        return self.stats()
+
+    def _flush(self, batch: list):
+        """
+            将一批代理加入代理池
+        """
+        if batch:
+            self.added = self.added + self.pool.add_nodes(batch)
+        batch.clear()
+
+    def stats(self) -> dict:
+        return {
+            'total': self.total,
+            'added': self.added,
+            'duplicated': self.duplicated,
+            'invalid': self.invalid
+        }
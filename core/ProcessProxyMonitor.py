@@ -0,0 +1,227 @@
+import time
+import heapq
+import random
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from core.ProcessProxyPool import ProxyPool
+from core.ProcessProxyPool import ProxyNode
+from core.ProcessRetryPolicy import NO_RETRY
+from utils.default import HTTP_REQUEST_PROXY_CHECK_TIMEOUT
+from utils.default import HTTP_REQUEST_PROXY_MONITOR_BUDGET
+from utils.default import HTTP_REQUEST_PROXY_MONITOR_MIN_INTERVAL
+from utils.default import HTTP_REQUEST_PROXY_MONITOR_MAX_INTERVAL
+from utils.default import HTTP_REQUEST_PROXY_MONITOR_MAX_WORKERS
+
+
+class ProxyHealthMonitor(object):
+    """
+        ProxyHealthMonitor 在后台线程中按自适应的间隔检测代理池中代理的存活性
+        ================================================================
+        pool: 被检测的代理池
+        url: 存活性测试的URL地址
+        budget: 每秒最多进行的检测次数(必须大于 0), 检测不会超过该速率, 避免与真实请求争抢资源
+        min_interval: 状态刚发生变化(时好时坏)的代理的检测间隔(秒)
+        max_interval: 状态稳定的代理的最长检测间隔(秒), 状态不变时检测间隔每次翻倍直到该值
+        max_workers: 同时进行检测的最大数量
+        timeout: 单次检测的(连接超时, 读取超时), 每次检测只访问一次, 不重试
+        新加入代理池的代理在每 max_interval 秒进行一次的同步中加入检测计划
+    """
+    HTTP_REQUEST_PROXY_MONITOR_BUDGET = HTTP_REQUEST_PROXY_MONITOR_BUDGET
+    HTTP_REQUEST_PROXY_MONITOR_MIN_INTERVAL = HTTP_REQUEST_PROXY_MONITOR_MIN_INTERVAL
+    HTTP_REQUEST_PROXY_MONITOR_MAX_INTERVAL = HTTP_REQUEST_PROXY_MONITOR_MAX_INTERVAL
+    # 计算检测速率的时间窗口(秒)
+    RATE_WINDOW = 10
+
+    __slots__ = ('pool', 'url', 'budget', 'min_interval', 'max_interval', 'max_workers', 'timeout',
+                 'probes', 'failures', '_schedule', '_intervals', '_status', '_recent', '_tokens', '_refilled',
+                 '_counter', '_lock', '_stop', '_workers', '_thread', '_executor', '_started')
+
+    def __init__(self, pool: ProxyPool, url: str, budget: float = HTTP_REQUEST_PROXY_MONITOR_BUDGET,
+                 min_interval: float = HTTP_REQUEST_PROXY_MONITOR_MIN_INTERVAL,
+                 max_interval: float = HTTP_REQUEST_PROXY_MONITOR_MAX_INTERVAL,
+                 max_workers: int = HTTP_REQUEST_PROXY_MONITOR_MAX_WORKERS,
+                 timeout: tuple = HTTP_REQUEST_PROXY_CHECK_TIMEOUT):
+        ''' 令牌按 budget 的速率补充, budget 不大于 0 时后台线程永远无法取得令牌 '''
+        if not budget > 0:
+            raise ValueError(f"budget must be positive, got {budget}")
+        self.pool = pool
+        self.url = url
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        # 已经完成的检测次数与其中失败的次数
+        self.probes = 0
+        self.failures = 0
+        # 检测计划: (检测时间, 序号, 节点id) 组成的最小堆
+        self._schedule = list()
+        # 节点id => 当前检测间隔 / 上一次检测结果
+        self._intervals = dict()
+        self._status = dict()
+        # 最近 RATE_WINDOW 秒内的检测时间
+        self._recent = deque()
+        # 令牌桶: 剩余令牌数量与上一次补充令牌的时间
+        self._tokens = 1.0
+        self._refilled = time.monotonic()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._workers = threading.Semaphore(self.max_workers)
+        self._thread = None
+        self._executor = None
+        self._started = None
+
+    def start(self) -> 'ProxyHealthMonitor':
+        """
+            启动后台检测线程
+        :return: self
+        """
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self._started = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._thread = threading.Thread(target=self._run, name="ProxyHealthMonitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float or None = None):
+        """
+            停止后台检测线程, 等待正在进行的检测结束
+        :param timeout: 等待后台线程结束的最长时间(秒)
+        :return:
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._thread = None
+        self._executor = None
+
+    def _schedule_node(self, node_id: str, due: float):
+        with self._lock:
+            heapq.heappush(self._schedule, (due, next(self._counter), node_id))
+
+    def _sync(self):
+        """
+            将尚未加入检测计划的节点加入检测计划, 已经有记录的代理按照记录时间安排检测, 其余代理在 min_interval 内随机分散
+        """
+        now = time.monotonic()
+        wall = time.time()
+        ''' 在代理池的锁内取得节点快照, 避免遍历过程中节点被加入或淘汰 '''
+        with self.pool._lock:
+            nodes = list(self.pool.iter_nodes())
+        for node in nodes:
+            if node is None or not node.is_node or node.id in self._intervals:
+                continue
+            self._intervals[node.id] = self.min_interval
+            checked = node.value.get_checked()
+            if checked is None:
+                due = now + random.uniform(0, self.min_interval)
+            else:
+                due = now + max(0.0, checked + self.min_interval - wall)
+            self._schedule_node(node.id, due)
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(max(self.budget, 1.0), self._tokens + (now - self._refilled) * self.budget)
+        self._refilled = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens = self._tokens - 1.0
+        return True
+
+    def _run(self):
+        next_sync = 0.0
+        while not self._stop.is_set():
+            ''' 单次调度中的异常不能终止后台检测线程, 稍后重试 '''
+            try:
+                next_sync = self._run_once(next_sync)
+            except Exception:
+                self._stop.wait(self.min_interval)
+
+    def _run_once(self, next_sync: float) -> float:
+        """
+            进行一次调度: 按需同步检测计划, 到期的节点在令牌与检测线程都可用时提交检测
+        :param next_sync: 下一次同步检测计划的时间
+        :return: 下一次同步检测计划的时间
+        """
+        now = time.monotonic()
+        if now >= next_sync:
+            self._sync()
+            next_sync = now + self.max_interval
+        with self._lock:
+            due = self._schedule[0][0] if self._schedule else next_sync
+        if due > now:
+            self._stop.wait(min(due, next_sync) - now)
+            return next_sync
+        if not self._take_token():
+            self._stop.wait((1.0 - self._tokens) / self.budget)
+            return next_sync
+        if not self._workers.acquire(timeout=0.1):
+            ''' 没有空闲的检测线程, 归还已经取得的令牌 '''
+            self._tokens = self._tokens + 1.0
+            return next_sync
+        try:
+            with self._lock:
+                _, _, node_id = heapq.heappop(self._schedule)
+            node = self.pool.search_node_id(node_id)
+            if node is None:
+                ''' 节点已经被淘汰 '''
+                self._workers.release()
+                self._intervals.pop(node_id, None)
+                self._status.pop(node_id, None)
+                return next_sync
+            self._executor.submit(self._probe, node)
+        except Exception:
+            self._workers.release()
+            raise
+        return next_sync
+
+    def _probe(self, node: ProxyNode):
+        try:
+            status, _, _ = node.value._check_proxy_alive(self.url, NO_RETRY, self.timeout)
+            node.value.set_is_usable(status)
+            self.pool.update_node_status(node)
+
+            ''' 状态发生变化的代理缩短检测间隔, 状态不变的代理检测间隔翻倍 '''
+            previous = self._status.get(node.id, None)
+            if previous is not None and previous != status:
+                interval = self.min_interval
+            else:
+                interval = min(self._intervals.get(node.id, self.min_interval) * 2, self.max_interval)
+            self._status[node.id] = status
+            self._intervals[node.id] = interval
+            now = time.monotonic()
+            with self._lock:
+                self.probes = self.probes + 1
+                self.failures = self.failures + (0 if status else 1)
+                self._recent.append(now)
+            self._schedule_node(node.id, now + interval * random.uniform(0.9, 1.1))
+        except Exception:
+            self._schedule_node(node.id, time.monotonic() + self.max_interval)
+        finally:
+            self._workers.release()
+
+    def stats(self) -> dict:
+        """
+            代理池与后台检测的统计信息
+        :return: {total, healthy, probes, failures, probe_rate, scheduled}
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and self._recent[0] < now - self.RATE_WINDOW:
+                self._recent.popleft()
+            window = min(self.RATE_WINDOW, now - self._started) if self._started is not None else 0
+            return {
+                'total': self.pool.length,
+                'healthy': self.pool.healthy_count(),
+                'probes': self.probes,
+                'failures': self.failures,
+                'probe_rate': len(self._recent) / window if window > 0 else 0.0,
+                'scheduled': len(self._schedule)
+            }
@@ -1,24 +1,45 @@
 from core.ProcessProxy import WebProxy
-import uuid
+import random
+import weakref
+import itertools
+import threading
+from core.ProcessMetrics import METRICS
 from utils.default import HTTP_REQUEST_PROXY_POOL_MAX_SIZE
 from utils.default import HTTP_REQUEST_PROXY_POOL_MIN_SIZE
+from utils.default import HTTP_REQUEST_PROXY_PROBE_RATE
 
 
 class ProxyNode(object):
+    # 节点id只需要在进程内唯一, 使用递增计数代替 uuid4 以降低批量加入节点的开销
+    ID_COUNTER = itertools.count(1)
+
     __slots__ = ("id", "is_node", "value", "next")
 
     def __init__(self, o: WebProxy or None):
-        self.id = str(uuid.uuid4())
+        self.id = str(next(self.ID_COUNTER))
         self.is_node = True if isinstance(o, WebProxy) else False
         self.value = o
         self.next = None
 
 
 class ProxyPool(object):
+    """
+        ProxyPool 代理池
+        ================================================================
+        pool: 容量为 size 的环形数组, 按加入顺序保存代理节点, 满时覆盖最早加入的节点
+        _index: 节点id => 环形数组中的位置
+        _url_index: 代理URL => 节点id, 用于 O(1) 地判断代理是否已经在代理池中(重复加入时指向最新加入的节点)
+        _healthy: 可用节点id列表, 用于 O(1) 地轮转选择或随机选择可用节点, _healthy_pos 为节点id => 列表中的位置
+            节点状态在代理池之外发生变化时(例如直接调用 WebProxy.check_proxy_alive),
+            不可用节点在被选中时才从列表中移除, 重新可用的节点需要通过 test_* 或 refresh_status 加入列表
+            处于熔断状态(WebProxy.is_available)的节点保留在列表中, 选择时跳过, 冷却后自动重新参与选择
+    """
     HTTP_REQUEST_PROXY_POOL_MAX_SIZE = HTTP_REQUEST_PROXY_POOL_MAX_SIZE
     HTTP_REQUEST_PROXY_POOL_MIN_SIZE = HTTP_REQUEST_PROXY_POOL_MIN_SIZE
+    HTTP_REQUEST_PROXY_PROBE_RATE = HTTP_REQUEST_PROXY_PROBE_RATE
 
-    __slots__ = ("length", "size", "pool", "cur")
+    __slots__ = ("length", "size", "pool", "cur", "_head", "_index", "_url_index", "_healthy", "_healthy_pos", "_cursor",
+                 "_lock", "__weakref__")
 
     def __init__(self, size: int = 5):
         if size < self.HTTP_REQUEST_PROXY_POOL_MIN_SIZE:
@@ -29,9 +50,19 @@ class ProxyPool(object):
             self.size = size
 
         self.length = 0
-        self.pool = ProxyNode(None)
-        self.pool.next = self.pool
-        self.cur = self.pool
+        self.pool = [None] * self.size
+        self.cur = None
+        # 最早加入的节点在环形数组中的位置
+        self._head = 0
+        self._index = dict()
+        self._url_index = dict()
+        self._healthy = list()
+        self._healthy_pos = dict()
+        # 轮转选择时下一个可用节点在 _healthy 中的位置
+        self._cursor = 0
+        # 后台检测线程(ProxyHealthMonitor)与使用代理池的线程同时修改可用节点列表时使用的锁
+        self._lock = threading.RLock()
+        PROXY_POOLS.add(self)
 
     def is_empty(self):
         """
@@ -47,90 +78,221 @@ class ProxyPool(object):
         """
         return self.length == self.size
 
-    def add_node(self, node: WebProxy or None):
+    def _mark_node_status(self, node: ProxyNode):
         """
-            使用头插法将节点数据插入单项循环链表中
+            根据节点当前的可用状态更新可用节点队列
         :param node: 代理节点
         :return:
         """
-        head = self.pool
+        with self._lock:
+            if node.is_node and node.value.get_is_usable() and node.id not in self._healthy_pos:
+                self._healthy_pos[node.id] = len(self._healthy)
+                self._healthy.append(node.id)
+
+    def _unmark_node_status(self, node_id: str):
+        """
+            将节点从可用节点列表中移除(与列表最后一个节点交换位置后删除)
+        :param node_id: 节点id
+        :return:
+        """
+        with self._lock:
+            position = self._healthy_pos.pop(node_id, None)
+            if position is None:
+                return
+            last = self._healthy.pop()
+            if last != node_id:
+                self._healthy[position] = last
+                self._healthy_pos[last] = position
 
+    def add_node(self, node: WebProxy or None):
+        """
+            将节点数据加入代理池, 代理池满时淘汰最早加入的节点
+        :param node: 代理节点
+        :return:
+        """
         _new_node = ProxyNode(node)
-        if self.is_empty():
-            head.next = _new_node
-            _new_node.next = head
+        with self._lock:
+            if self.is_full():
+                self.delete_node()
+            position = (self._head + self.length) % self.size
+            self.pool[position] = _new_node
+            self._index[_new_node.id] = position
+            if _new_node.is_node:
+                self._url_index[node.get_url()] = _new_node.id
             self.length = self.length + 1
+            self._mark_node_status(_new_node)
             return
 
-        if self.is_full():
-            self.delete_node()
-        else:
-            self.length = self.length + 1
-
-        _new_node.next = head.next
-        head.next = _new_node
-        return
+    def add_nodes(self, nodes: list):
+        """
+            批量将节点数据加入代理池
+        :param nodes: 代理节点列表
+        :return: 实际加入代理池的节点数量
+        """
+        ''' 超过容量的部分加入后会立即被淘汰, 只加入最后 size 个节点 '''
+        if len(nodes) > self.size:
+            nodes = nodes[-self.size:]
+        with self._lock:
+            for node in nodes:
+                self.add_node(node)
+        return len(nodes)
 
     def delete_node(self) -> WebProxy or None:
         """
-            使用尾删法从单向循环链表中删除节点
+            从代理池中删除最早加入的节点
         :return: 被删除的节点
         """
-        head = self.pool
+        with self._lock:
+            if self.is_empty():
+                return None
 
-        if self.is_empty():
-            return None
+            node = self.pool[self._head]
+            self.pool[self._head] = None
+            self._head = (self._head + 1) % self.size
+            self.length = self.length - 1
+            del self._index[node.id]
+            if node.is_node and self._url_index.get(node.value.get_url(), None) == node.id:
+                del self._url_index[node.value.get_url()]
+            self._unmark_node_status(node.id)
+            if self.cur is node:
+                self.cur = None
+            return node.value
 
-        pre = self.pool
-        cur = self.pool.next
-        while cur.next.id != head.id:
-            pre = pre.next
-            cur = cur.next
+    def _position(self, index: int) -> int:
+        """
+            从最新加入的节点开始第index(从1开始, 超过节点数量时循环)个节点在环形数组中的位置
+        """
+        return (self._head + self.length - 1 - (index - 1) % self.length) % self.size
 
-        pre.next = head
-        _value = cur.value
-        cur.next = None
-        del cur
-        return _value
+    def search_node_index(self, index: int) -> ProxyNode or None:
+        """
+            查看从最新加入的节点开始第index(从1开始, 超过节点数量时循环)个节点
+        :return: 查找的节点
+        """
+        if self.is_empty() or index < 1:
+            return None
+        return self.pool[self._position(index)]
 
-    def search_node_index(self, index: int) -> WebProxy or None:
+    def search_node_id(self, node_id: str) -> ProxyNode or None:
         """
-            查看从头节点开始第index位置处的节点
+            通过节点id查找节点
+        :param node_id: 节点id
         :return: 查找的节点
         """
-        if self.is_empty():
+        position = self._index.get(node_id, None)
+        return None if position is None else self.pool[position]
+
+    def _get_healthy_node(self, position: int) -> ProxyNode or None:
+        """
+            获取可用节点列表中某个位置的节点, 节点已经不可用时将其从列表中移除并返回 None
+        :param position: 可用节点列表中的位置
+        :return: 可用节点
+        """
+        node_id = self._healthy[position]
+        node = self.search_node_id(node_id)
+        if node is None or not node.is_node or not node.value.get_is_usable():
+            self._unmark_node_status(node_id)
             return None
-        _index = 0
-        head = self.pool
-        node = self.pool
-        while _index < index:
-            node = node.next
-            _index = _index + 1
-            if node == head:
-                node = node.next
-                continue
         return node
 
-    def search_node_status(self) -> WebProxy or None:
+    def search_node_url(self, url: str) -> ProxyNode or None:
         """
-            检测代理池中距离上一次存货节点最相近的节点数据
+            通过规范的代理URL(WebProxy.get_url)查找节点
+        :param url: 代理URL
+        :return: 查找的节点
+        """
+        node_id = self._url_index.get(url, None)
+        return None if node_id is None else self.search_node_id(node_id)
+
+    def search_node_status(self) -> ProxyNode or None:
+        """
+            按轮转顺序选择下一个可用且没有熔断的节点
         :return:
         """
-        if self.is_empty():
-            return None
-        head = self.cur
-        node = self.cur.next
-        while node != head:
-            if not node.is_node:
-                node = node.next
-            elif node.is_node and not node.value.get_is_usable():
-                node = node.next
-            elif node.is_node and node.value.get_is_usable():
+        with self._lock:
+            skipped = 0
+            while self._healthy and skipped < len(self._healthy):
+                position = self._cursor % len(self._healthy)
+                node = self._get_healthy_node(position)
+                if node is None:
+                    continue
+                self._cursor = position + 1
+                if not node.value.is_available():
+                    skipped = skipped + 1
+                    continue
                 self.cur = node
                 return node
-            else:
-                node = node.next
-        return None
+            return None
+
+    def select_node(self) -> ProxyNode or None:
+        """
+            根据代理的延迟与成功率选择可用节点(power of two choices)
+            随机选择两个可用节点, 返回 WebProxy.get_score 较小(更快、更可靠)的节点, 两个节点都处于熔断状态时按轮转顺序选择
+            以 HTTP_REQUEST_PROXY_PROBE_RATE 的概率改为按轮转顺序选择, 使较慢的节点也能获得请求, 恢复后重新被选中
+        :return:
+        """
+        with self._lock:
+            if random.random() < self.HTTP_REQUEST_PROXY_PROBE_RATE:
+                return self.search_node_status()
+            while self._healthy:
+                first = self._get_healthy_node(random.randrange(len(self._healthy)))
+                if first is None:
+                    continue
+                if len(self._healthy) == 1:
+                    if not first.value.is_available():
+                        return None
+                    self.cur = first
+                    return first
+                second = self._get_healthy_node(random.randrange(len(self._healthy)))
+                if second is None:
+                    continue
+                candidates = [node for node in (first, second) if node.value.is_available()]
+                if not candidates:
+                    return self.search_node_status()
+                self.cur = min(candidates, key=lambda node: node.value.get_score())
+                return self.cur
+            return None
+
+    def iter_nodes(self) -> iter:
+        """
+            从最新加入的节点开始遍历代理池中的所有节点
+        :return:
+        """
+        end = self._head + self.length
+        if end <= self.size:
+            yield from reversed(self.pool[self._head:end])
+        else:
+            yield from reversed(self.pool[:end - self.size])
+            yield from reversed(self.pool[self._head:])
+
+    def update_node_status(self, node: ProxyNode):
+        """
+            根据节点当前的可用状态将节点加入或移出可用节点列表
+        :param node: 代理节点
+        :return:
+        """
+        if node.is_node and node.value.get_is_usable():
+            self._mark_node_status(node)
+        else:
+            self._unmark_node_status(node.id)
+
+    def healthy_count(self) -> int:
+        """
+            可用节点列表中的节点数量(包含已经不可用但尚未被移除的节点)
+        :return:
+        """
+        return len(self._healthy)
+
+    def refresh_status(self):
+        """
+            根据所有节点当前的可用状态重建可用节点队列
+        :return:
+        """
+        with self._lock:
+            self._healthy.clear()
+            self._healthy_pos.clear()
+            for node in self.iter_nodes():
+                self._mark_node_status(node)
 
     def test_node_alive(self, index: int, url: str, try_times: int = 5) -> bool:
         """
@@ -141,11 +303,65 @@ class ProxyPool(object):
         :return: True|False
         """
         node = self.search_node_index(index)
-        if node is None or not node:
+        if node is None or not node or not node.is_node:
             return False
         status, _ = node.value.check_proxy_alive(url, try_times)
+        ''' 与 test_all_node_alive 一致, 检测失败(熔断)的节点同时移出可用节点列表 '''
+        self.update_node_status(node)
         return status
 
+    @classmethod
+    def make_checker(cls, **kwargs) -> 'ProxyHealthChecker':
+        ''' 并发检测器(线程池)只在检测时才加载, 离线管理代理池时不需要 '''
+        from core.ProcessProxyChecker import ProxyHealthChecker
+        return ProxyHealthChecker(**kwargs)
+
+    def check_all_node_alive(self, url: str, checker: 'ProxyHealthChecker' = None) -> list:
+        """
+            并发检测代理池中所有节点是否存活, 并根据检测结果重建可用节点队列
+        :param url: 存活性测试的URL地址
+        :param checker: 并发检测器, 默认使用默认参数的 ProxyHealthChecker
+        :return: ProxyCheckResult 列表(顺序与 iter_nodes 一致)
+        """
+        checker = self.make_checker() if checker is None else checker
+        results = checker.check([node.value for node in self.iter_nodes() if node.is_node], url)
+        self.refresh_status()
+        return results
+
+    def load_status(self, cache: 'ProxyHealthCache') -> list:
+        """
+            从本地缓存恢复所有节点的存活状态, 并重建可用节点列表
+        :param cache: 代理存活状态缓存
+        :return: 没有保存状态或状态已经过期, 需要重新检测的代理列表
+        """
+        stale = cache.load(node.value for node in self.iter_nodes() if node.is_node)
+        self.refresh_status()
+        return stale
+
+    def save_status(self, cache: 'ProxyHealthCache') -> int:
+        """
+            将所有节点的存活状态保存到本地缓存
+        :param cache: 代理存活状态缓存
+        :return: 保存的代理数量
+        """
+        return cache.save(node.value for node in self.iter_nodes() if node.is_node)
+
+    def warm_check_all_node_alive(self, url: str, cache: 'ProxyHealthCache',
+                                  checker: 'ProxyHealthChecker' = None) -> list:
+        """
+            从本地缓存恢复存活状态, 只检测没有保存状态或状态已经过期的节点, 检测完成后保存状态
+        :param url: 存活性测试的URL地址
+        :param cache: 代理存活状态缓存
+        :param checker: 并发检测器, 默认使用默认参数的 ProxyHealthChecker
+        :return: 重新检测的节点的 ProxyCheckResult 列表
+        """
+        stale = self.load_status(cache)
+        checker = self.make_checker() if checker is None else checker
+        results = checker.check(stale, url)
+        self.refresh_status()
+        self.save_status(cache)
+        return results
+
     def test_all_node_alive(self, url: str, try_times: int = 5) -> bool:
         """
             检测代理池中所有节点是否存活
@@ -155,9 +371,15 @@ class ProxyPool(object):
         """
         if self.is_empty():
             return False
-        head = self.pool
-        node = head.next
-        while node != head:
-            _, _ = node.value.check_proxy_alive(url, try_times)
-            node = node.next
+        self.check_all_node_alive(url, self.make_checker(try_times=try_times))
         return True
+
+
+# 进程内所有的代理池, 导出指标时才统计节点数量, 不增加代理池操作的开销
+PROXY_POOLS = weakref.WeakSet()
+METRICS.gauge("proxypool_nodes", "Nodes in all proxy pools",
+              function=lambda: sum(item.length for item in list(PROXY_POOLS)))
+METRICS.gauge("proxypool_healthy_nodes", "Usable nodes in all proxy pools",
+              function=lambda: sum(item.healthy_count() for item in list(PROXY_POOLS)))
+METRICS.gauge("proxypool_unhealthy_nodes", "Unusable nodes in all proxy pools",
+              function=lambda: sum(item.length - item.healthy_count() for item in list(PROXY_POOLS)))
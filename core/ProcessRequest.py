@@ -1,65 +1,408 @@
 from core.ProcessRequestData import WebRequestsData
+import time
 import requests
-import urllib3
 from core.ProcessProxy import WebProxy
-
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from core.ProcessRetryPolicy import RetryPolicy
+from core.ProcessRetryPolicy import NO_RETRY
+from core.ProcessResponseCache import ResponseCache
+from core.ProcessMetrics import METRICS
+from core.ProcessSessionPool import SESSION_POOL
+from core.ProcessRequestBody import WebRequestsBody
+from core.ProcessResponse import WebResponse
+from core.ProcessRequestTrace import WebRequestTrace
+from core.ProcessRequestTrace import set_current_trace
+from utils.default import HTTP_REQUEST_STREAM_CHUNK_SIZE
 
 
 class WebRequest(object):
-    def __init__(self, proxies: None or WebProxy = None, *args, **kwargs):
+    # 进程级别的会话复用池, 请求从中借出会话而不是每次新建
+    SESSION_POOL = SESSION_POOL
+    # 请求体数据类型对应的 requests.Session.request 参数名称
+    DATA_TYPE_PARAM_NAME = {'data': 'data', 'json': 'json', 'files': 'files'}
+    HTTP_REQUEST_STREAM_CHUNK_SIZE = HTTP_REQUEST_STREAM_CHUNK_SIZE
+    # 流式发送请求体时由 requests 重新计算的请求头
+    STREAM_BODY_HEADER_NAME = ['content-length', 'transfer-encoding']
+    # 请求耗时记录的回调函数, 为空时不记录耗时
+    HOOKS = list()
+    # 请求耗时(包含重试)按请求方法与结果(ok 或 RetryPolicy 错误分类)的分布, 其中的 _count 即请求数量,
+    # 请求路径上每个请求只更新这一个指标
+    METRIC_REQUESTS = METRICS.histogram("webrequest_duration_seconds", "Request duration including retries",
+                                        ("method", "result"))
+    # 重试次数, 只在发生重试时更新
+    METRIC_RETRIES = METRICS.counter("webrequest_retries_total", "Retried request attempts")
+    # 传输字节数, 请求成功时更新, 流式响应的响应体由调用者读取, 按 Content-Length 计算
+    METRIC_SENT_BYTES = METRICS.counter("webrequest_sent_bytes_total", "Request body bytes sent")
+    METRIC_RECEIVED_BYTES = METRICS.counter("webrequest_received_bytes_total", "Response body bytes received")
+    # 历史记录写入失败的次数, 写入失败不影响请求的结果
+    METRIC_HISTORY_ERRORS = METRICS.counter("webrequest_history_errors_total", "Request history write failures")
+    # 历史记录写入失败时 last_error 的错误分类
+    HISTORY_ERROR = 'history'
+
+    def __init__(self, proxies: None or WebProxy = None, *args, requests_data: WebRequestsData or None = None,
+                 retry_policy: RetryPolicy or None = None, response_cache: ResponseCache or None = None,
+                 history: 'WebRequestHistory' or None = None, **kwargs):
+        # 使用的代理, 每个请求的耗时与结果记录到代理上用于按延迟与成功率选择代理以及熔断
+        self.proxy = proxies if isinstance(proxies, WebProxy) else None
         self.proxies = proxies.show_proxy() if isinstance(proxies, WebProxy) else None
-        self.data = WebRequestsData(**kwargs)
+        ''' 已经解析好的报文(例如 WebRequestsData.from_file 加载的报文)直接使用, 不再重复解析 '''
+        self.data = requests_data if isinstance(requests_data, WebRequestsData) else WebRequestsData(**kwargs)
         if self.data.is_usable:
-            self.session = requests.session()
+            self.session_key = self.SESSION_POOL.make_key(self.data.package['protocol'],
+                                                          self.data.package['header']['host'], self.proxies)
         else:
-            self.session = None
-
-    def make_request(self) -> (bool, str or requests.models.Response):
-        if self.session and isinstance(self.session, requests.Session):
-            url = f"{self.data.package['protocol']}://{self.data.package['header']['host']}/{self.data.package['line']['path']}"
-            data_type = self.data.package['data_type']
-            data = self.data.package['data']
-            if data_type == 'data':
-                try:
-                    res = self.session.request(method=self.data.package['line']['method'], url=url,
-                                               headers=self.data.package['header'], allow_redirects=True,
-                                               data=data, proxies=self.proxies, verify=False)
-                    return True, res
-                except Exception as e:
-                    return False, "发生异常错误"
-            elif data_type == 'json':
-                try:
-                    res = self.session.request(method=self.data.package['line']['method'], url=url,
-                                               headers=self.data.package['header'], allow_redirects=True,
-                                               json=data, proxies=self.proxies, verify=False)
-                    return True, res
-                except Exception as e:
-                    return False, "发生异常错误"
-            elif data_type == 'files':
+            self.session_key = None
+        # 请求失败时的重试策略, 为空时不重试; 最后一次请求失败的错误分类(RetryPolicy), 成功时为 None
+        # (请求成功但写入历史记录失败时为 HISTORY_ERROR)
+        self.retry_policy = retry_policy
+        self.last_error = None
+        # GET 请求的响应缓存(例如 ProcessResponseCache.RESPONSE_CACHE), 为空时不缓存
+        self.response_cache = response_cache
+        # 请求与响应的历史记录(ProcessRequestHistory.WebRequestHistory), 为空时不记录
+        self.history = history
+
+    @classmethod
+    def register_hook(cls, hook: callable):
+        """
+            注册请求耗时记录的回调函数, 每个请求结束后以 WebRequestTrace 为参数调用
+            没有注册回调函数时不记录耗时
+        :param hook: 回调函数 hook(trace: WebRequestTrace)
+        :return:
+        """
+        if hook not in cls.HOOKS:
+            cls.HOOKS.append(hook)
+
+    @classmethod
+    def unregister_hook(cls, hook: callable):
+        if hook in cls.HOOKS:
+            cls.HOOKS.remove(hook)
+
+    def _get_url(self) -> str:
+        return f"{self.data.package['protocol']}://{self.data.package['header']['host']}/{self.data.package['line']['path']}"
+
+    def make_request(self, timeout: float or tuple or None = None, stream: bool = False,
+                     retry_policy: RetryPolicy or None = None) -> (bool, str or requests.models.Response):
+        """
+            发送HTTP请求, 失败时按重试策略重试, 最后一次失败的错误分类记录在 last_error
+        :param timeout: 每次请求的超时时间(秒), 可以是 (连接超时, 读取超时), None 表示不限制
+        :param stream: 是否只读取响应头, 响应体由调用者按需读取
+        :param retry_policy: 本次请求使用的重试策略, 为空时使用创建时指定的重试策略
+        :return: (请求是否成功, requests.models.Response|错误提示)
+            指定了响应缓存时, 没有请求体且不是流式读取的 GET 请求优先使用缓存的响应, 相同的并发请求只发送一次
+        """
+        self.last_error = None
+        if self.session_key is None:
+            return False, "发生异常错误"
+        if self.data.package['data_type'] not in self.DATA_TYPE_PARAM_NAME:
+            return False, "发生异常错误"
+        if self.proxy is not None and not self.proxy.allow_request():
+            return False, "代理处于熔断状态"
+        policy = retry_policy if retry_policy is not None else self.retry_policy
+        if self.response_cache is not None and not stream and self._is_cacheable():
+            key = self.response_cache.make_key(self.data.package, self.session_key[2])
+            status, res, cause = self.response_cache.fetch(key, lambda headers: self._send_cached(timeout, policy,
+                                                                                                  headers), timeout)
+            if not status:
+                self.last_error = cause
+            return status, res
+        return self._send_request(timeout, stream, policy)
+
+    def _send_cached(self, timeout: float or tuple or None, policy: RetryPolicy or None,
+                     headers: dict or None) -> (bool, str or requests.models.Response, str or None):
+        ''' 响应缓存发送请求时同时返回错误分类, 等待相同请求的调用者共用该错误分类 '''
+        status, res = self._send_request(timeout, False, policy, headers)
+        return status, res, self.last_error
+
+    def _is_cacheable(self) -> bool:
+        return self.data.package['line']['method'].lower() == 'get' and not self.data.package['data']
+
+    def _send_request(self, timeout: float or tuple or None, stream: bool, policy: RetryPolicy or None,
+                      headers: dict or None = None) -> (bool, str or requests.models.Response):
+        if not self.HOOKS:
+            return self._send(timeout, stream, policy, headers=headers)
+        return self._send_with_trace(timeout, stream, policy, headers)
+
+    def _get_policy(self, policy: RetryPolicy or None) -> RetryPolicy:
+        ''' 流式请求体只能读取一次, 不能重新发送 '''
+        if policy is None or isinstance(self.data.package['data'], WebRequestsBody):
+            return NO_RETRY
+        return policy
+
+    def _send(self, timeout: float or tuple or None, stream: bool, policy: RetryPolicy or None = None,
+              trace: WebRequestTrace or None = None,
+              headers: dict or None = None) -> (bool, str or requests.models.Response):
+        method = self.data.package['line']['method'].lower()
+        start = time.perf_counter()
+        status, res, cause, attempts = self._get_policy(policy).call(lambda t: self._request(t, stream, headers),
+                                                                     timeout, method not in ('post', 'patch'))
+        cost = time.perf_counter() - start
+        if attempts > 1:
+            self.METRIC_RETRIES.inc(attempts - 1)
+        self.METRIC_REQUESTS.observe(cost, (method, 'ok' if status else cause))
+        if status:
+            if trace is None:
+                ''' 记录耗时时响应体在 _send_with_trace 中读取, 由其统计传输字节数; 没有请求体时不更新发送字节数 '''
+                sent, received = self._get_body_length(res.request.body), self._get_received_length(res, stream)
+                if sent:
+                    self.METRIC_SENT_BYTES.inc(sent)
+                if received:
+                    self.METRIC_RECEIVED_BYTES.inc(received)
+            return True, res
+        self.last_error = cause
+        if trace is not None:
+            trace.exception = type(res).__name__
+        return False, "发生异常错误"
+
+    def _request(self, timeout: float or tuple or None, stream: bool,
+                 extra_headers: dict or None = None) -> requests.models.Response:
+        """
+            发送一次HTTP请求, 失败时抛出异常, 每次请求的结果与耗时都记录到代理上
+            stream 为 True 时响应体尚未读取, 会话在响应关闭(res.close())后才归还到会话复用池
+        :param extra_headers: 追加的请求头(例如响应缓存重新校验时的 if-none-match)
+        """
+        headers, _body = self._make_body(self.data.package['data_type'])
+        if extra_headers:
+            headers = {**headers, **extra_headers}
+        session = self.SESSION_POOL.acquire(self.session_key)
+        start = time.perf_counter()
+        status = False
+        try:
+            res = session.request(method=self.data.package['line']['method'], url=self._get_url(),
+                                  headers=headers, allow_redirects=True,
+                                  proxies=self.proxies, verify=False, timeout=timeout, stream=stream, **_body)
+            status = True
+            if stream:
+                self._release_on_close(res, session)
+            return res
+        finally:
+            if not (status and stream):
+                self.SESSION_POOL.release(self.session_key, session)
+            if self.proxy is not None:
+                self.proxy.record(status, time.perf_counter() - start)
+
+    def _release_on_close(self, res: requests.models.Response, session: requests.Session):
+        """
+            流式响应仍然占用会话中的连接, 在响应关闭时才归还会话(只归还一次)
+        """
+        close = res.close
+        released = list()
+
+        def _close():
+            try:
+                close()
+            finally:
+                if not released:
+                    released.append(True)
+                    self.SESSION_POOL.release(self.session_key, session)
+
+        res.close = _close
+
+    def _send_with_trace(self, timeout: float or tuple or None, stream: bool, policy: RetryPolicy or None = None,
+                         headers: dict or None = None) -> (bool, str or requests.models.Response):
+        """
+            发送HTTP请求并记录各阶段耗时, 记录完成后交给所有注册的回调函数
+            响应头与响应体分开读取, 以便区分首字节耗时与响应体传输耗时
+        """
+        trace = WebRequestTrace(self.data.package['line']['method'], self._get_url(),
+                                self.session_key[2])
+        set_current_trace(trace)
+        start = time.perf_counter()
+        try:
+            status, res = self._send(timeout, True, policy, trace, headers)
+            if status:
+                trace.ttfb = time.perf_counter() - start - trace.setup_cost()
+                trace.status_code = res.status_code
+                trace.bytes_sent = self._get_body_length(res.request.body)
+                if not stream:
+                    _start = time.perf_counter()
+                    try:
+                        trace.bytes_received = len(res.content)
+                    except Exception as e:
+                        trace.exception = type(e).__name__
+                        status = False
+                    finally:
+                        ''' 响应体已经读取(或读取失败), 归还会话 '''
+                        res.close()
+                    if not status:
+                        res = "发生异常错误"
+                    trace.transfer = time.perf_counter() - _start
+                self._count_bytes(trace.bytes_sent,
+                                  trace.bytes_received if not stream else self._get_received_length(res, True))
+            return status, res
+        finally:
+            set_current_trace(None)
+            trace.total = time.perf_counter() - start
+            trace.reused = trace.exception is None and trace.connect is None
+            for hook in list(self.HOOKS):
                 try:
-                    res = self.session.request(method=self.data.package['line']['method'], url=url,
-                                               headers=self.data.package['header'], allow_redirects=True,
-                                               files=data, proxies=self.proxies, verify=False)
-                    return True, res
+                    hook(trace)
                 except Exception as e:
-                    return False, "发生异常错误"
-            else:
-                return False, "发生异常错误"
-        else:
-            return False, "发生异常错误"
+                    pass
 
-    def make_response(self, charset="UTF-8") -> (bool, str):
-        status, res = self.make_request()
-        if not status or not isinstance(res, requests.models.Response):
+    @classmethod
+    def _count_bytes(cls, sent: int or None, received: int or None):
+        if sent:
+            cls.METRIC_SENT_BYTES.inc(sent)
+        if received:
+            cls.METRIC_RECEIVED_BYTES.inc(received)
+
+    @classmethod
+    def _get_received_length(cls, res: requests.models.Response, stream: bool) -> int or None:
+        """
+            响应体的字节数, 流式响应的响应体尚未读取, 使用 Content-Length(没有时为 None)
+        """
+        if not stream:
+            return len(res.content)
+        length = res.headers.get('content-length', '')
+        return int(length) if length.isdigit() else None
+
+    @classmethod
+    def _get_body_length(cls, body) -> int or None:
+        if body is None:
+            return 0
+        if isinstance(body, str):
+            return len(body.encode("utf-8"))
+        if isinstance(body, memoryview):
+            return body.nbytes
+        if isinstance(body, (bytes, bytearray)):
+            return len(body)
+        return getattr(body, 'len', None)
+
+    def _make_body(self, data_type: str) -> (dict, dict):
+        """
+            根据请求体数据类型构造 requests.Session.request 的请求头与请求体参数
+            流式请求体(WebRequestsBody)无论数据类型都作为 data 发送, 长度与传输编码由 requests 重新计算
+        :param data_type: 请求体数据类型
+        :return: (请求头, 请求体参数)
+        """
+        headers = self.data.package['header']
+        data = self.data.package['data']
+        if not isinstance(data, WebRequestsBody):
+            return headers, {self.DATA_TYPE_PARAM_NAME[data_type]: data}
+        headers = {k: v for k, v in headers.items() if k not in self.STREAM_BODY_HEADER_NAME}
+        if data.content_type:
+            headers['content-type'] = data.content_type
+        return headers, {'data': data}
+
+    def make_response(self, charset="UTF-8", timeout: float or tuple or None = None) -> (bool, str):
+        status, res = self.make_web_response(charset, timeout)
+        if not status:
             return False, ""
-        headers = res.headers
-        _headers = list()
-        url = res.url
-        status_code = res.status_code
-        content = res.content.decode(res.encoding if res.encoding is not None else charset)
-        for k, v in headers.items():
-            _headers.append(f"{k}:{v}")
-        headers = "\r\n".join(_headers)
-        result = f"{self.data.package['line']['version']} {url} {status_code}\r\n{headers}\r\n\r\n{content}"
-        return True, result
+        return True, res.to_str()
+
+    def make_web_response(self, charset="UTF-8",
+                          timeout: float or tuple or None = None) -> (bool, WebResponse or None):
+        """
+            发送HTTP请求并返回结构化的响应, 响应体只在访问 text 时才解码
+        :param charset: 响应没有声明编码时使用的编码
+        :param timeout: 请求超时时间(秒)
+        :return: (请求是否成功, WebResponse), 写入历史记录失败时仍然返回响应, last_error 为 HISTORY_ERROR
+        """
+        status, res = self.make_request(timeout)
+        if not status or not isinstance(res, requests.models.Response):
+            return False, None
+        response = WebResponse.from_response(self.data.package['line']['version'], res, charset)
+        if self.history is not None:
+            self._append_history(response)
+        return True, response
+
+    def _append_history(self, response: WebResponse):
+        """
+            将请求与响应写入历史记录
+            写入失败(例如磁盘已满)时不抛出异常, 请求已经被服务端处理, 仍然返回响应,
+            错误分类记录为 HISTORY_ERROR 并计入 METRIC_HISTORY_ERRORS
+        :param response: 响应
+        :return:
+        """
+        try:
+            self.history.append(self.data, response)
+        except (OSError, ValueError):
+            self.last_error = self.HISTORY_ERROR
+            self.METRIC_HISTORY_ERRORS.inc()
+
+    def make_raw_response(self, charset="UTF-8", timeout: float or None = None,
+                          transport: 'RawTransport' or None = None) -> (bool, WebResponse or None):
+        """
+            不经过 requests, 通过原始套接字传输发送报文并返回结构化的响应
+            bytes 形式解析的报文按原始请求行与请求头逐字节发送, 请求头不会被改写或转为小写
+        :param charset: 响应没有声明编码时使用的编码
+        :param timeout: 连接与读取的超时时间(秒)
+        :param transport: 原始套接字传输, 默认使用进程级别的 RAW_TRANSPORT
+        :return: (请求是否成功, WebResponse), 写入历史记录失败时仍然返回响应, last_error 为 HISTORY_ERROR
+        """
+        ''' 原始套接字传输只在第一次使用时加载 '''
+        from core.ProcessTransport import RawTransport
+        from core.ProcessTransport import RAW_TRANSPORT
+        transport = transport if isinstance(transport, RawTransport) else RAW_TRANSPORT
+        self.last_error = None
+        if self.proxy is not None and not self.proxy.allow_request():
+            return False, None
+        start = time.perf_counter()
+        status, res = transport.make_response(self.data, self.proxies, timeout, charset)
+        if self.proxy is not None:
+            self.proxy.record(status, time.perf_counter() - start)
+        if not status:
+            return False, None
+        if self.history is not None:
+            self._append_history(res)
+        return True, res
+
+    def make_stream_response(self, chunk_size: int = HTTP_REQUEST_STREAM_CHUNK_SIZE,
+                             timeout: float or tuple or None = None) -> (bool, iter):
+        """
+            以流的方式读取响应, 内存占用不超过 chunk_size
+            返回的生成器首先产生状态行与响应头(str), 之后按块产生响应体(bytes)
+        :param chunk_size: 每次读取的响应体大小
+        :param timeout: 请求超时时间(秒)
+        :return: (请求是否成功, 生成器)
+        """
+        status, res = self.make_request(timeout, stream=True)
+        if not status or not isinstance(res, requests.models.Response):
+            return False, iter(())
+        return True, self._iter_response(res, chunk_size)
+
+    def _iter_response(self, res: requests.models.Response, chunk_size: int) -> iter:
+        try:
+            yield WebResponse.format_header_block(self.data.package['line']['version'], res.url, res.status_code,
+                                                  res.headers)
+            for chunk in res.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    yield chunk
+        finally:
+            res.close()
+
+    def save_response(self, sink: str or callable or object, chunk_size: int = HTTP_REQUEST_STREAM_CHUNK_SIZE,
+                      timeout: float or tuple or None = None, charset="UTF-8") -> (bool, int):
+        """
+            以流的方式将响应直接写入文件或交给回调函数, 内存占用不超过 chunk_size
+        :param sink: 文件路径 / 带有 write 方法的对象 / 接收 bytes 的回调函数
+        :param chunk_size: 每次读取的响应体大小
+        :param timeout: 请求超时时间(秒)
+        :param charset: 状态行与响应头写入时使用的编码
+        :return: (是否成功, 写入的字节数)
+        """
+        status, chunks = self.make_stream_response(chunk_size, timeout)
+        if not status:
+            return False, 0
+        if isinstance(sink, str):
+            with open(sink, 'wb') as f:
+                return self._write_response(chunks, f.write, charset)
+        if hasattr(sink, 'write'):
+            return self._write_response(chunks, sink.write, charset)
+        if callable(sink):
+            return self._write_response(chunks, sink, charset)
+        chunks.close()
+        return False, 0
+
+    @classmethod
+    def _write_response(cls, chunks, write: callable, charset: str) -> (bool, int):
+        total = 0
+        try:
+            for chunk in chunks:
+                chunk = chunk.encode(charset) if isinstance(chunk, str) else chunk
+                write(chunk)
+                total = total + len(chunk)
+        except Exception as e:
+            return False, total
+        finally:
+            chunks.close()
+        return True, total
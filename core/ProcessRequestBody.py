@@ -0,0 +1,116 @@
+import os
+import mmap
+import uuid
+from utils.default import HTTP_REQUEST_BODY_CHUNK_SIZE
+
+
+class WebRequestsBody(object):
+    """
+        WebRequestsBody 流式发送的请求体, 发送过程中占用的内存不超过 chunk_size
+        ================================================================
+        可以由文件路径、mmap/bytes 等缓冲区或者产生 bytes 的可迭代对象构造
+        len: 请求体长度, 长度未知(None)时使用 chunked 传输编码发送
+        content_type: 请求体的 Content-Type, 为 None 时保留报文中原有的请求头
+        由文件路径、缓冲区或 multipart 构造的请求体可以重复发送, 由迭代器构造的请求体只能发送一次
+    """
+    HTTP_REQUEST_BODY_CHUNK_SIZE = HTTP_REQUEST_BODY_CHUNK_SIZE
+
+    # 注意: 不能定义 __len__/fileno/tell, requests 通过 len 属性获取长度, 为 None 时使用 chunked 编码
+    __slots__ = ('_path', '_buffer', '_iterable', 'len', 'chunk_size', 'content_type')
+
+    def __init__(self, path: str or None = None, buffer=None, iterable=None, length: int or None = None,
+                 chunk_size: int = HTTP_REQUEST_BODY_CHUNK_SIZE, content_type: str or None = None):
+        self._path = path
+        self._buffer = memoryview(buffer).cast('B') if buffer is not None else None
+        self._iterable = iterable
+        self.chunk_size = chunk_size if chunk_size > 0 else self.HTTP_REQUEST_BODY_CHUNK_SIZE
+        self.content_type = content_type
+        if path is not None:
+            self.len = os.path.getsize(path)
+        elif self._buffer is not None:
+            self.len = self._buffer.nbytes
+        else:
+            self.len = length
+
+    @classmethod
+    def from_path(cls, path: str, chunk_size: int = HTTP_REQUEST_BODY_CHUNK_SIZE,
+                  content_type: str or None = None) -> 'WebRequestsBody':
+        return cls(path=path, chunk_size=chunk_size, content_type=content_type)
+
+    @classmethod
+    def from_buffer(cls, buffer: bytes or bytearray or memoryview or mmap.mmap,
+                    chunk_size: int = HTTP_REQUEST_BODY_CHUNK_SIZE,
+                    content_type: str or None = None) -> 'WebRequestsBody':
+        return cls(buffer=buffer, chunk_size=chunk_size, content_type=content_type)
+
+    @classmethod
+    def from_iterable(cls, iterable, length: int or None = None, chunk_size: int = HTTP_REQUEST_BODY_CHUNK_SIZE,
+                      content_type: str or None = None) -> 'WebRequestsBody':
+        return cls(iterable=iterable, length=length, chunk_size=chunk_size, content_type=content_type)
+
+    @classmethod
+    def multipart(cls, files: dict, fields: dict or None = None, boundary: str or None = None,
+                  chunk_size: int = HTTP_REQUEST_BODY_CHUNK_SIZE) -> 'WebRequestsBody':
+        """
+            构造流式发送的 multipart/form-data 请求体, 文件内容不会一次性读入内存
+        :param files: {字段名: 文件路径 | (文件名, 文件路径|WebRequestsBody[, Content-Type])}
+        :param fields: {字段名: 字段值} 普通表单字段
+        :param boundary: 分隔符, 默认随机生成
+        :param chunk_size: 每次读取的文件大小
+        :return: WebRequestsBody
+        """
+        boundary = boundary if boundary else uuid.uuid4().hex
+        parts = list()
+        for name, value in (fields or dict()).items():
+            value = value if isinstance(value, bytes) else str(value).encode("utf-8")
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode("utf-8")
+                         + value + b"\r\n")
+        for name, value in files.items():
+            if not isinstance(value, (tuple, list)):
+                value = (os.path.basename(value), value)
+            filename, source = value[0], value[1]
+            content_type = value[2] if len(value) > 2 else "application/octet-stream"
+            source = source if isinstance(source, WebRequestsBody) else cls.from_path(source, chunk_size)
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                         f'Content-Type: {content_type}\r\n\r\n'.encode("utf-8"))
+            parts.append(source)
+            parts.append(b"\r\n")
+        parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+
+        ''' 所有部分的长度都已知时才能计算整个请求体的长度 '''
+        length = 0
+        for item in parts:
+            _length = item.len if isinstance(item, WebRequestsBody) else len(item)
+            if _length is None:
+                length = None
+                break
+            length = length + _length
+        return cls(iterable=parts, length=length, chunk_size=chunk_size,
+                   content_type=f"multipart/form-data; boundary={boundary}")
+
+    def __iter__(self):
+        if self._path is not None:
+            with open(self._path, 'rb') as f:
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+        elif self._buffer is not None:
+            for index in range(0, self._buffer.nbytes, self.chunk_size):
+                yield self._buffer[index:index + self.chunk_size]
+        elif self._iterable is not None:
+            ''' 超过 chunk_size 的块按 chunk_size 切分后发送 '''
+            for chunk in self._iterable:
+                if isinstance(chunk, WebRequestsBody):
+                    yield from chunk
+                    continue
+                chunk = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+                if not chunk:
+                    continue
+                if len(chunk) <= self.chunk_size:
+                    yield chunk
+                    continue
+                view = memoryview(chunk)
+                for index in range(0, view.nbytes, self.chunk_size):
+                    yield view[index:index + self.chunk_size]
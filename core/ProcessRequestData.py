@@ -1,6 +1,12 @@
 import re
+import mmap
+from collections.abc import Mapping
 from utils.default import HTTP_REQUEST_PROTOCOL
 from utils.default import HTTP_REQUEST_DATA_TYPE
+from core.ProcessRequestParser import WebRequestsParser
+from core.ProcessRequestPackage import WebRequestsPackage
+from core.ProcessRequestParser import HTTP_REQUEST_LINE_MODE
+from core.ProcessRequestParser import HTTP_REQUEST_HEADERS_MODE
 
 
 class WebRequestsData(object):
@@ -22,34 +28,125 @@ class WebRequestsData(object):
             'protocol': 'https',
             'data_type': 'data'
         }
+        bytes 形式的报文指定 compact=True 时解析为紧凑的 WebRequestsPackage(只读, 通过相同的键访问, 占用内存更少,
+        但每次访问请求头都会重新解码), 适合大量长时间保留的报文; 默认以及其余方式为上面的字典
     """
     HTTP_REQUEST_PROTOCOL = HTTP_REQUEST_PROTOCOL
     HTTP_REQUEST_DATA_TYPE = HTTP_REQUEST_DATA_TYPE
     # 构建HTTP请求package的参数名称
     HEADER_LINE_PARAM_NAME = ['method', 'path', 'version']
 
+    __slots__ = ('is_usable', 'protocol', 'data_type', 'mode', 'package', '_mmap', '_raw_head',
+                 'method', 'path', 'version', 'headers', 'host', 'data')
+
     def __init__(self, protocol: str = 'http', data_type: str = 'data', mode: str = 'stream', **kwargs):
         from utils.utils import get_str_from_dict
         self.is_usable = True
         self.protocol = protocol
         self.data_type = data_type
         self.mode = mode
+        # 通过 from_file 加载报文时映射的文件
+        self._mmap = None
+        # 原始的请求行与请求头(memoryview), 用于原样发送报文, bytes形式的报文在访问时才从 package 中获取
+        self._raw_head = None
 
         if self.mode == 'stream':
-            content = get_str_from_dict('content', kwargs, str, "")
-            self.package = self._parse_html_request(content)
+            content = kwargs.get('content', None)
+            if isinstance(content, WebRequestsParser.BUFFER_TYPES):
+                ''' bytes形式的报文使用单次扫描解析, 请求体保持为零拷贝切片 '''
+                self.package = self._parse_bytes_request(content, kwargs.get('compact', False))
+            else:
+                content = get_str_from_dict('content', kwargs, str, "")
+                self.package = self._parse_html_request(content)
             self._check_requests_package()
         else:
             ''' 将字典转化为清河报文(组合) '''
             self.method = get_str_from_dict('method', kwargs, str, "get")
             self.path = get_str_from_dict('path', kwargs, str, "/")
             self.version = get_str_from_dict('version', kwargs, str, "")
-            self.headers = get_str_from_dict('headers', kwargs, str, "")
+            self.headers = {k.lower(): v for k, v in get_str_from_dict('headers', kwargs, dict, dict()).items()}
             self.host = get_str_from_dict('host', kwargs, str, "")
-            self.data = get_str_from_dict('data', kwargs, any, None)
+            self.data = get_str_from_dict('data', kwargs, object, "")
             self.package = self._combine_param()
             self._check_requests_package()
 
+    @classmethod
+    def from_file(cls, path: str, protocol: str = 'http', data_type: str = 'data',
+                  compact: bool = False) -> 'WebRequestsData':
+        """
+            通过内存映射(mmap)加载保存在磁盘上的HTTP Request报文
+            只解析请求行与请求头, 请求体保持为映射文件上的 memoryview 切片, 发送时不会拷贝为字符串
+            使用完成后需要调用 close 释放映射文件
+        :param path: 报文文件路径
+        :param protocol: 报文使用的协议
+        :param data_type: 报文请求体的数据类型
+        :param compact: 是否解析为紧凑的 WebRequestsPackage
+        :return: WebRequestsData
+        """
+        try:
+            with open(path, 'rb') as f:
+                _mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            ''' 文件不存在或文件为空时无法映射, 返回不可用的报文 '''
+            return cls(protocol=protocol, data_type=data_type, mode='stream', content="")
+        o = cls(protocol=protocol, data_type=data_type, mode='stream', content=_mmap, compact=compact)
+        o._mmap = _mmap
+        return o
+
+    @classmethod
+    def from_package(cls, package: dict, protocol: str = 'http', data_type: str = 'data') -> 'WebRequestsData':
+        """
+            使用已经解析并校验过的 package 直接构造报文, 不再重复解析与校验
+            (例如 WebRequestsTemplate 渲染出的 package)
+        :param package: 已校验的HTTP请求package
+        :param protocol: 报文使用的协议
+        :param data_type: 报文请求体的数据类型
+        :return: WebRequestsData
+        """
+        o = cls.__new__(cls)
+        o.is_usable = True
+        o.protocol = protocol
+        o.data_type = data_type
+        o.mode = 'stream'
+        o._mmap = None
+        o._raw_head = None
+        o.package = package
+        return o
+
+    @property
+    def raw_head(self) -> memoryview or None:
+        if self._raw_head is None and isinstance(self.package, WebRequestsPackage):
+            return self.package.get_head()
+        return self._raw_head
+
+    @raw_head.setter
+    def raw_head(self, value: memoryview or None):
+        self._raw_head = value
+
+    def close(self):
+        """
+            释放请求体视图以及 from_file 映射的文件
+        :return:
+        """
+        if self._mmap is None:
+            return
+        if isinstance(self.package, WebRequestsPackage):
+            ''' 保留请求行与请求头的拷贝, 释放原始报文上的视图 '''
+            self.package.detach()
+        else:
+            for item in (self.package.get('data', None), self._raw_head):
+                if isinstance(item, memoryview):
+                    item.release()
+        self._raw_head = None
+        self._mmap.close()
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     @classmethod
     def _get_requests_header_line_mode(cls) -> re.Pattern:
         """
@@ -57,7 +154,7 @@ class WebRequestsData(object):
             HTTP 请求行必须严格按照 protocol path?search_param#fragment version
         :return: 请求行验证模板
         """
-        return re.compile("^(?P<method>(GET|POST))\s+(?P<path>(\S*))\s+(?P<version>(.*))", re.I)
+        return HTTP_REQUEST_LINE_MODE
 
     def _get_requests_header_line_param(self, content) -> re.Match:
         """
@@ -100,7 +197,7 @@ class WebRequestsData(object):
             获取请求头数据分离的模板
         :return: 请求头数据分离的模板
         """
-        return re.compile("(?P<key>(\S*?)):(?P<value>(.*))", re.I)
+        return HTTP_REQUEST_HEADERS_MODE
 
     @classmethod
     def _parse_request_headers_header(cls, mode: re.Pattern, content: str) -> (str, str):
@@ -185,6 +282,18 @@ class WebRequestsData(object):
             'data_type': self.data_type
         }
 
+    def _parse_bytes_request(self, content, compact: bool = False) -> dict or WebRequestsPackage:
+        """
+            将bytes形式的HTTP Request报文解析成由请求行、请求头、请求体组成的字典
+        :param content: HTTP Request报文(bytes/bytearray/memoryview/mmap)
+        :param compact: 是否解析为紧凑的 WebRequestsPackage
+        :return:
+        """
+        parser = WebRequestsParser(self.protocol, self.data_type, compact)
+        self.is_usable, package = parser.parse(content)
+        self._raw_head = parser.head
+        return package
+
     def _check_requests_package(self):
         """
             校验基础的HTTP请求内容是否完整
@@ -193,7 +302,7 @@ class WebRequestsData(object):
         if self.is_usable:
             line = self.package.get('line', dict())
             header = self.package.get('header', dict())
-            if not line or not isinstance(line, dict) or not header or not isinstance(header, dict):
+            if not line or not isinstance(line, Mapping) or not header or not isinstance(header, Mapping):
                 self.is_usable = False
                 return
             line_method = line.get('method', '')
@@ -230,7 +339,7 @@ class WebRequestsData(object):
                 'path': self.path,
                 'version': self.version
             },
-            'headers': self.headers,
+            'header': self.headers,
             'data': self.data,
             'protocol': self.protocol,
             'data_type': self.data_type
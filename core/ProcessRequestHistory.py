@@ -0,0 +1,371 @@
+import os
+import json
+import mmap
+import time
+import struct
+import threading
+from core.ProcessRequestData import WebRequestsData
+from core.ProcessRequestBody import WebRequestsBody
+from core.ProcessResponse import WebResponse
+from utils.default import HTTP_REQUEST_HISTORY_PATH
+from utils.default import HTTP_REQUEST_HISTORY_SEGMENT_SIZE
+from utils.default import HTTP_REQUEST_HISTORY_MAX_READERS
+
+
+class WebHistoryRecord(object):
+    """
+        WebHistoryRecord 一条请求与响应的历史记录, 只保存位置, 报文在访问时才从分段文件中读取
+        ================================================================
+        seq: 序号(从 0 开始连续递增)
+        time: 记录时间(时间戳, 按序号不递减)
+        segment / offset: 所在的分段文件编号 / 在分段文件中的偏移
+        request_size / response_size: 请求报文 / 响应报文的字节数, 两者在分段文件中相邻保存
+    """
+    __slots__ = ('seq', 'time', 'segment', 'offset', 'request_size', 'response_size', '_history')
+
+    def __init__(self, history: 'WebRequestHistory', seq: int, time: float, segment: int, offset: int,
+                 request_size: int, response_size: int):
+        self._history = history
+        self.seq = seq
+        self.time = time
+        self.segment = segment
+        self.offset = offset
+        self.request_size = request_size
+        self.response_size = response_size
+
+    def get_request(self) -> bytes:
+        return self._history.read(self.segment, self.offset, self.request_size)
+
+    def get_response(self) -> bytes:
+        return self._history.read(self.segment, self.offset + self.request_size, self.response_size)
+
+    def get_requests_data(self, protocol: str = 'http', data_type: str = 'data',
+                          compact: bool = False) -> WebRequestsData:
+        """
+            将保存的请求报文重新解析为 WebRequestsData, 可以直接用于重放
+            需要在内存中保留大量重新解析的记录时指定 compact=True(WebRequestsPackage)
+        """
+        return WebRequestsData(protocol, data_type, content=self.get_request(), compact=compact)
+
+    def __repr__(self) -> str:
+        return f"WebHistoryRecord(seq={self.seq}, time={self.time}, request_size={self.request_size}, " \
+               f"response_size={self.response_size})"
+
+
+class WebRequestHistory(object):
+    """
+        WebRequestHistory 只追加写入的请求与响应历史记录, 保存在磁盘上, 内存占用不随记录数量增长
+        ================================================================
+        path: 保存目录, 其中包含
+            history.index: 定长记录的偏移索引, 通过 mmap 访问, 第 seq 条记录位于 HEADER.size + seq * RECORD.size
+            history.<segment>.log: 分段文件, 依次保存每条记录的原始请求报文与响应报文
+        segment_size: 分段文件的大小上限(字节), 超过后写入新的分段文件
+        max_readers: 同时打开用于读取的分段文件的最大数量
+        按序号查找为 O(1), 记录时间按序号不递减, 按时间范围查找先二分定位起始序号再顺序读取索引
+        重新打开时只映射索引文件并读取最后一条记录, 不扫描分段文件;
+        先写入报文再写入索引记录, 最后更新记录数量, 进程中断时未完成的记录被丢弃
+    """
+    HTTP_REQUEST_HISTORY_SEGMENT_SIZE = HTTP_REQUEST_HISTORY_SEGMENT_SIZE
+    HTTP_REQUEST_HISTORY_MAX_READERS = HTTP_REQUEST_HISTORY_MAX_READERS
+    INDEX_NAME = "history.index"
+    SEGMENT_NAME = "history.{:06d}.log"
+    MAGIC = b"WRHIST01"
+    # 索引文件头: (MAGIC, 记录数量), 补齐到 32 字节
+    HEADER = struct.Struct("<8sQ16x")
+    # 索引记录: (记录时间, 分段文件中的偏移, 分段文件编号, 请求报文字节数, 响应报文字节数, 保留)
+    RECORD = struct.Struct("<dQIIII")
+    # 索引文件每次扩展时至少增加的记录数量, 之后每次翻倍
+    INDEX_GROW_SIZE = 4096
+    # 请求报文 / 响应报文的最大字节数
+    MAX_SIZE = 0xFFFFFFFF
+
+    __slots__ = ('path', 'segment_size', 'max_readers', '_lock', '_index_file', '_index', '_count',
+                 '_capacity', '_segment', '_position', '_writer', '_readers', '_last_time')
+
+    def __init__(self, path: str = HTTP_REQUEST_HISTORY_PATH,
+                 segment_size: int = HTTP_REQUEST_HISTORY_SEGMENT_SIZE,
+                 max_readers: int = HTTP_REQUEST_HISTORY_MAX_READERS):
+        self.path = path
+        self.segment_size = segment_size
+        self.max_readers = max(1, max_readers)
+        self._lock = threading.Lock()
+        # 分段文件编号 => 用于读取的文件对象, 按最近使用的顺序排列
+        self._readers = dict()
+        self._writer = None
+        os.makedirs(path, exist_ok=True)
+        self._open_index()
+        self._open_writer()
+
+    def _open_index(self):
+        index_path = os.path.join(self.path, self.INDEX_NAME)
+        self._index_file = open(index_path, "r+b" if os.path.exists(index_path) else "w+b")
+        size = os.fstat(self._index_file.fileno()).st_size
+        if size < self.HEADER.size:
+            self._index_file.truncate(self.HEADER.size + self.INDEX_GROW_SIZE * self.RECORD.size)
+            self._index = mmap.mmap(self._index_file.fileno(), 0)
+            self.HEADER.pack_into(self._index, 0, self.MAGIC, 0)
+        else:
+            self._index = mmap.mmap(self._index_file.fileno(), 0)
+        magic, count = self.HEADER.unpack_from(self._index, 0)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError(f"{index_path} is not a request history index")
+        self._capacity = (len(self._index) - self.HEADER.size) // self.RECORD.size
+        self._count = min(count, self._capacity)
+
+    def _open_writer(self):
+        """
+            继续写入最后一条记录所在的分段文件, 截断其后未完成写入的内容
+        """
+        if self._count:
+            _time, offset, segment, request_size, response_size, _ = self._unpack(self._count - 1)
+            self._segment, self._position, self._last_time = segment, offset + request_size + response_size, _time
+        else:
+            self._segment, self._position, self._last_time = 0, 0, 0.0
+        segment_path = self._segment_path(self._segment)
+        self._writer = open(segment_path, "r+b" if os.path.exists(segment_path) else "w+b")
+        self._writer.truncate(self._position)
+        self._writer.seek(self._position)
+
+    def _rollback(self):
+        """
+            丢弃写入失败(例如磁盘已满)的记录, 缓冲区中未写入的数据随文件对象一起丢弃,
+            重新打开分段文件并截断到上一条记录结束的位置, 之后的记录仍然写在正确的偏移处
+            索引无法重新映射时不再打开分段文件, 之后的写入按已经关闭处理
+        """
+        try:
+            self._writer.close()
+        except OSError:
+            pass
+        self._writer = None
+        if self._index is not None:
+            self._open_writer()
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, self.SEGMENT_NAME.format(segment))
+
+    def _unpack(self, seq: int) -> tuple:
+        return self.RECORD.unpack_from(self._index, self.HEADER.size + seq * self.RECORD.size)
+
+    def _grow_index(self):
+        ''' 先关闭映射再扩展文件, 部分平台不允许扩展已经映射的文件 '''
+        capacity = self._capacity + max(self.INDEX_GROW_SIZE, self._capacity)
+        self._index.flush()
+        self._index.close()
+        self._index = None
+        try:
+            self._index_file.truncate(self.HEADER.size + capacity * self.RECORD.size)
+        finally:
+            ''' 扩展失败时按文件当前的大小重新映射, 重新映射也失败时历史记录视为已经关闭 '''
+            self._index = mmap.mmap(self._index_file.fileno(), 0)
+            self._capacity = (len(self._index) - self.HEADER.size) // self.RECORD.size
+
+    def _rotate(self):
+        self._writer.close()
+        self._segment = self._segment + 1
+        self._position = 0
+        self._writer = open(self._segment_path(self._segment), "w+b")
+
+    @classmethod
+    def _to_parts(cls, item) -> list:
+        """
+            将请求报文 / 响应转为依次写入的 bytes 片段, 不合并片段以避免拷贝较大的报文
+        :param item: bytes/bytearray/memoryview/str/WebRequestsData/WebResponse/None
+        :return: [bytes-like, ...]
+        """
+        if item is None:
+            return []
+        if isinstance(item, (bytes, bytearray, memoryview)):
+            return [item]
+        if isinstance(item, str):
+            return [item.encode("utf-8")]
+        if isinstance(item, WebResponse):
+            return [item.header_block.encode("utf-8"), item.content or b""]
+        if isinstance(item, WebRequestsData):
+            return cls._request_parts(item)
+        raise TypeError(f"unsupported history item {type(item).__name__}")
+
+    @classmethod
+    def _request_parts(cls, data: WebRequestsData) -> list:
+        if not data.is_usable:
+            return []
+        head = data.raw_head
+        if head is None:
+            line = data.package['line']
+            _lines = [f"{line['method'].upper()} {line['path']} {line['version'].upper()}"]
+            _lines.extend(f"{k}: {v}" for k, v in data.package['header'].items())
+            head = ("\r\n".join(_lines) + "\r\n\r\n").encode("latin-1")
+        body = data.package['data']
+        if isinstance(body, WebRequestsBody) or not body:
+            ''' 流式请求体只能读取一次, 只记录请求行与请求头 '''
+            return [head]
+        if isinstance(body, str):
+            return [head, body.encode("utf-8")]
+        if not isinstance(body, (bytes, bytearray, memoryview)):
+            return [head, json.dumps(body).encode("utf-8")]
+        return [head, body]
+
+    @classmethod
+    def _get_size(cls, parts: list) -> int:
+        return sum(item.nbytes if isinstance(item, memoryview) else len(item) for item in parts)
+
+    def append(self, request, response=None, timestamp: float or None = None) -> int:
+        """
+            追加一条请求与响应的历史记录
+        :param request: 请求报文(bytes/str) 或 WebRequestsData
+        :param response: 响应(bytes/str, 例如 make_response 返回的字符串) 或 WebResponse, 为空时只记录请求
+        :param timestamp: 记录时间, 默认为当前时间; 早于上一条记录时使用上一条记录的时间
+        :return: 记录的序号
+        """
+        request_parts, response_parts = self._to_parts(request), self._to_parts(response)
+        request_size, response_size = self._get_size(request_parts), self._get_size(response_parts)
+        if request_size > self.MAX_SIZE or response_size > self.MAX_SIZE:
+            raise ValueError("request or response is too large for the history")
+        with self._lock:
+            if self._index is None:
+                raise ValueError("request history is closed")
+            if self._position and self._position + request_size + response_size > self.segment_size:
+                self._rotate()
+            seq = self._count
+            try:
+                if seq >= self._capacity:
+                    self._grow_index()
+                for item in request_parts + response_parts:
+                    self._writer.write(item)
+                self._writer.flush()
+            except BaseException:
+                self._rollback()
+                raise
+            self._last_time = max(time.time() if timestamp is None else timestamp, self._last_time)
+            self.RECORD.pack_into(self._index, self.HEADER.size + seq * self.RECORD.size, self._last_time,
+                                  self._position, self._segment, request_size, response_size, 0)
+            ''' 记录数量最后更新, 之前中断时这条记录不可见 '''
+            self.HEADER.pack_into(self._index, 0, self.MAGIC, seq + 1)
+            self._count = seq + 1
+            self._position = self._position + request_size + response_size
+        return seq
+
+    def get(self, seq: int) -> WebHistoryRecord or None:
+        """
+            按序号查找历史记录, O(1)
+        :param seq: 序号, 负数表示从最后一条记录倒数
+        :return: 历史记录, 不存在时为 None
+        """
+        with self._lock:
+            seq = seq + self._count if seq < 0 else seq
+            if self._index is None or not 0 <= seq < self._count:
+                return None
+            _time, offset, segment, request_size, response_size, _ = self._unpack(seq)
+        return WebHistoryRecord(self, seq, _time, segment, offset, request_size, response_size)
+
+    def __getitem__(self, seq: int) -> WebHistoryRecord:
+        record = self.get(seq)
+        if record is None:
+            raise IndexError(seq)
+        return record
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        return self.iter_records()
+
+    def iter_records(self, start: int = 0, stop: int or None = None) -> iter:
+        """
+            按序号顺序遍历历史记录, 每次只读取一条索引记录
+        :param start: 起始序号
+        :param stop: 结束序号(不包含), 默认为遍历开始时的记录数量
+        :return: WebHistoryRecord 生成器
+        """
+        stop = self._count if stop is None else min(stop, self._count)
+        for seq in range(max(0, start), stop):
+            record = self.get(seq)
+            if record is None:
+                return
+            yield record
+
+    def _bisect_time(self, timestamp: float) -> int:
+        ''' 第一条记录时间不早于 timestamp 的序号 '''
+        with self._lock:
+            if self._index is None:
+                return 0
+            low, high = 0, self._count
+            while low < high:
+                middle = (low + high) // 2
+                if self._unpack(middle)[0] < timestamp:
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+
+    def scan(self, start_time: float or None = None, end_time: float or None = None) -> iter:
+        """
+            按时间范围查找历史记录, 二分查找定位起始序号后顺序遍历
+        :param start_time: 起始时间(包含), 为空时从第一条记录开始
+        :param end_time: 结束时间(不包含), 为空时到最后一条记录
+        :return: WebHistoryRecord 生成器
+        """
+        start = 0 if start_time is None else self._bisect_time(start_time)
+        stop = None if end_time is None else self._bisect_time(end_time)
+        return self.iter_records(start, stop)
+
+    def read(self, segment: int, offset: int, size: int) -> bytes:
+        """
+            读取分段文件中的报文
+        :param segment: 分段文件编号
+        :param offset: 偏移
+        :param size: 字节数
+        :return: 报文
+        """
+        if not size:
+            return b""
+        with self._lock:
+            if self._index is None:
+                raise ValueError("request history is closed")
+            reader = self._readers.pop(segment, None)
+            if reader is None:
+                reader = open(self._segment_path(segment), "rb")
+                if len(self._readers) >= self.max_readers:
+                    self._readers.pop(next(iter(self._readers))).close()
+            self._readers[segment] = reader
+            reader.seek(offset)
+            return reader.read(size)
+
+    def flush(self):
+        """
+            将已经写入的记录同步到磁盘
+        """
+        with self._lock:
+            if self._index is None:
+                return
+            os.fsync(self._writer.fileno())
+            self._index.flush()
+
+    def stats(self) -> dict:
+        return {
+            'records': self._count,
+            'segments': self._segment + 1,
+            'segment_bytes': self._position,
+            'index_capacity': self._capacity,
+            'readers': len(self._readers)
+        }
+
+    def close(self):
+        with self._lock:
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if self._index is not None:
+                self._index.flush()
+                self._index.close()
+                self._index = None
+            self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,152 @@
+import sys
+from array import array
+from collections.abc import Mapping
+
+
+class WebRequestsHeaderView(Mapping):
+    """
+        WebRequestsPackage 请求头的只读字典视图, 每次访问时才从原始报文中解码请求头的值(小写)
+    """
+    __slots__ = ('_package',)
+
+    def __init__(self, package: 'WebRequestsPackage'):
+        self._package = package
+
+    def __getitem__(self, key: str) -> str:
+        package = self._package
+        try:
+            index = package.names.index(key) * 2
+        except ValueError:
+            raise KeyError(key) from None
+        return str(package.buffer[package.spans[index]:package.spans[index + 1]], "latin-1").lower()
+
+    def __iter__(self):
+        return iter(self._package.names)
+
+    def __len__(self) -> int:
+        return len(self._package.names)
+
+    def __contains__(self, key) -> bool:
+        return key in self._package.names
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+
+class WebRequestsPackage(Mapping):
+    """
+        WebRequestsPackage 紧凑的HTTP请求package, 与 WebRequestsData.package 的字典结构兼容(只读)
+        ================================================================
+        buffer: 原始报文(bytes/bytearray/mmap/memoryview), 请求头的值与请求体都不拷贝
+        method / path / version: 请求行(小写), method 与 version 为驻留字符串
+        names: 请求头名称(小写, 驻留字符串)组成的元组, 相同的请求头名称组合在所有 package 之间共享同一个元组
+        spans: 每个请求头的值在 buffer 中的 (起始偏移, 结束偏移), 依次保存在 array('I') 中
+        head_start / body_start: 请求行在 buffer 中的起始偏移(报文没有结尾空行时为 -1) / 请求体在 buffer 中的起始偏移
+        package['line'] / package['header'] 每次访问时返回新的字典 / 请求头视图, 不在 package 中保存
+        package['data'] 第一次访问时创建请求体的 memoryview 切片, 没有请求体时为空的 memoryview,
+            请求体按原始字节保留, 不像 str 形式的报文那样将换行统一为 CRLF
+    """
+    # 可以访问的键, 与 WebRequestsData.package 一致
+    KEY_NAME = ('line', 'header', 'data', 'protocol', 'data_type')
+    # 共享的请求头名称元组的最大数量
+    NAMES_CACHE_MAX_SIZE = 4096
+    # 请求头名称元组 => 共享的同一个元组
+    NAMES_CACHE = dict()
+
+    __slots__ = ('buffer', 'method', 'path', 'version', 'names', 'spans', 'head_start', 'body_start',
+                 'protocol', 'data_type', '_data', '_head')
+
+    def __init__(self, buffer, method: str, path: str, version: str, names: tuple, spans: array,
+                 head_start: int, body_start: int, protocol: str = 'http', data_type: str = 'data'):
+        self.buffer = buffer
+        self.method = sys.intern(method)
+        self.path = path
+        self.version = sys.intern(version)
+        self.names = self.share_names(names)
+        self.spans = spans
+        self.head_start = head_start
+        self.body_start = body_start
+        self.protocol = protocol
+        self.data_type = data_type
+        self._data = None
+        self._head = None
+
+    @classmethod
+    def share_names(cls, names: tuple) -> tuple:
+        shared = cls.NAMES_CACHE.get(names, None)
+        if shared is not None:
+            return shared
+        names = tuple(sys.intern(item) for item in names)
+        if len(cls.NAMES_CACHE) < cls.NAMES_CACHE_MAX_SIZE:
+            cls.NAMES_CACHE[names] = names
+        return names
+
+    def __getitem__(self, key: str):
+        if key == 'line':
+            return {'method': self.method, 'path': self.path, 'version': self.version}
+        if key == 'header':
+            return WebRequestsHeaderView(self)
+        if key == 'data':
+            return self.get_data()
+        if key == 'protocol':
+            return self.protocol
+        if key == 'data_type':
+            return self.data_type
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEY_NAME)
+
+    def __len__(self) -> int:
+        return len(self.KEY_NAME)
+
+    def __contains__(self, key) -> bool:
+        return key in self.KEY_NAME
+
+    def _view(self) -> memoryview:
+        view = self.buffer if isinstance(self.buffer, memoryview) else memoryview(self.buffer)
+        return view if view.format == 'B' and view.ndim == 1 else view.cast('B')
+
+    def get_data(self) -> memoryview:
+        """
+            请求体(原始报文上的 memoryview 切片), 没有请求体时为空的 memoryview(不引用原始报文)
+            请求体中的换行保持原样, str 形式的报文按行解析后以 CRLF 重新拼接请求体
+        """
+        if self._data is None:
+            length = len(self.buffer) if not isinstance(self.buffer, memoryview) else self.buffer.nbytes
+            self._data = self._view()[self.body_start:] if self.body_start < length else memoryview(b"")
+        return self._data
+
+    def get_head(self) -> memoryview or None:
+        """
+            原始请求行与请求头(包含结尾空行), 报文没有结尾空行时为 None
+        """
+        if self._head is None and self.head_start >= 0:
+            self._head = self._view()[self.head_start:self.body_start]
+        return self._head
+
+    def to_dict(self) -> dict:
+        """
+            转换为 WebRequestsData.package 原有的嵌套字典结构
+        """
+        return {
+            'line': self['line'],
+            'header': dict(self['header'].items()),
+            'data': self.get_data(),
+            'protocol': self.protocol,
+            'data_type': self.data_type
+        }
+
+    def detach(self):
+        """
+            释放对原始报文的引用(例如 mmap 即将关闭): 只保留请求行与请求头的拷贝, 请求体置为空的 memoryview
+        """
+        for item in (self._data, self._head):
+            if isinstance(item, memoryview):
+                item.release()
+        self.buffer = bytes(self._view()[:self.body_start])
+        self._data = memoryview(b"")
+        self._head = None
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
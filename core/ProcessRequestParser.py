@@ -0,0 +1,201 @@
+import re
+import sys
+import mmap
+from array import array
+from core.ProcessRequestPackage import WebRequestsPackage
+from utils.default import HTTP_REQUEST_HEADER_MAX_SIZE
+
+# 请求行验证模板, HTTP 请求行必须严格按照 protocol path?search_param#fragment version
+HTTP_REQUEST_LINE_MODE = re.compile(r"^(?P<method>(GET|POST))\s+(?P<path>(\S*))\s+(?P<version>(.*))", re.I)
+# 请求头数据分离的模板
+HTTP_REQUEST_HEADERS_MODE = re.compile(r"(?P<key>(\S*?)):(?P<value>(.*))", re.I)
+# bytes 报文中请求头与请求体的分界: 第一个只包含空白(与 str.strip 在 latin-1 下一致)的行
+HTTP_REQUEST_HEADER_END_MODE = re.compile(rb"\n[ \t\r\x0b\x0c\x1c-\x1f\x85\xa0]*\n")
+# bytes 报文中请求头每一行的名称与去掉两端空白(与 str.strip 在 latin-1 下一致)的值
+HTTP_REQUEST_HEADER_SPAN_MODE = re.compile(
+    rb"([^:\n]*):[ \t\r\x0b\x0c\x1c-\x1f\x85\xa0]*((?:[^\n]*[^ \t\r\n\x0b\x0c\x1c-\x1f\x85\xa0])?)")
+
+
+class WebRequestsParser(object):
+    """
+        WebRequestsParser 以单次扫描的方式解析 bytes 形式的 HTTP Request 报文
+        ================================================================
+        支持 bytes / bytearray / memoryview / mmap 作为输入
+        请求头与请求体的分界通过偏移量定位, 请求体保留为原始缓冲区上的 memoryview 切片(零拷贝)
+        解析结果与 WebRequestsData._parse_html_request 产生的 package 结构一致
+        compact: 为 True 时解析为紧凑的 WebRequestsPackage(请求头的值只记录偏移量, 访问时才解码),
+            适合大量保留解析结果的场景, 访问请求头比字典慢, 默认不使用
+        head: 解析成功后为原始请求行与请求头(包含结尾空行)的 memoryview 切片, 报文没有结尾空行时为 None
+            compact 为 True 时通过 WebRequestsPackage.get_head 获取
+    """
+    HTTP_REQUEST_HEADER_MAX_SIZE = HTTP_REQUEST_HEADER_MAX_SIZE
+    # 构建HTTP请求package的参数名称
+    HEADER_LINE_PARAM_NAME = ['method', 'path', 'version']
+    # 允许作为输入的缓冲区类型
+    BUFFER_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+    # 原始请求头名称(bytes) => 处理后的请求头名称(小写, 驻留字符串)的最大缓存数量
+    HEADER_NAME_CACHE_MAX_SIZE = 4096
+    HEADER_NAME_CACHE = dict()
+
+    __slots__ = ('protocol', 'data_type', 'compact', 'head')
+
+    def __init__(self, protocol: str = 'http', data_type: str = 'data', compact: bool = False):
+        self.protocol = protocol
+        self.data_type = data_type
+        self.compact = compact
+        self.head = None
+
+    @classmethod
+    def _get_searchable(cls, buf) -> (bytes or bytearray or mmap.mmap, memoryview):
+        """
+            获取可以进行 find 查找的对象以及整个报文的 memoryview
+            memoryview 不支持 find, 此时只拷贝请求头允许的最大长度部分用于查找
+        :param buf: HTTP Request报文
+        :return: (可查找对象, 报文视图)
+        """
+        view = buf if isinstance(buf, memoryview) else memoryview(buf)
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+        if hasattr(buf, 'find'):
+            return buf, view
+        return view[:cls.HTTP_REQUEST_HEADER_MAX_SIZE].tobytes(), view
+
+    @classmethod
+    def _find_header_end(cls, searchable, start: int, limit: int) -> (int, int):
+        """
+            查找请求头与请求体的分界(第一个空行)
+            与 str 形式的报文一致, 只包含空格、制表符等空白的行同样视为空行
+        :param searchable: 可查找对象
+        :param start: 请求行起始偏移
+        :param limit: 查找的最大偏移
+        :return: (请求头结束偏移, 请求体起始偏移), 未找到时返回 (-1, -1)
+        """
+        _match = HTTP_REQUEST_HEADER_END_MODE.search(searchable, start, limit)
+        if _match is None:
+            return -1, -1
+        return _match.start(), _match.end()
+
+    def _parse_request_line(self, content: str) -> dict:
+        """
+            解析请求行content中的内容是否符合HTTP报文的格式
+        :param content: 请求行content
+        :return: 请求行字典, 不符合要求时返回空字典
+        """
+        groups = HTTP_REQUEST_LINE_MODE.search(content.strip(" "))
+        if groups is None:
+            return dict()
+        return {item: groups.group(item).strip().lower() for item in self.HEADER_LINE_PARAM_NAME}
+
+    @classmethod
+    def _parse_request_headers(cls, lines: list) -> dict:
+        """
+            将请求头的每一行分离为键值对, 重复出现的请求头保留第一个非空值
+        :param lines: 请求头的所有行
+        :return: 请求头字典
+        """
+        _requests_headers = dict()
+        for item in lines:
+            _key, _sep, _value = item.partition(":")
+            if not _sep or not _key.strip():
+                continue
+            ''' 与请求头数据分离模板保持一致, 键名取冒号前最后一段非空白内容 '''
+            _key = _key.rsplit(None, 1)[-1].lower()
+            if not _requests_headers.get(_key, None):
+                _requests_headers[_key] = _value.strip().lower()
+        return _requests_headers
+
+    @classmethod
+    def _parse_request_header_spans(cls, searchable, start: int, end: int) -> (list, array):
+        """
+            记录请求头每一行的名称与值的偏移量, 重复出现的请求头保留第一个非空值
+        :param searchable: 可查找对象
+        :param start: 请求头起始偏移
+        :param end: 请求头结束偏移
+        :return: (请求头名称列表, 请求头的值的 (起始偏移, 结束偏移) 数组)
+        """
+        names, spans = list(), array('I')
+        cache = cls.HEADER_NAME_CACHE
+        for item in HTTP_REQUEST_HEADER_SPAN_MODE.finditer(searchable, start, end):
+            _raw = item.group(1)
+            _key = cache.get(_raw, None)
+            if _key is None:
+                ''' 与请求头数据分离模板保持一致, 键名取冒号前最后一段非空白内容 '''
+                _key = _raw.decode("latin-1").split()
+                _key = sys.intern(_key[-1].lower()) if _key else ''
+                if len(cache) < cls.HEADER_NAME_CACHE_MAX_SIZE:
+                    cache[_raw] = _key
+            if not _key:
+                continue
+            if _key not in names:
+                names.append(_key)
+                spans.extend(item.span(2))
+                continue
+            _index = names.index(_key) * 2
+            if spans[_index] == spans[_index + 1]:
+                spans[_index], spans[_index + 1] = item.span(2)
+        return names, spans
+
+    def parse(self, buf) -> (bool, dict or WebRequestsPackage):
+        """
+            将HTTP Request报文解析成由请求行、请求头、请求体组成的 package
+        :param buf: HTTP Request报文(bytes/bytearray/memoryview/mmap)
+        :return: (报文是否合法, package 字典, compact 为 True 时为 WebRequestsPackage), 不合法时为空字典
+        """
+        if not isinstance(buf, self.BUFFER_TYPES):
+            return False, dict()
+        searchable, view = self._get_searchable(buf)
+        length = view.nbytes
+        limit = min(length, self.HTTP_REQUEST_HEADER_MAX_SIZE)
+
+        ''' 清除报文前的空行 '''
+        start = 0
+        while start < limit:
+            _eol = searchable.find(b"\n", start, limit)
+            _eol = limit if _eol == -1 else _eol
+            if searchable[start:_eol].strip(b" \r"):
+                break
+            start = _eol + 1
+        if start >= limit:
+            return False, dict()
+
+        ''' 第一个空行之前为请求行与请求头, 之后为请求体 '''
+        header_end, body_start = self._find_header_end(searchable, start, limit)
+        is_complete = header_end != -1
+        if not is_complete:
+            if length > limit:
+                return False, dict()
+            header_end, body_start = length, length
+
+        if not self.compact:
+            lines = searchable[start:header_end].decode("latin-1").split("\n")
+            _requests_line = self._parse_request_line(lines[0])
+            if not _requests_line:
+                return False, dict()
+
+            _requests_headers = self._parse_request_headers([item.strip() for item in lines[1:]])
+            if not _requests_headers or _requests_headers.get("host", None) is None:
+                return False, dict()
+
+            self.head = view[start:body_start] if is_complete else None
+            return True, {
+                'line': _requests_line,
+                'header': _requests_headers,
+                'data': view[body_start:] if body_start < length else memoryview(b""),
+                'protocol': self.protocol,
+                'data_type': self.data_type
+            }
+
+        line_end = searchable.find(b"\n", start, header_end)
+        line_end = header_end if line_end == -1 else line_end
+        _requests_line = self._parse_request_line(searchable[start:line_end].decode("latin-1"))
+        if not _requests_line:
+            return False, dict()
+
+        names, spans = self._parse_request_header_spans(searchable, line_end + 1, header_end)
+        if "host" not in names:
+            return False, dict()
+
+        return True, WebRequestsPackage(view if isinstance(buf, memoryview) else buf, _requests_line['method'],
+                                        _requests_line['path'], _requests_line['version'], tuple(names), spans,
+                                        start if is_complete else -1, body_start, self.protocol, self.data_type)
@@ -0,0 +1,157 @@
+from core.ProcessRequestData import WebRequestsData
+from core.ProcessRequestBody import WebRequestsBody
+from core.ProcessRequestPackage import WebRequestsPackage
+
+
+class WebRequestsTemplate(object):
+    """
+        WebRequestsTemplate 将HTTP Request报文编译为可以重复渲染的模板
+        ================================================================
+        报文只在编译时解析、校验一次, 之后每次渲染只替换发生变化的字段:
+        path: 请求行中的请求路径
+        headers: 需要替换的请求头 {key: value}, value 为 None 时删除该请求头
+        data: 请求体
+        未发生变化的部分(请求行、请求头字典、序列化后的请求行与请求头)在所有渲染结果之间共享,
+        因此渲染得到的 package 应当被视为只读
+    """
+    # 可以被替换的字段
+    SLOT_NAME = ['path', 'headers', 'data']
+
+    __slots__ = ('is_usable', 'package', 'protocol', 'data_type', '_source',
+                 '_method', '_version', '_line', '_header_lines', '_header_block')
+
+    def __init__(self, requests_data: WebRequestsData or None = None, **kwargs):
+        self._source = requests_data if isinstance(requests_data, WebRequestsData) else WebRequestsData(**kwargs)
+        self.is_usable = self._source.is_usable and 'header' in self._source.package
+        self.package = self._source.package if self.is_usable else dict()
+        if isinstance(self.package, WebRequestsPackage):
+            ''' 紧凑的 package 每次访问请求头都会重新解码, 模板只编译一次, 转为字典后在渲染结果之间共享 '''
+            self.package = self.package.to_dict()
+        self.protocol = self._source.protocol
+        self.data_type = self._source.data_type
+        if not self.is_usable:
+            return
+
+        ''' 预先序列化请求行与请求头, 渲染字节报文时只需要替换发生变化的行 '''
+        line = self.package['line']
+        self._method = line['method'].upper().encode("latin-1")
+        self._version = line['version'].upper().encode("latin-1")
+        self._line = self._serialize_line(line['path'])
+        self._header_lines = {k: self._serialize_header(k, v) for k, v in self.package['header'].items()}
+        self._header_block = b"".join(self._header_lines.values())
+
+    ####################################################################################################################
+    # 序列化函数
+    ####################################################################################################################
+    def _serialize_line(self, path: str) -> bytes:
+        return b"%s %s %s\r\n" % (self._method, path.encode("latin-1"), self._version)
+
+    @classmethod
+    def _serialize_header(cls, key: str, value: str) -> bytes:
+        return f"{key}: {value}\r\n".encode("latin-1")
+
+    @classmethod
+    def _serialize_data(cls, data) -> bytes:
+        if data is None:
+            return b""
+        if isinstance(data, str):
+            return data.encode("utf-8")
+        return bytes(data)
+
+    ####################################################################################################################
+    # 字段替换函数
+    ####################################################################################################################
+    def _substitute(self, path: str or None, headers: dict or None, data: any) -> (bool, dict, dict):
+        """
+            替换请求行与请求头中发生变化的字段, 并校验替换之后的报文是否仍然完整
+        :param path: 新的请求路径
+        :param headers: 需要替换的请求头
+        :param data: 新的请求体
+        :return: (替换后的报文是否合法, 请求行, 请求头), 未发生变化的部分直接返回模板中的原对象
+        """
+        line = self.package['line']
+        header = self.package['header']
+        if path is not None:
+            if not path or not isinstance(path, str):
+                return False, line, header
+            line = dict(line)
+            line['path'] = path
+
+        headers = {k.strip().lower(): v for k, v in headers.items()} if headers else dict()
+        ''' 替换请求体时同步修正模板中的 content-length, 流式请求体在发送时由 requests 计算 '''
+        if data is not None and not isinstance(data, WebRequestsBody) and 'content-length' in header:
+            headers.setdefault('content-length', str(len(self._serialize_data(data))))
+
+        if headers:
+            header = dict(header)
+            for k, v in headers.items():
+                if v is None:
+                    header.pop(k, None)
+                else:
+                    header[k] = v
+            host = header.get('host', '')
+            if not host or not isinstance(host, str):
+                return False, line, header
+        return True, line, header
+
+    def render(self, path: str or None = None, headers: dict or None = None, data: any = None) -> (bool, dict):
+        """
+            根据模板渲染新的 package, 只替换传入的字段
+        :param path: 新的请求路径
+        :param headers: 需要替换的请求头 {key: value}, value 为 None 时删除该请求头
+        :param data: 新的请求体
+        :return: (是否渲染成功, package)
+        """
+        if not self.is_usable:
+            return False, dict()
+        status, line, header = self._substitute(path, headers, data)
+        if not status:
+            return False, dict()
+        package = dict(self.package)
+        package['line'] = line
+        package['header'] = header
+        if data is not None:
+            package['data'] = data
+        return True, package
+
+    def render_bytes(self, path: str or None = None, headers: dict or None = None, data: any = None) -> (bool, bytes):
+        """
+            根据模板渲染可以直接发送的HTTP Request字节报文, 只重新序列化发生变化的行
+            流式请求体(WebRequestsBody)不能拼接为字节报文, 渲染失败, 应使用 render / make_requests_data
+        :param path: 新的请求路径
+        :param headers: 需要替换的请求头 {key: value}, value 为 None 时删除该请求头
+        :param data: 新的请求体
+        :return: (是否渲染成功, 字节报文)
+        """
+        if not self.is_usable:
+            return False, b""
+        if isinstance(self.package['data'] if data is None else data, WebRequestsBody):
+            return False, b""
+        status, line, header = self._substitute(path, headers, data)
+        if not status:
+            return False, b""
+        _line = self._line if path is None else self._serialize_line(line['path'])
+        if header is self.package['header']:
+            _header_block = self._header_block
+        else:
+            _origin = self.package['header']
+            _header_block = b"".join(
+                self._header_lines[k] if _origin.get(k, None) == v else self._serialize_header(k, v)
+                for k, v in header.items()
+            )
+        _data = self.package['data'] if data is None else data
+        return True, b"".join((_line, _header_block, b"\r\n", self._serialize_data(_data)))
+
+    def make_requests_data(self, path: str or None = None, headers: dict or None = None,
+                           data: any = None) -> WebRequestsData:
+        """
+            根据模板渲染新的 WebRequestsData, 渲染结果可以直接传给 WebRequest(requests_data=...)
+        :param path: 新的请求路径
+        :param headers: 需要替换的请求头
+        :param data: 新的请求体
+        :return: WebRequestsData
+        """
+        status, package = self.render(path, headers, data)
+        o = WebRequestsData.from_package(package, self.protocol, self.data_type)
+        o.is_usable = status
+        return o
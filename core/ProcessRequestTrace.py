@@ -0,0 +1,196 @@
+import time
+import socket
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.connectionpool import HTTPSConnectionPool
+from urllib3.exceptions import NameResolutionError
+from urllib3.exceptions import NewConnectionError
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
+from core.ProcessDNSCache import DNS_CACHE
+
+# 当前线程正在记录的 WebRequestTrace
+_LOCAL = threading.local()
+
+
+class WebRequestTrace(object):
+    """
+        WebRequestTrace 单个请求的耗时记录(各阶段耗时单位均为秒, 未发生的阶段为 None)
+        ================================================================
+        dns: 域名解析耗时(使用代理时为代理主机的解析), 命中域名解析缓存时为查询缓存的耗时
+        dns_saved: 命中域名解析缓存时节省的解析耗时, 未命中时为 None
+        connect: TCP 连接耗时(使用代理时为连接代理的耗时)
+        tls: TLS 握手耗时, 经代理访问 https 时包含 CONNECT 隧道的建立
+        ttfb: 连接建立之后到收到响应头的耗时
+        transfer: 读取响应体的耗时
+        total: 请求总耗时
+        bytes_sent / bytes_received: 发送的请求体与接收的响应体字节数
+        reused: 是否复用了已经建立的连接
+        exception: 请求失败时的异常类名
+    """
+    FIELD_NAME = ['method', 'url', 'proxy', 'start', 'dns', 'dns_saved', 'connect', 'tls', 'ttfb', 'transfer',
+                  'total', 'bytes_sent', 'bytes_received', 'reused', 'status_code', 'exception']
+
+    __slots__ = tuple(FIELD_NAME)
+
+    def __init__(self, method: str, url: str, proxy: str or None = None):
+        self.method = method
+        self.url = url
+        self.proxy = proxy
+        self.start = time.time()
+        self.dns = None
+        self.dns_saved = None
+        self.connect = None
+        self.tls = None
+        self.ttfb = None
+        self.transfer = None
+        self.total = None
+        self.bytes_sent = None
+        self.bytes_received = None
+        self.reused = False
+        self.status_code = None
+        self.exception = None
+
+    def setup_cost(self) -> float:
+        """
+            建立连接(域名解析、TCP连接、TLS握手)的总耗时
+        :return: 耗时(秒)
+        """
+        return (self.dns or 0.0) + (self.connect or 0.0) + (self.tls or 0.0)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.FIELD_NAME}
+
+
+def get_current_trace() -> WebRequestTrace or None:
+    return getattr(_LOCAL, 'trace', None)
+
+
+def set_current_trace(trace: WebRequestTrace or None):
+    _LOCAL.trace = trace
+
+
+####################################################################################################################
+# 记录连接阶段耗时的 urllib3 连接
+####################################################################################################################
+class TracedHTTPConnection(HTTPConnection):
+    # 解析主机名使用的缓存, 默认使用进程级别的 DNS_CACHE
+    DNS_CACHE = DNS_CACHE
+
+    def _new_conn(self) -> socket.socket:
+        """
+            通过域名解析缓存解析主机名后建立连接, 与 urllib3 相同依次尝试所有解析出的地址
+            当前线程正在记录请求时, 分别记录域名解析(以及命中缓存节省的解析耗时)与TCP连接的耗时
+        :return: socket
+        """
+        trace = get_current_trace()
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            infos, saved = self.DNS_CACHE.lookup(host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        if trace is not None:
+            trace.dns = time.perf_counter() - start
+            trace.dns_saved = saved
+
+        start = time.perf_counter()
+        error = None
+        try:
+            for address in dict.fromkeys(item[4][0] for item in infos):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    error = e
+            raise error if error is not None else NewConnectionError(self, f"no address resolved for {host}")
+        finally:
+            self._dns_host = host
+            if trace is not None:
+                trace.connect = time.perf_counter() - start
+
+
+class TracedHTTPSConnection(TracedHTTPConnection, HTTPSConnection):
+    def connect(self):
+        trace = get_current_trace()
+        if trace is None:
+            return super().connect()
+        start = time.perf_counter()
+        super().connect()
+        trace.tls = time.perf_counter() - start - (trace.dns or 0.0) - (trace.connect or 0.0)
+
+
+class TracedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TracedHTTPConnection
+
+
+class TracedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TracedHTTPSConnection
+
+
+def _make_socks_pool_classes() -> dict:
+    """
+        socks 代理使用的可以记录连接耗时的连接池(目标主机名由代理解析, 只记录连接代理并完成握手的耗时)
+        依赖 PySocks, 第一次使用 socks 代理时才创建
+    :return: {scheme: 连接池类型}
+    """
+    from urllib3.contrib.socks import SOCKSConnection
+    from urllib3.contrib.socks import SOCKSHTTPSConnection
+    from urllib3.contrib.socks import SOCKSHTTPConnectionPool
+    from urllib3.contrib.socks import SOCKSHTTPSConnectionPool
+
+    class TracedSOCKSConnection(SOCKSConnection):
+        def _new_conn(self) -> socket.socket:
+            trace = get_current_trace()
+            start = time.perf_counter()
+            try:
+                return super()._new_conn()
+            finally:
+                if trace is not None:
+                    trace.connect = time.perf_counter() - start
+
+    class TracedSOCKSHTTPSConnection(TracedSOCKSConnection, SOCKSHTTPSConnection):
+        def connect(self):
+            trace = get_current_trace()
+            if trace is None:
+                return super().connect()
+            start = time.perf_counter()
+            super().connect()
+            trace.tls = time.perf_counter() - start - (trace.connect or 0.0)
+
+    class TracedSOCKSHTTPConnectionPool(SOCKSHTTPConnectionPool):
+        ConnectionCls = TracedSOCKSConnection
+
+    class TracedSOCKSHTTPSConnectionPool(SOCKSHTTPSConnectionPool):
+        ConnectionCls = TracedSOCKSHTTPSConnection
+
+    return {'http': TracedSOCKSHTTPConnectionPool, 'https': TracedSOCKSHTTPSConnectionPool}
+
+
+class TracedHTTPAdapter(HTTPAdapter):
+    """
+        TracedHTTPAdapter 使用可以记录连接阶段耗时的连接池, 新建连接时通过域名解析缓存解析主机名
+        没有正在记录的请求时, 每次新建连接只多一次线程局部变量的读取
+        经过 socks 代理的连接同样记录连接耗时, 因此 connect 为空即表示复用了已经建立的连接
+    """
+    POOL_CLASSES_BY_SCHEME = {'http': TracedHTTPConnectionPool, 'https': TracedHTTPSConnectionPool}
+    # socks 代理使用的连接池类型, 第一次使用 socks 代理时创建
+    SOCKS_POOL_CLASSES_BY_SCHEME = None
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.POOL_CLASSES_BY_SCHEME
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith("socks"):
+            manager.pool_classes_by_scheme = self.POOL_CLASSES_BY_SCHEME
+            return manager
+        ''' socks 代理使用独立的连接类型, 替换为同样记录连接耗时的子类 '''
+        if TracedHTTPAdapter.SOCKS_POOL_CLASSES_BY_SCHEME is None:
+            TracedHTTPAdapter.SOCKS_POOL_CLASSES_BY_SCHEME = _make_socks_pool_classes()
+        manager.pool_classes_by_scheme = self.SOCKS_POOL_CLASSES_BY_SCHEME
+        return manager
@@ -0,0 +1,68 @@
+class WebResponse(object):
+    """
+        WebResponse 结构化的HTTP响应, 保留原始响应体 bytes, 只在访问时才解码或序列化
+        ================================================================
+        version: 请求报文中的HTTP版本
+        url: 最终请求的URL地址
+        status_code: 响应状态码
+        headers: 响应头(大小写不敏感)
+        content: 原始响应体
+        text: 解码后的响应体(第一次访问时解码并缓存)
+        header_block: 状态行与响应头组合的字符串(第一次访问时序列化并缓存)
+        to_str(): 与 WebRequest.make_response 原有格式一致的字符串
+    """
+    __slots__ = ('version', 'url', 'status_code', 'headers', 'content', 'encoding', 'charset',
+                 '_text', '_header_block')
+
+    def __init__(self, version: str, url: str, status_code: int, headers, content: bytes,
+                 encoding: str or None = None, charset: str = "UTF-8"):
+        self.version = version
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.charset = charset
+        self._text = None
+        self._header_block = None
+
+    @classmethod
+    def from_response(cls, version: str, res, charset: str = "UTF-8") -> 'WebResponse':
+        """
+            通过 requests.models.Response 构造 WebResponse
+        :param version: 请求报文中的HTTP版本
+        :param res: requests.models.Response
+        :param charset: 响应没有声明编码时使用的编码
+        :return: WebResponse
+        """
+        return cls(version, res.url, res.status_code, res.headers, res.content, res.encoding, charset)
+
+    @classmethod
+    def format_header_block(cls, version: str, url: str, status_code: int, headers) -> str:
+        """
+            将状态行与响应头组合为字符串(以空行结尾)
+        :return: 状态行与响应头
+        """
+        _headers = "\r\n".join(f"{k}:{v}" for k, v in headers.items())
+        return f"{version} {url} {status_code}\r\n{_headers}\r\n\r\n"
+
+    def header(self, name: str, default: str or None = None) -> str or None:
+        return self.headers.get(name, default)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.content.decode(self.encoding if self.encoding is not None else self.charset)
+        return self._text
+
+    @property
+    def header_block(self) -> str:
+        if self._header_block is None:
+            self._header_block = self.format_header_block(self.version, self.url, self.status_code, self.headers)
+        return self._header_block
+
+    def to_str(self) -> str:
+        return f"{self.header_block}{self.text}"
+
+    def __str__(self):
+        return self.to_str()
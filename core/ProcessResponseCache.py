@@ -0,0 +1,212 @@
+import copy
+import time
+import threading
+from collections import OrderedDict
+from core.ProcessRetryPolicy import RetryPolicy
+from utils.default import HTTP_REQUEST_RESPONSE_CACHE_TTL
+from utils.default import HTTP_REQUEST_RESPONSE_CACHE_MAX_SIZE
+from utils.default import HTTP_REQUEST_RESPONSE_CACHE_MAX_BYTES
+
+
+class ResponseFlight(object):
+    """
+        正在进行的请求, 相同的并发请求等待该请求完成后共用其结果
+    """
+    __slots__ = ('event', 'result')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = (False, "发生异常错误", RetryPolicy.OTHER)
+
+
+class ResponseCacheEntry(object):
+    """
+        缓存的响应
+        ================================================================
+        response: requests.models.Response(响应体已经读取)
+        expires: 过期时间(time.monotonic)
+        etag / last_modified: 响应的校验信息, 过期后带上校验信息重新请求, 响应 304 时继续使用缓存的响应
+        size: 响应占用的内存(响应体与响应头的长度)
+    """
+    __slots__ = ('response', 'expires', 'etag', 'last_modified', 'size')
+
+    def __init__(self, response, expires: float, size: int):
+        self.response = response
+        self.expires = expires
+        self.etag = response.headers.get('etag', None)
+        self.last_modified = response.headers.get('last-modified', None)
+        self.size = size
+
+    def validators(self) -> dict:
+        headers = dict()
+        if self.etag is not None:
+            headers['if-none-match'] = self.etag
+        if self.last_modified is not None:
+            headers['if-modified-since'] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    """
+        ResponseCache GET 请求的响应缓存
+        ================================================================
+        相同的请求(协议、主机、路径、请求头、代理都相同)同时只发送一次, 其余请求等待并共用其结果(single-flight)
+        ttl: 响应的缓存时间(秒), 过期后带有 ETag/Last-Modified 的响应重新校验, 没有校验信息的响应直接删除
+        max_size: 最多缓存的响应数量, 超出时淘汰最久未使用的响应
+        max_bytes: 缓存的响应占用内存的上限, 超出时淘汰最久未使用的响应, 大于该值的响应不缓存
+        hits / misses: 命中 / 未命中缓存的次数
+        coalesced: 等待相同的并发请求而没有发送请求的次数
+        revalidated: 过期后重新校验且响应 304 的次数
+        只缓存状态码为 200 且没有 Cache-Control: no-store 的响应, 命中时返回缓存响应的浅拷贝
+    """
+    HTTP_REQUEST_RESPONSE_CACHE_TTL = HTTP_REQUEST_RESPONSE_CACHE_TTL
+    HTTP_REQUEST_RESPONSE_CACHE_MAX_SIZE = HTTP_REQUEST_RESPONSE_CACHE_MAX_SIZE
+    HTTP_REQUEST_RESPONSE_CACHE_MAX_BYTES = HTTP_REQUEST_RESPONSE_CACHE_MAX_BYTES
+
+    __slots__ = ('ttl', 'max_size', 'max_bytes', 'hits', 'misses', 'coalesced', 'revalidated', 'bytes',
+                 '_cache', '_flights', '_lock')
+
+    def __init__(self, ttl: float = HTTP_REQUEST_RESPONSE_CACHE_TTL,
+                 max_size: int = HTTP_REQUEST_RESPONSE_CACHE_MAX_SIZE,
+                 max_bytes: int = HTTP_REQUEST_RESPONSE_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.revalidated = 0
+        self.bytes = 0
+        # key => ResponseCacheEntry
+        self._cache = OrderedDict()
+        # key => ResponseFlight
+        self._flights = dict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def make_key(cls, package: dict, proxy: str or None = None) -> tuple:
+        """
+            构造响应缓存的键, 请求头按名称排序, 与请求头的顺序无关
+        :param package: WebRequestsData.package
+        :param proxy: 请求使用的代理URL
+        :return: (protocol, host, path, 请求头, proxy)
+        """
+        header = package['header']
+        return (package['protocol'], header.get('host', ''), package['line']['path'],
+                tuple(sorted(header.items())), proxy)
+
+    @classmethod
+    def get_size(cls, response) -> int:
+        return len(response.content) + sum(len(k) + len(v) for k, v in response.headers.items())
+
+    @classmethod
+    def is_cacheable(cls, response) -> bool:
+        if response.status_code != 200:
+            return False
+        return 'no-store' not in response.headers.get('cache-control', '').lower()
+
+    def _pop(self, key: tuple):
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self.bytes = self.bytes - entry.size
+
+    def _put(self, key: tuple, response):
+        size = self.get_size(response)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._cache[key] = ResponseCacheEntry(response, time.monotonic() + self.ttl, size)
+            self.bytes = self.bytes + size
+            while len(self._cache) > self.max_size or self.bytes > self.max_bytes:
+                self._pop(next(iter(self._cache)))
+
+    @classmethod
+    def get_wait_timeout(cls, timeout: float or tuple or None) -> float or None:
+        ''' 等待相同的并发请求的最长时间, (连接超时, 读取超时) 取两者之和 '''
+        if isinstance(timeout, tuple):
+            return None if None in timeout else sum(timeout)
+        return timeout
+
+    def fetch(self, key: tuple, send: callable, timeout: float or tuple or None = None) -> (bool, object, str or None):
+        """
+            优先使用缓存的响应, 否则发送请求(相同的并发请求只发送一次)并缓存响应
+        :param key: make_key 构造的键
+        :param send: 发送请求的函数 send(额外的请求头) -> (请求是否成功, requests.models.Response|错误提示, 错误分类)
+        :param timeout: 请求的超时时间(秒), 可以是 (连接超时, 读取超时), 等待相同的并发请求超过该时间时返回超时
+        :return: (请求是否成功, requests.models.Response|错误提示, 失败时的错误分类)
+        """
+        now = time.monotonic()
+        leader = False
+        with self._lock:
+            entry = self._cache.get(key, None)
+            if entry is not None and entry.expires > now:
+                self._cache.move_to_end(key)
+                self.hits = self.hits + 1
+                return True, copy.copy(entry.response), None
+            if entry is not None and entry.etag is None and entry.last_modified is None:
+                self._pop(key)
+                entry = None
+            flight = self._flights.get(key, None)
+            if flight is not None:
+                self.coalesced = self.coalesced + 1
+            else:
+                flight = self._flights[key] = ResponseFlight()
+                self.misses = self.misses + 1
+                leader = True
+        if not leader:
+            if not flight.event.wait(self.get_wait_timeout(timeout)):
+                return False, "请求超时", RetryPolicy.READ_TIMEOUT
+            status, res, cause = flight.result
+            return status, copy.copy(res) if status else res, cause
+
+        try:
+            status, res, cause = send(entry.validators() if entry is not None else None)
+            if status and entry is not None and res.status_code == 304:
+                ''' 响应没有变化, 继续使用缓存的响应 '''
+                with self._lock:
+                    entry.expires = time.monotonic() + self.ttl
+                    self.revalidated = self.revalidated + 1
+                res = entry.response
+            elif status and self.is_cacheable(res):
+                self._put(key, res)
+            elif entry is not None:
+                with self._lock:
+                    if self._cache.get(key, None) is entry:
+                        self._pop(key)
+            flight.result = (status, res, cause)
+            return status, copy.copy(res) if status else res, cause
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.coalesced = 0
+            self.revalidated = 0
+
+    def stats(self) -> dict:
+        """
+            响应缓存的命中率与占用内存
+        :return: {size, bytes, hits, misses, coalesced, revalidated, hit_rate}
+        """
+        with self._lock:
+            total = self.hits + self.misses + self.coalesced
+            return {
+                'size': len(self._cache),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'revalidated': self.revalidated,
+                'hit_rate': (self.hits + self.coalesced) / total if total else 0.0
+            }
+
+
+# 进程级别的响应缓存, 创建 WebRequest 时通过 response_cache 参数使用
+RESPONSE_CACHE = ResponseCache()
@@ -0,0 +1,146 @@
+import time
+import random
+import socket
+from utils.default import HTTP_REQUEST_RETRY_TRY_TIMES
+from utils.default import HTTP_REQUEST_RETRY_BACKOFF
+from utils.default import HTTP_REQUEST_RETRY_BACKOFF_MAX
+from utils.default import HTTP_REQUEST_RETRY_BUDGET
+
+
+class RetryPolicy(object):
+    """
+        RetryPolicy 请求失败时的重试策略, WebRequest 与 WebProxy 共用
+        ================================================================
+        错误分类:
+            connect: 无法建立连接(连接被拒绝、连接超时、域名解析失败), 请求没有发出, 可以安全重试
+            read_timeout: 连接已经建立但读取响应超时, 请求可能已经被处理, 只对幂等请求重试
+            aborted: 连接已经建立但在请求发出后被中断(连接被重置、服务端关闭连接), 请求可能已经被处理, 只对幂等请求重试
+            proxy: 代理拒绝连接或代理返回错误
+            tls: TLS 握手或证书错误, 重试通常不会成功
+            other: 其他错误, 不重试
+        try_times: 最大重试次数(不包含第一次请求)
+        backoff: 第一次重试前等待时间的上限(秒), 每次重试翻倍, 实际等待时间在 [0, 上限] 内随机(full jitter)
+        backoff_max: 等待时间上限的最大值(秒)
+        budget: 包含所有重试与等待在内的总耗时上限(秒), 每次请求的超时时间不会超过剩余时间, None 表示不限制
+        retry_on: 需要重试的错误分类
+    """
+    CONNECT = 'connect'
+    READ_TIMEOUT = 'read_timeout'
+    ABORTED = 'aborted'
+    PROXY = 'proxy'
+    TLS = 'tls'
+    OTHER = 'other'
+    # 默认重试的错误分类, read_timeout 与 aborted 只对幂等请求重试
+    RETRY_ON = (CONNECT, READ_TIMEOUT, ABORTED, PROXY)
+    # 请求可能已经被服务端处理的错误分类
+    SENT = (READ_TIMEOUT, ABORTED)
+    HTTP_REQUEST_RETRY_TRY_TIMES = HTTP_REQUEST_RETRY_TRY_TIMES
+
+    __slots__ = ('try_times', 'backoff', 'backoff_max', 'budget', 'retry_on')
+
+    def __init__(self, try_times: int = HTTP_REQUEST_RETRY_TRY_TIMES, backoff: float = HTTP_REQUEST_RETRY_BACKOFF,
+                 backoff_max: float = HTTP_REQUEST_RETRY_BACKOFF_MAX,
+                 budget: float or None = HTTP_REQUEST_RETRY_BUDGET, retry_on: tuple = RETRY_ON):
+        self.try_times = max(0, try_times)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.budget = budget
+        self.retry_on = frozenset(retry_on)
+
+    @classmethod
+    def classify(cls, e: BaseException) -> str:
+        """
+            对请求过程中出现的异常进行分类
+        :param e: 异常
+        :return: 错误分类
+        """
+        ''' 只在请求失败时才需要 requests 的异常类型, 避免导入重试策略时加载 requests '''
+        import ssl
+        import requests
+        from urllib3.exceptions import MaxRetryError, NewConnectionError, ConnectTimeoutError
+        if isinstance(e, requests.exceptions.ProxyError):
+            return cls.PROXY
+        if isinstance(e, (requests.exceptions.SSLError, ssl.SSLError)):
+            return cls.TLS
+        if isinstance(e, requests.exceptions.ConnectTimeout):
+            return cls.CONNECT
+        if isinstance(e, (requests.exceptions.ReadTimeout, socket.timeout)):
+            return cls.READ_TIMEOUT
+        if isinstance(e, requests.exceptions.ConnectionError):
+            ''' requests 将 urllib3 的异常包装为 ConnectionError, 只有建立连接失败(含域名解析失败)时请求才没有发出 '''
+            reason = e.args[0] if e.args else None
+            if isinstance(reason, MaxRetryError):
+                reason = reason.reason
+            if isinstance(reason, (NewConnectionError, ConnectTimeoutError)):
+                return cls.CONNECT
+            return cls.ABORTED
+        if isinstance(e, (NewConnectionError, ConnectTimeoutError, ConnectionRefusedError, socket.gaierror)):
+            return cls.CONNECT
+        if isinstance(e, ConnectionError):
+            ''' 连接被重置、服务端关闭连接(RemoteDisconnected)等 '''
+            return cls.ABORTED
+        return cls.OTHER
+
+    def should_retry(self, cause: str, idempotent: bool = True) -> bool:
+        if cause not in self.retry_on:
+            return False
+        return idempotent or cause not in self.SENT
+
+    def get_delay(self, attempts: int) -> float:
+        """
+            第 attempts 次请求失败后的等待时间
+        """
+        return random.uniform(0, min(self.backoff * (2 ** (attempts - 1)), self.backoff_max))
+
+    @classmethod
+    def clamp_timeout(cls, timeout: float or tuple or None, remain: float or None) -> float or tuple or None:
+        """
+            将请求超时时间限制在剩余时间内
+        :param timeout: 超时时间(秒), 可以是 (连接超时, 读取超时), None 表示不限制
+        :param remain: 剩余时间(秒), None 表示不限制
+        :return: 限制后的超时时间
+        """
+        if remain is None:
+            return timeout
+        if timeout is None:
+            return remain
+        if isinstance(timeout, tuple):
+            return tuple(remain if item is None else min(item, remain) for item in timeout)
+        return min(timeout, remain)
+
+    def call(self, func: callable, timeout: float or tuple or None = None, idempotent: bool = True,
+             deadline: float or None = None) -> (bool, object, str or None, int):
+        """
+            调用 func(timeout) 发送请求, 出现可以重试的错误时等待后重试
+        :param func: 发送一次请求的函数, 参数为本次请求的超时时间, 失败时抛出异常
+        :param timeout: 每次请求的超时时间
+        :param idempotent: 请求是否幂等, 非幂等请求在读取超时或连接中断时不重试
+        :param deadline: 截止时间(time.monotonic), 与 budget 同时生效时取较早的时间
+        :return: (是否成功, func 的返回值或最后一次的异常, 最后一次失败的错误分类, 请求次数)
+        """
+        if self.budget is not None:
+            _deadline = time.monotonic() + self.budget
+            deadline = _deadline if deadline is None else min(deadline, _deadline)
+
+        attempts = 0
+        while True:
+            remain = None if deadline is None else deadline - time.monotonic()
+            if remain is not None and remain <= 0:
+                ''' 开始请求前已经没有剩余时间, 请求没有发出 '''
+                return False, socket.timeout("超过请求总耗时上限"), self.CONNECT, attempts
+            attempts = attempts + 1
+            try:
+                return True, func(self.clamp_timeout(timeout, remain)), None, attempts
+            except Exception as e:
+                cause = self.classify(e)
+                if attempts > self.try_times or not self.should_retry(cause, idempotent):
+                    return False, e, cause, attempts
+                delay = self.get_delay(attempts)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    ''' 剩余时间不足以等待后再次请求, 直接放弃 '''
+                    return False, e, cause, attempts
+                time.sleep(delay)
+
+
+# 不重试的策略, 只发送一次请求
+NO_RETRY = RetryPolicy(try_times=0, budget=None)
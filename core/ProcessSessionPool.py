@@ -0,0 +1,170 @@
+import time
+import threading
+import requests
+import urllib3
+from core.ProcessRequestTrace import TracedHTTPAdapter
+from utils.default import HTTP_REQUEST_SESSION_POOL_MAX_SIZE
+from utils.default import HTTP_REQUEST_SESSION_POOL_IDLE_TIMEOUT
+
+''' 会话发送请求时不校验证书(verify=False), 在第一次使用会话时才加载本模块 '''
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class SessionPool(object):
+    """
+        SessionPool 进程级别的 requests.Session 复用池
+        ================================================================
+        以 (protocol, host, proxy url) 为键保存空闲会话, 相同目标的请求复用已经建立的 TCP/TLS 长连接
+        会话只用于复用连接, 归还时清空 cookie 等会话状态, 不同请求之间不共享 cookie
+        max_size: 每个键最多保留的空闲会话数量, 超出的会话在归还时直接关闭
+        idle_timeout: 空闲会话超过该时间(秒)未被使用则被关闭
+        hits: 借出会话时命中空闲会话的次数
+        misses: 借出会话时没有可用空闲会话而新建会话的次数
+    """
+    HTTP_REQUEST_SESSION_POOL_MAX_SIZE = HTTP_REQUEST_SESSION_POOL_MAX_SIZE
+    HTTP_REQUEST_SESSION_POOL_IDLE_TIMEOUT = HTTP_REQUEST_SESSION_POOL_IDLE_TIMEOUT
+
+    __slots__ = ('max_size', 'idle_timeout', 'hits', 'misses', '_idle', '_lock', '_last_evict')
+
+    def __init__(self, max_size: int = HTTP_REQUEST_SESSION_POOL_MAX_SIZE,
+                 idle_timeout: float = HTTP_REQUEST_SESSION_POOL_IDLE_TIMEOUT):
+        self.max_size = max_size if max_size > 0 else self.HTTP_REQUEST_SESSION_POOL_MAX_SIZE
+        self.idle_timeout = idle_timeout if idle_timeout > 0 else self.HTTP_REQUEST_SESSION_POOL_IDLE_TIMEOUT
+        self.hits = 0
+        self.misses = 0
+        # key => [(session, 最后一次归还的时间), ...], 列表尾部为最近归还的会话
+        self._idle = dict()
+        self._lock = threading.Lock()
+        self._last_evict = time.monotonic()
+
+    @classmethod
+    def make_key(cls, protocol: str, host: str, proxies: dict or None) -> tuple:
+        """
+            构造会话复用池的键
+        :param protocol: 请求使用的协议
+        :param host: 请求的目标主机
+        :param proxies: WebProxy.show_proxy 返回的代理字典
+        :return: (protocol, host, proxy url)
+        """
+        proxy = next(iter(proxies.values()), None) if proxies else None
+        return protocol, host, proxy
+
+    @classmethod
+    def new_session(cls) -> requests.Session:
+        session = requests.session()
+        ''' 挂载可以记录连接阶段耗时的适配器, 供 WebRequest 的耗时记录使用 '''
+        session.mount("http://", TracedHTTPAdapter())
+        session.mount("https://", TracedHTTPAdapter())
+        return session
+
+    def acquire(self, key: tuple) -> requests.Session:
+        """
+            借出一个会话, 优先使用最近归还且未过期的空闲会话
+        :param key: 会话复用池的键
+        :return: requests.Session
+        """
+        now = time.monotonic()
+        session = None
+        expired = list()
+        with self._lock:
+            idle = self._idle.get(key, None)
+            while idle:
+                _session, _last = idle.pop()
+                if now - _last > self.idle_timeout:
+                    ''' 最近归还的会话已经过期, 更早归还的会话也一定过期 '''
+                    expired.append(_session)
+                    expired.extend(item[0] for item in idle)
+                    idle.clear()
+                    break
+                session = _session
+                break
+            if session is None:
+                self.misses = self.misses + 1
+            else:
+                self.hits = self.hits + 1
+        for item in expired:
+            item.close()
+        return session if session is not None else self.new_session()
+
+    @classmethod
+    def reset_session(cls, session: requests.Session):
+        """
+            清空会话在请求过程中积累的状态(响应设置的 cookie 等), 只保留连接池
+        :param session: 借出的会话
+        :return:
+        """
+        session.cookies.clear()
+        session.auth = None
+        session.params = dict()
+
+    def release(self, key: tuple, session: requests.Session):
+        """
+            归还借出的会话, 空闲会话数量已满时关闭该会话
+        :param key: 会话复用池的键
+        :param session: 借出的会话
+        :return:
+        """
+        self.reset_session(session)
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.setdefault(key, list())
+            if len(idle) < self.max_size:
+                idle.append((session, now))
+                session = None
+            need_evict = now - self._last_evict > self.idle_timeout
+        if session is not None:
+            session.close()
+        if need_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+            关闭所有超过空闲时间的会话
+        :return: 被关闭的会话数量
+        """
+        now = time.monotonic()
+        expired = list()
+        with self._lock:
+            self._last_evict = now
+            for key in list(self._idle.keys()):
+                idle = self._idle[key]
+                _alive = [item for item in idle if now - item[1] <= self.idle_timeout]
+                expired.extend(item[0] for item in idle if now - item[1] > self.idle_timeout)
+                if _alive:
+                    self._idle[key] = _alive
+                else:
+                    del self._idle[key]
+        for item in expired:
+            item.close()
+        return len(expired)
+
+    def clear(self):
+        """
+            关闭所有空闲会话并清空计数
+        :return:
+        """
+        with self._lock:
+            idle, self._idle = self._idle, dict()
+            self.hits = 0
+            self.misses = 0
+        for sessions in idle.values():
+            for item in sessions:
+                item[0].close()
+
+    def stats(self) -> dict:
+        """
+            会话复用情况统计
+        :return: {'hits', 'misses', 'reuse_rate', 'idle'}
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'reuse_rate': self.hits / total if total else 0.0,
+                'idle': sum(len(item) for item in self._idle.values())
+            }
+
+
+# 进程级别的会话复用池
+SESSION_POOL = SessionPool()
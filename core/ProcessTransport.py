@@ -0,0 +1,379 @@
+import ssl
+import time
+import json
+import base64
+import socket
+import struct
+import threading
+from http.client import HTTPResponse
+from http.client import RemoteDisconnected
+from urllib.parse import urlsplit
+from core.ProcessRequestData import WebRequestsData
+from core.ProcessRequestBody import WebRequestsBody
+from core.ProcessResponse import WebResponse
+from core.ProcessDNSCache import DNS_CACHE
+from utils.default import HTTP_REQUEST_RAW_POOL_MAX_SIZE
+from utils.default import HTTP_REQUEST_RAW_POOL_IDLE_TIMEOUT
+from utils.default import HTTP_REQUEST_RAW_TIMEOUT
+
+
+class RawTransport(object):
+    """
+        RawTransport 不经过 requests, 直接通过套接字发送 package 的 HTTP/1.1 传输
+        ================================================================
+        bytes 形式解析的报文(WebRequestsData.raw_head 不为 None)按原始请求行与请求头逐字节发送,
+        其余报文根据 package 序列化后发送
+        支持 keep-alive 连接复用、ssl 加密以及 WebProxy 提供的 http/https/socks4/socks5 代理
+        目标与代理的主机名通过进程级别的 DNS_CACHE 解析
+        响应通过 http.client.HTTPResponse 增量解析, 返回 WebResponse
+        hits / misses: 发送请求时命中/未命中空闲连接的次数
+    """
+    HTTP_REQUEST_RAW_POOL_MAX_SIZE = HTTP_REQUEST_RAW_POOL_MAX_SIZE
+    HTTP_REQUEST_RAW_POOL_IDLE_TIMEOUT = HTTP_REQUEST_RAW_POOL_IDLE_TIMEOUT
+    HTTP_REQUEST_RAW_TIMEOUT = HTTP_REQUEST_RAW_TIMEOUT
+    # 复用的连接失败后可以使用新连接重新发送的请求方法(幂等)
+    IDEMPOTENT_METHOD = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS', 'TRACE')
+    # 复用的连接已经被服务器关闭时, 发送请求或读取状态行时出现的错误(此时服务器没有返回任何响应)
+    STALE_CONNECTION_ERROR = (RemoteDisconnected, ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+    # 协议默认端口
+    DEFAULT_PORT = {'http': 80, 'https': 443}
+    # 流式请求体发送时重新计算的请求头
+    STREAM_BODY_HEADER_NAME = ['content-length', 'transfer-encoding']
+
+    __slots__ = ('max_size', 'idle_timeout', 'hits', 'misses', '_idle', '_lock', '_ssl_context')
+
+    def __init__(self, max_size: int = HTTP_REQUEST_RAW_POOL_MAX_SIZE,
+                 idle_timeout: float = HTTP_REQUEST_RAW_POOL_IDLE_TIMEOUT):
+        self.max_size = max_size if max_size > 0 else self.HTTP_REQUEST_RAW_POOL_MAX_SIZE
+        self.idle_timeout = idle_timeout if idle_timeout > 0 else self.HTTP_REQUEST_RAW_POOL_IDLE_TIMEOUT
+        self.hits = 0
+        self.misses = 0
+        # key => [(socket, 最后一次归还的时间), ...]
+        self._idle = dict()
+        self._lock = threading.Lock()
+        ''' 与 WebRequest(verify=False) 保持一致, 不校验证书 '''
+        self._ssl_context = ssl.create_default_context()
+        self._ssl_context.check_hostname = False
+        self._ssl_context.verify_mode = ssl.CERT_NONE
+
+    ####################################################################################################################
+    # 连接管理
+    ####################################################################################################################
+    @classmethod
+    def _split_host(cls, host: str, protocol: str) -> (str, int):
+        """
+            将 host 请求头拆分为主机与端口
+        :param host: host 请求头
+        :param protocol: 请求使用的协议
+        :return: (主机, 端口)
+        """
+        if host.startswith("["):
+            _host, _, _port = host[1:].partition("]")
+            _port = _port[1:]
+        else:
+            _host, _, _port = host.partition(":")
+        return _host, int(_port) if _port.isdigit() else cls.DEFAULT_PORT.get(protocol, 80)
+
+    def _acquire(self, key: tuple) -> socket.socket or None:
+        now = time.monotonic()
+        expired = list()
+        sock = None
+        with self._lock:
+            idle = self._idle.get(key, None)
+            while idle:
+                _sock, _last = idle.pop()
+                if now - _last > self.idle_timeout:
+                    expired.append(_sock)
+                    continue
+                sock = _sock
+                break
+            if sock is None:
+                self.misses = self.misses + 1
+            else:
+                self.hits = self.hits + 1
+        for item in expired:
+            item.close()
+        return sock
+
+    def _release(self, key: tuple, sock: socket.socket):
+        with self._lock:
+            idle = self._idle.setdefault(key, list())
+            if len(idle) < self.max_size:
+                idle.append((sock, time.monotonic()))
+                return
+        sock.close()
+
+    def clear(self):
+        """
+            关闭所有空闲连接并清空计数
+        :return:
+        """
+        with self._lock:
+            idle, self._idle = self._idle, dict()
+            self.hits = 0
+            self.misses = 0
+        for socks in idle.values():
+            for item in socks:
+                item[0].close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'reuse_rate': self.hits / total if total else 0.0,
+                'idle': sum(len(item) for item in self._idle.values())
+            }
+
+    ####################################################################################################################
+    # 建立连接
+    ####################################################################################################################
+    @classmethod
+    def _proxy_authorization(cls, proxy) -> str or None:
+        if not proxy.username and not proxy.password:
+            return None
+        _auth = f"{proxy.username or ''}:{proxy.password or ''}".encode("latin-1")
+        return f"Basic {base64.b64encode(_auth).decode('ascii')}"
+
+    @classmethod
+    def _recv_exact(cls, sock: socket.socket, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("代理服务器提前关闭了连接")
+            data = data + chunk
+        return data
+
+    @classmethod
+    def _socks5_connect(cls, sock: socket.socket, proxy, host: str, port: int):
+        if proxy.username or proxy.password:
+            sock.sendall(b"\x05\x02\x00\x02")
+        else:
+            sock.sendall(b"\x05\x01\x00")
+        _version, _method = cls._recv_exact(sock, 2)
+        if _method == 0x02:
+            username = (proxy.username or "").encode("utf-8")
+            password = (proxy.password or "").encode("utf-8")
+            sock.sendall(b"\x01" + bytes([len(username)]) + username + bytes([len(password)]) + password)
+            if cls._recv_exact(sock, 2)[1] != 0x00:
+                raise ConnectionError("socks5 代理身份验证失败")
+        elif _method != 0x00:
+            raise ConnectionError("socks5 代理不支持的验证方式")
+        _host = host.encode("idna")
+        sock.sendall(b"\x05\x01\x00\x03" + bytes([len(_host)]) + _host + struct.pack(">H", port))
+        reply = cls._recv_exact(sock, 4)
+        if reply[1] != 0x00:
+            raise ConnectionError(f"socks5 代理连接失败({reply[1]})")
+        ''' 读取并丢弃代理绑定的地址与端口 '''
+        if reply[3] == 0x01:
+            cls._recv_exact(sock, 4 + 2)
+        elif reply[3] == 0x04:
+            cls._recv_exact(sock, 16 + 2)
+        else:
+            cls._recv_exact(sock, cls._recv_exact(sock, 1)[0] + 2)
+
+    @classmethod
+    def _socks4_connect(cls, sock: socket.socket, proxy, host: str, port: int):
+        ''' 使用 socks4a, 由代理服务器解析域名 '''
+        userid = (proxy.username or "").encode("utf-8")
+        sock.sendall(b"\x04\x01" + struct.pack(">H", port) + b"\x00\x00\x00\x01" + userid + b"\x00"
+                     + host.encode("idna") + b"\x00")
+        if cls._recv_exact(sock, 8)[1] != 0x5a:
+            raise ConnectionError("socks4 代理连接失败")
+
+    def _tunnel_connect(self, sock: socket.socket, proxy, host: str, port: int):
+        lines = [f"CONNECT {host}:{port} HTTP/1.1", f"Host: {host}:{port}"]
+        authorization = self._proxy_authorization(proxy)
+        if authorization:
+            lines.append(f"Proxy-Authorization: {authorization}")
+        sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        response = HTTPResponse(sock, method="CONNECT")
+        response.begin()
+        if response.status != 200:
+            raise ConnectionError(f"代理隧道建立失败({response.status})")
+
+    def _connect(self, protocol: str, host: str, port: int, proxy, timeout: float or None) -> socket.socket:
+        """
+            建立到目标主机的连接, 使用代理时先连接代理, https 目标通过隧道访问
+        :return: socket
+        """
+        if proxy is None:
+            sock = DNS_CACHE.create_connection((host, port), timeout)
+        else:
+            sock = DNS_CACHE.create_connection((proxy.hostname, proxy.port), timeout)
+            try:
+                scheme = proxy.scheme.lower()
+                if scheme == "socks5":
+                    self._socks5_connect(sock, proxy, host, port)
+                elif scheme == "socks4":
+                    self._socks4_connect(sock, proxy, host, port)
+                elif protocol == "https":
+                    self._tunnel_connect(sock, proxy, host, port)
+            except Exception:
+                sock.close()
+                raise
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if protocol == "https":
+            sock = self._ssl_context.wrap_socket(sock, server_hostname=host)
+        return sock
+
+    ####################################################################################################################
+    # 报文序列化
+    ####################################################################################################################
+    @classmethod
+    def _make_body(cls, data: WebRequestsData) -> any:
+        body = data.package['data']
+        if body is None:
+            return b""
+        if isinstance(body, str):
+            return body.encode("utf-8")
+        if data.package['data_type'] == 'json' and not isinstance(body, (bytes, bytearray, memoryview)):
+            return json.dumps(body).encode("utf-8")
+        if isinstance(body, (bytes, bytearray, memoryview, WebRequestsBody)):
+            return body
+        raise TypeError("原始套接字传输不支持该请求体")
+
+    @classmethod
+    def _serialize_head(cls, data: WebRequestsData, target: str, headers: dict) -> bytes:
+        line = data.package['line']
+        _lines = [f"{line['method'].upper()} {target} {line['version'].upper()}"]
+        _lines.extend(f"{k}: {v}" for k, v in headers.items())
+        return ("\r\n".join(_lines) + "\r\n\r\n").encode("latin-1")
+
+    def _make_head(self, data: WebRequestsData, body, absolute: str or None, authorization: str or None) -> bytes:
+        """
+            构造请求行与请求头
+            原始报文可用且不需要修改时原样发送; 经 http 代理访问 http 目标时只替换请求行为绝对地址并加入代理验证
+        :param data: 报文
+        :param body: 请求体
+        :param absolute: 经 http 代理发送时使用的绝对地址前缀(protocol://host)
+        :param authorization: 代理身份验证请求头
+        :return: 请求行与请求头
+        """
+        if data.raw_head is not None and not isinstance(body, WebRequestsBody):
+            if absolute is None:
+                return data.raw_head
+            head = bytes(data.raw_head)
+            _eol = head.find(b"\n") + 1
+            method, _, rest = head[:_eol].partition(b" ")
+            path, _, version = rest.partition(b" ")
+            _line = b"%s %s%s %s" % (method, absolute.encode("latin-1"), path, version)
+            if authorization:
+                _line = _line + f"Proxy-Authorization: {authorization}\r\n".encode("latin-1")
+            return _line + head[_eol:]
+
+        headers = data.package['header']
+        if isinstance(body, WebRequestsBody):
+            headers = {k: v for k, v in headers.items() if k not in self.STREAM_BODY_HEADER_NAME}
+            if body.content_type:
+                headers['content-type'] = body.content_type
+            if body.len is None:
+                headers['transfer-encoding'] = 'chunked'
+            else:
+                headers['content-length'] = str(body.len)
+        elif body and 'content-length' not in headers:
+            headers = dict(headers)
+            headers['content-length'] = str(len(body))
+        if authorization:
+            headers = dict(headers)
+            headers['proxy-authorization'] = authorization
+        target = data.package['line']['path']
+        return self._serialize_head(data, target if absolute is None else f"{absolute}{target}", headers)
+
+    @classmethod
+    def _send_body(cls, sock: socket.socket, body):
+        if isinstance(body, WebRequestsBody):
+            if body.len is None:
+                for chunk in body:
+                    sock.sendall(b"%x\r\n" % len(chunk))
+                    sock.sendall(chunk)
+                    sock.sendall(b"\r\n")
+                sock.sendall(b"0\r\n\r\n")
+            else:
+                for chunk in body:
+                    sock.sendall(chunk)
+        elif body:
+            sock.sendall(body)
+
+    ####################################################################################################################
+    # 发送请求
+    ####################################################################################################################
+    def make_response(self, data: WebRequestsData, proxies: dict or None = None,
+                      timeout: float or None = None, charset: str = "UTF-8") -> (bool, WebResponse or str):
+        """
+            发送报文并读取完整响应
+        :param data: 报文
+        :param proxies: WebProxy.show_proxy 返回的代理字典
+        :param timeout: 连接与读取的超时时间(秒), None 时使用 HTTP_REQUEST_RAW_TIMEOUT
+        :param charset: 响应没有声明编码时使用的编码
+        :return: (请求是否成功, WebResponse|错误提示)
+        """
+        if not data.is_usable:
+            return False, "发生异常错误"
+        timeout = self.HTTP_REQUEST_RAW_TIMEOUT if timeout is None else timeout
+        method = data.package['line']['method'].upper()
+        protocol = data.package['protocol']
+        host_header = data.package['header']['host']
+        host, port = self._split_host(host_header, protocol)
+        proxy_url = next(iter(proxies.values()), None) if proxies else None
+        proxy = urlsplit(proxy_url) if proxy_url else None
+        key = (protocol, host_header, proxy_url)
+        try:
+            body = self._make_body(data)
+            ''' http 代理转发 http 请求时请求行需要使用绝对地址 '''
+            is_forward = proxy is not None and protocol == "http" and proxy.scheme.lower() in ("http", "https")
+            head = self._make_head(data, body, f"{protocol}://{host_header}" if is_forward else None,
+                                   self._proxy_authorization(proxy) if is_forward else None)
+        except Exception as e:
+            return False, "发生异常错误"
+
+        ''' 只有幂等且请求体可以重复发送的请求才能在复用的连接失效后重新发送 '''
+        is_replayable = method in self.IDEMPOTENT_METHOD and not isinstance(body, WebRequestsBody)
+        sock = self._acquire(key)
+        for _ in range(2):
+            is_reused = sock is not None
+            response = None
+            try:
+                if sock is None:
+                    sock = self._connect(protocol, host, port, proxy, timeout)
+                sock.settimeout(timeout)
+                sock.sendall(head)
+                self._send_body(sock, body)
+                response = HTTPResponse(sock, method=method)
+                response.begin()
+            except Exception as e:
+                if sock is not None:
+                    sock.close()
+                sock = None
+                ''' 复用的连接已经被服务器关闭(没有收到任何响应)时使用新连接重试一次, 超时等其他错误不重试 '''
+                if is_reused and is_replayable and isinstance(e, self.STALE_CONNECTION_ERROR):
+                    continue
+                return False, "发生异常错误"
+            try:
+                content = response.read()
+            except Exception as e:
+                ''' 已经开始接收响应, 请求可能已经被服务器处理, 不重新发送 '''
+                sock.close()
+                return False, "发生异常错误"
+            if response.will_close:
+                sock.close()
+            else:
+                self._release(key, sock)
+            return True, self._make_web_response(data, response, content, charset)
+        return False, "发生异常错误"
+
+    @classmethod
+    def _make_web_response(cls, data: WebRequestsData, response: HTTPResponse, content: bytes,
+                           charset: str) -> WebResponse:
+        encoding = response.msg.get_content_charset()
+        if encoding is None and response.msg.get_content_maintype() == "text":
+            encoding = "ISO-8859-1"
+        url = f"{data.package['protocol']}://{data.package['header']['host']}{data.package['line']['path']}"
+        return WebResponse(data.package['line']['version'], url, response.status, response.msg, content,
+                           encoding, charset)
+
+
+# 进程级别的原始套接字传输
+RAW_TRANSPORT = RawTransport()
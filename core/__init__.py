@@ -0,0 +1,51 @@
+"""
+    core 包的公开类型在第一次访问时才加载对应的模块(PEP 562)
+    例如 from core import ProxyPool 只加载代理池相关的模块, 不会加载 requests/urllib3 等发送请求使用的依赖
+"""
+import importlib
+
+# 公开名称 => 所在模块
+LAZY_MODULE = {
+    'WebRequestsData': 'core.ProcessRequestData',
+    'WebRequestsPackage': 'core.ProcessRequestPackage',
+    'WebRequestsParser': 'core.ProcessRequestParser',
+    'WebRequestsBody': 'core.ProcessRequestBody',
+    'WebRequestsTemplate': 'core.ProcessRequestTemplate',
+    'WebRequest': 'core.ProcessRequest',
+    'WebResponse': 'core.ProcessResponse',
+    'WebRequestTrace': 'core.ProcessRequestTrace',
+    'WebRequestHistory': 'core.ProcessRequestHistory',
+    'AsyncWebRequest': 'core.ProcessAsyncRequest',
+    'AsyncRequestEngine': 'core.ProcessAsyncRequest',
+    'RawTransport': 'core.ProcessTransport',
+    'SessionPool': 'core.ProcessSessionPool',
+    'RetryPolicy': 'core.ProcessRetryPolicy',
+    'ResponseCache': 'core.ProcessResponseCache',
+    'DNSCache': 'core.ProcessDNSCache',
+    'MetricsRegistry': 'core.ProcessMetrics',
+    'METRICS': 'core.ProcessMetrics',
+    'WebProxy': 'core.ProcessProxy',
+    'ProxyNode': 'core.ProcessProxyPool',
+    'ProxyPool': 'core.ProcessProxyPool',
+    'ProxyLoader': 'core.ProcessProxyLoader',
+    'ProxyHealthCache': 'core.ProcessProxyCache',
+    'ProxyHealthChecker': 'core.ProcessProxyChecker',
+    'ProxyHealthMonitor': 'core.ProcessProxyMonitor',
+    'ProxyCircuitBreaker': 'core.ProcessProxyBreaker',
+}
+
+__all__ = list(LAZY_MODULE)
+
+
+def __getattr__(name: str):
+    module = LAZY_MODULE.get(name, None)
+    if module is None:
+        raise AttributeError(f"module 'core' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module), name)
+    ''' 加载后保存到包的命名空间, 之后的访问不再经过 __getattr__ '''
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(list(globals()) + __all__)
@@ -17,10 +17,100 @@ DEFAULT_PROXY = {
 # web端请求数据使用代理时允许使用的代理协议类型
 HTTP_REQUEST_PROXY_PROTOCOL = ["http", "https", "socks4", "socks5", "all"]
 # web端请求数据使用代理时建立的代理池最大数量
-HTTP_REQUEST_PROXY_POOL_MAX_SIZE = 10
+HTTP_REQUEST_PROXY_POOL_MAX_SIZE = 100000
 # web端请求数据使用代理时建立的代理池最小数量
 HTTP_REQUEST_PROXY_POOL_MIN_SIZE = 1
 # web端请求数据允许使用的协议
 HTTP_REQUEST_PROTOCOL = ['get', 'post', 'put', 'option']
 # web端请求数据允许传递的数据类型
 HTTP_REQUEST_DATA_TYPE = ['data', 'json', 'files']
+# web端请求数据解析时允许的请求行与请求头的最大长度
+HTTP_REQUEST_HEADER_MAX_SIZE = 64 * 1024
+# web端请求数据复用会话时每个目标(协议、主机、代理)最多保留的空闲会话数量
+HTTP_REQUEST_SESSION_POOL_MAX_SIZE = 10
+# web端请求数据复用会话时空闲会话的最长保留时间(秒)
+HTTP_REQUEST_SESSION_POOL_IDLE_TIMEOUT = 60
+# web端异步请求数据时每个主机允许同时进行的请求数量
+HTTP_REQUEST_ASYNC_HOST_CONCURRENCY = 8
+# web端异步请求数据时执行阻塞请求的最大线程数量
+HTTP_REQUEST_ASYNC_MAX_WORKERS = 32
+# web端异步请求数据时单个请求的默认超时时间(秒)
+HTTP_REQUEST_ASYNC_TIMEOUT = 30
+# web端流式读取响应数据时每次读取的块大小
+HTTP_REQUEST_STREAM_CHUNK_SIZE = 64 * 1024
+# web端流式发送请求体时每次读取的块大小(请求体占用内存的上限)
+HTTP_REQUEST_BODY_CHUNK_SIZE = 64 * 1024
+# web端原始套接字传输时每个目标(协议、主机、代理)最多保留的空闲连接数量
+HTTP_REQUEST_RAW_POOL_MAX_SIZE = 10
+# web端原始套接字传输时空闲连接的最长保留时间(秒)
+HTTP_REQUEST_RAW_POOL_IDLE_TIMEOUT = 60
+# web端原始套接字传输没有指定超时时间时使用的连接与读取超时时间(秒)
+HTTP_REQUEST_RAW_TIMEOUT = 30
+# web端检测代理存活性时单次访问的(连接超时, 读取超时)(秒)
+HTTP_REQUEST_PROXY_CHECK_TIMEOUT = (5, 10)
+# web端检测代理存活性时访问出现超时或代理错误的最大重试次数
+HTTP_REQUEST_PROXY_CHECK_TRY_TIMES = 5
+# web端检测代理存活性时重试前等待的初始时间(秒), 每次重试翻倍
+HTTP_REQUEST_PROXY_CHECK_BACKOFF = 0.5
+# web端检测代理存活性时重试前等待的最长时间(秒)
+HTTP_REQUEST_PROXY_CHECK_BACKOFF_MAX = 4
+# web端检测单个代理存活性的总耗时上限相对于单次访问超时时间(连接超时 + 读取超时)的倍数
+HTTP_REQUEST_PROXY_CHECK_BUDGET_FACTOR = 2
+# web端并发检测代理存活性时同时进行检测的最大数量
+HTTP_REQUEST_PROXY_CHECK_MAX_WORKERS = 64
+# web端并发检测代理存活性时整体检测的最长时间(秒)
+HTTP_REQUEST_PROXY_CHECK_DEADLINE = 60
+# web端使用代理时请求耗时与成功率的指数加权移动平均系数
+HTTP_REQUEST_PROXY_EWMA_ALPHA = 0.3
+# web端按延迟与成功率选择代理时改为按轮转顺序选择(探测较慢代理)的概率
+HTTP_REQUEST_PROXY_PROBE_RATE = 0.05
+# web端使用代理时连续失败多少次后熔断代理
+HTTP_REQUEST_PROXY_BREAKER_THRESHOLD = 3
+# web端使用代理时熔断代理的冷却时间(秒), 冷却后放行一个试探请求
+HTTP_REQUEST_PROXY_BREAKER_COOLDOWN = 30
+# web端批量导入代理时每批加入代理池的代理数量
+HTTP_REQUEST_PROXY_LOAD_BATCH_SIZE = 1024
+# web端保存代理存活状态的本地缓存文件
+HTTP_REQUEST_PROXY_CACHE_PATH = "proxy_health.db"
+# web端保存的代理存活状态的有效时间(秒), 超过有效时间的代理需要重新检测
+HTTP_REQUEST_PROXY_CACHE_TTL = 600
+# web端后台检测代理存活性时每秒最多进行的检测次数
+HTTP_REQUEST_PROXY_MONITOR_BUDGET = 5
+# web端后台检测代理存活性时状态刚发生变化的代理的检测间隔(秒)
+HTTP_REQUEST_PROXY_MONITOR_MIN_INTERVAL = 10
+# web端后台检测代理存活性时状态稳定的代理的最长检测间隔(秒)
+HTTP_REQUEST_PROXY_MONITOR_MAX_INTERVAL = 600
+# web端后台检测代理存活性时同时进行检测的最大数量
+HTTP_REQUEST_PROXY_MONITOR_MAX_WORKERS = 4
+# web端域名解析成功的结果的缓存时间(秒)
+HTTP_REQUEST_DNS_CACHE_TTL = 300
+# web端域名解析失败的结果的缓存时间(秒)
+HTTP_REQUEST_DNS_CACHE_NEGATIVE_TTL = 30
+# web端域名解析缓存最多保存的结果数量
+HTTP_REQUEST_DNS_CACHE_MAX_SIZE = 4096
+# web端请求失败时的最大重试次数
+HTTP_REQUEST_RETRY_TRY_TIMES = 2
+# web端请求失败重试前等待时间的初始上限(秒)
+HTTP_REQUEST_RETRY_BACKOFF = 0.2
+# web端请求失败重试前等待时间上限的最大值(秒)
+HTTP_REQUEST_RETRY_BACKOFF_MAX = 2
+# web端请求包含重试在内的总耗时上限(秒)
+HTTP_REQUEST_RETRY_BUDGET = 30
+# web端GET请求的响应缓存时间(秒), 过期后带有校验信息的响应重新校验
+HTTP_REQUEST_RESPONSE_CACHE_TTL = 5
+# web端GET请求的响应缓存最多保存的响应数量
+HTTP_REQUEST_RESPONSE_CACHE_MAX_SIZE = 1024
+# web端GET请求的响应缓存占用内存的上限(字节)
+HTTP_REQUEST_RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# web端指标HTTP服务的监听地址(只监听本机)
+HTTP_REQUEST_METRICS_HOST = "127.0.0.1"
+# web端指标HTTP服务的监听端口
+HTTP_REQUEST_METRICS_PORT = 9109
+# web端耗时分布指标的分桶上限(秒)
+HTTP_REQUEST_METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# web端请求与响应历史记录的保存目录
+HTTP_REQUEST_HISTORY_PATH = "history"
+# web端请求与响应历史记录每个分段文件的大小上限(字节), 超过后写入新的分段文件
+HTTP_REQUEST_HISTORY_SEGMENT_SIZE = 64 * 1024 * 1024
+# web端请求与响应历史记录同时打开用于读取的分段文件的最大数量
+HTTP_REQUEST_HISTORY_MAX_READERS = 8